@@ -0,0 +1,58 @@
+"""Async versions of the read-only crud functions, for endpoints using an AsyncSession.
+
+Each runs the matching ``crud`` function through ``AsyncSession.run_sync``, so
+every query keeps a single implementation.  The sync code runs in a greenlet
+on the event loop and every database round trip suspends the coroutine, so a
+request waiting on the database no longer holds a threadpool thread.
+
+Results are fully loaded (``selectinload`` relationships, section positions),
+so response serialization never triggers a lazy load, which an AsyncSession
+cannot do implicitly.
+"""
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud
+import models
+import search as search_index
+
+
+async def get_posts(db: AsyncSession, skip: int = 0, limit: int = 50, cursor: Optional[str] = None) -> List[models.Post]:
+    return await db.run_sync(crud.get_posts, skip=skip, limit=limit, cursor=cursor)
+
+
+async def get_post(db: AsyncSession, post_id: int) -> Optional[models.Post]:
+    return await db.run_sync(crud.get_post, post_id)
+
+
+async def get_sections(db: AsyncSession, story_id: Optional[int] = None, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[models.Section]:
+    return await db.run_sync(crud.get_sections, story_id=story_id, skip=skip, limit=limit, cursor=cursor)
+
+
+async def get_section(db: AsyncSession, section_id: int) -> Optional[models.Section]:
+    return await db.run_sync(crud.get_section, section_id)
+
+
+async def get_story(db: AsyncSession, story_id: int) -> Optional[models.Story]:
+    return await db.run_sync(crud.get_story, story_id)
+
+
+async def get_latest_story_id(db: AsyncSession) -> Optional[int]:
+    return await db.run_sync(crud.get_latest_story_id)
+
+
+async def list_story_versions(db: AsyncSession, story_id: int, limit: Optional[int] = None, cursor: Optional[str] = None) -> List[models.StoryVersion]:
+    return await db.run_sync(crud.list_story_versions, story_id, limit=limit, cursor=cursor)
+
+
+async def get_story_version(db: AsyncSession, story_id: int, version_number: Optional[int] = None) -> Optional[models.StoryVersion]:
+    return await db.run_sync(crud.get_story_version, story_id, version_number)
+
+
+async def get_story_version_payload(db: AsyncSession, story_id: int, version_number: int) -> Optional[str]:
+    return await db.run_sync(crud.get_story_version_payload, story_id, version_number)
+
+
+async def search(db: AsyncSession, query: str, source_type: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None) -> List[search_index.SearchHit]:
+    return await db.run_sync(search_index.search, query, source_type, limit, cursor)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Benchmark: concurrency ceiling of the read endpoints, sync (threadpool) vs async.
+
+Seeds a scratch database with posts and story sections, then serves the app
+from a uvicorn process that also carries the old sync implementations of
+the same endpoints under ``/sync/...`` (``def`` handlers + ``get_db``).  Every
+SQL statement is delayed by ``--latency-ms`` (a SQLite trace callback that
+sleeps in the driver's thread), standing in for a loaded database server:
+lock waits behind slow writers plus the network round trip.  For each
+concurrency level it fires bursts of GETs at both variants and reports
+throughput and latency percentiles; ``/healthz`` (no database) shows what the
+server and client manage on this machine's CPU alone.
+
+The sync handlers top out at the threadpool size (40 threads by default):
+past that, requests queue for a thread while the database is idle.  The async
+handlers keep going until the connection pool (DB_POOL_SIZE, raised here so
+it is not the limit) or the CPU is.  On one CPU with the defaults:
+
+    posts      128 sync    62 req/s  p99 2561 ms    async 130 req/s  p99 1063 ms
+    sections   512 sync    82 req/s  p99 6098 ms    async 244 req/s  p99 2125 ms
+
+Usage: python benchmarks/bench_async_concurrency.py [--posts 200] [--latency-ms 200]
+           [--concurrency 32,128,512] [--requests 600]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from harness import prepare_environment
+
+ENDPOINTS = {"healthz": "/healthz", "posts": "/posts?limit=5", "sections": "/sections?limit=5"}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def seed(posts: int, sections: int) -> None:
+    import crud
+    import schemas
+    from database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        crud.bulk_create_posts(db, [
+            schemas.PostCreate(title=f"Post {i}", body="lorem ipsum " * 40, media=[
+                schemas.MediaCreate(kind="image", url=f"https://cdn.example.com/{i}-{j}.jpg") for j in range(3)
+            ])
+            for i in range(posts)
+        ])
+        crud.create_story(db, schemas.StoryCreate(title="Bench story", sections=[
+            schemas.SectionCreate(type="paragraph", data=f'{{"type":"paragraph","content":"Section {i}"}}')
+            for i in range(sections)
+        ]))
+
+
+def add_latency(sync_engine, seconds: float) -> None:
+    """Sleep ``seconds`` before each statement, in whichever thread runs the sqlite3 call."""
+    from sqlalchemy import event
+    from sqlalchemy.util import await_only
+
+    def wait(statement):
+        time.sleep(seconds)
+
+    @event.listens_for(sync_engine, "connect")
+    def _slow(dbapi_connection, connection_record):
+        driver = getattr(dbapi_connection, "_connection", None)
+        if driver is not None and hasattr(driver, "set_trace_callback") and asyncio.iscoroutinefunction(driver.set_trace_callback):
+            await_only(driver.set_trace_callback(wait))  # aiosqlite: runs in its connection thread
+        else:
+            dbapi_connection.set_trace_callback(wait)
+
+
+def serve(port: int, latency: float) -> None:
+    """Child process: the app plus the previous sync handlers under /sync."""
+    from typing import List, Optional
+
+    import uvicorn
+    from fastapi import Depends, Response
+    from sqlalchemy.orm import Session
+
+    import crud
+    import database
+    import main
+    import schemas
+
+    add_latency(database.engine, latency)
+    add_latency(database.async_engine.sync_engine, latency)
+    database.engine.dispose()  # main's create_all already pooled a connection without the delay
+
+    @main.app.get("/sync/posts", response_model=List[schemas.PostRead])
+    def sync_posts(response: Response, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(main.get_db)):
+        return crud.get_posts(db, limit=limit, cursor=cursor)
+
+    @main.app.get("/sync/sections", response_model=List[schemas.SectionRead])
+    def sync_sections(response: Response, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(main.get_db)):
+        return crud.get_sections(db, limit=limit, cursor=cursor)
+
+    # registered after the media mount; move them in front so they are reachable
+    main.app.router.routes.sort(key=lambda route: not getattr(route, "path", "").startswith("/sync/"))
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+async def fetch(port: int, path: str) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    if not response.startswith(b"HTTP/1.1 200"):
+        raise RuntimeError(f"unexpected response: {response[:80]!r}")
+
+
+async def burst(port: int, path: str, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            t0 = time.perf_counter()
+            await fetch(port, path)
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return time.perf_counter() - t0, latencies
+
+
+async def wait_listening(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await fetch(port, "/healthz")
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--sections", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="simulated database round trip per statement")
+    parser.add_argument("--concurrency", default="32,128,512")
+    parser.add_argument("--requests", type=int, default=600, help="requests per variant and level")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    prepare_environment()
+    levels = [int(level) for level in args.concurrency.split(",")]
+    os.environ["DB_POOL_SIZE"] = str(max(levels) + 8)
+    os.environ["DB_MAX_OVERFLOW"] = "0"
+    seed(args.posts, args.sections)
+
+    server = subprocess.Popen([sys.executable, __file__, "--serve", str(args.port), str(args.latency_ms / 1000)])
+    try:
+        asyncio.run(wait_listening(args.port))
+        print(f"{args.requests} GETs per run, {args.latency_ms:g} ms per statement")
+        print(f"{'endpoint':10s} {'conc':>5s} {'variant':8s} {'req/s':>8s} {'p50 ms':>8s} {'p99 ms':>8s}")
+        for name, path in ENDPOINTS.items():
+            for level in levels:
+                for variant, prefix in (("sync", "/sync"), ("async", "")) if name != "healthz" else (("-", ""),):
+                    asyncio.run(burst(args.port, prefix + path, min(level, 50), level))  # warm the pool
+                    seconds, latencies = asyncio.run(burst(args.port, prefix + path, args.requests, level))
+                    print(f"{name:10s} {level:5d} {variant:8s} {args.requests / seconds:8.0f} "
+                          f"{statistics.median(latencies) * 1000:8.1f} {percentile(latencies, 99) * 1000:8.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--serve":
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        serve(int(sys.argv[2]), float(sys.argv[3]))
+    else:
+        run()
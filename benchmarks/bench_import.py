@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark: story.json -> posts import throughput.
+
+Generates a story.json with N sections (default 300, a mix of paragraphs,
+pullquotes, images, videos and image groups) and imports it through
+POST /import/story, comparing the bulk pipeline with the old
+one-``create_post``-per-section loop on the same data.
+
+Usage: python benchmarks/bench_import.py [--sections 300] [--repeat 5] [--db-url sqlite:///...]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from harness import ASGIClient, prepare_environment
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--sections", type=int, default=300)
+parser.add_argument("--repeat", type=int, default=5)
+parser.add_argument("--db-url", default=None, help="database to import into (default: scratch SQLite)")
+args = parser.parse_args()
+
+ROOT = prepare_environment(db_url=args.db_url)
+
+import crud  # noqa: E402
+import main  # noqa: E402
+import migrations  # noqa: E402
+import story_import  # noqa: E402
+from database import SessionLocal, count_queries  # noqa: E402
+
+
+def make_story(n: int) -> dict:
+    kinds = [
+        lambda i: {"type": "paragraph", "content": f"Paragraph {i} " + "lorem ipsum " * 30},
+        lambda i: {"type": "pullquote", "text": f"Quote {i}", "cite": "Someone"},
+        lambda i: {"type": "imagegif", "src": f"/media/{i}.jpg", "alt": "alt", "caption": "caption"},
+        lambda i: {"type": "video", "src": f"/media/{i}.mp4"},
+        lambda i: {"type": "imagegroup", "images": [{"src": f"/media/{i}-{j}.jpg"} for j in range(4)]},
+    ]
+    return {"title": "Import benchmark", "standfirst": "", "sections": [kinds[i % len(kinds)](i) for i in range(n)]}
+
+
+def legacy_import(story: dict) -> int:
+    """What /import/story used to do: one create_post (flush, commit, refresh) per section."""
+    db = SessionLocal()
+    try:
+        for post in story_import.section_posts(story):
+            crud.create_post(db, post)
+    finally:
+        db.close()
+    return len(story["sections"])
+
+
+def run():
+    migrations.upgrade()  # the in-process client does not run the app's lifespan
+    story = make_story(args.sections)
+    frontend = ROOT / "frontend"
+    frontend.mkdir(exist_ok=True)
+    (frontend / "story.json").write_text(json.dumps(story), encoding="utf-8")
+    client = ASGIClient(main.app)
+
+    dry = client.call("POST", "/import/story", params={"frontend_root": str(frontend), "dry_run": "true"})
+    print(f"dry run:  {dry.json()}")
+
+    bulk, legacy = [], []
+    for _ in range(args.repeat):
+        with count_queries() as statements:
+            t0 = time.perf_counter()
+            response = client.call("POST", "/import/story", params={"frontend_root": str(frontend)})
+            bulk.append(time.perf_counter() - t0)
+        if response.status != 200 or len(response.json()) != args.sections:
+            raise SystemExit(f"import failed: {response.status} {response.body[:200]!r}")
+        bulk_statements = len(statements)
+
+        with count_queries() as statements:
+            t0 = time.perf_counter()
+            legacy_import(story)
+            legacy.append(time.perf_counter() - t0)
+        legacy_statements = len(statements)
+
+    for name, timings, queries in (("bulk", bulk, bulk_statements), ("per-post", legacy, legacy_statements)):
+        median = statistics.median(timings)
+        print(f"{name:9s} median {median * 1000:8.1f} ms  {args.sections / median:9.0f} sections/s  {queries:5d} statements")
+    print(f"speedup:  {statistics.median(legacy) / statistics.median(bulk):.1f}x")
+
+
+if __name__ == "__main__":
+    run()
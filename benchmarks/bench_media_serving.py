@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark: media serving, MediaFiles vs the plain StaticFiles mount.
+
+Writes a few large files (default 4 x 256 MB) and serves them from two uvicorn
+processes, one with ``starlette.staticfiles.StaticFiles`` (the old mount) and
+one with ``media_files.MediaFiles``.  Then fires many concurrent byte-range
+requests at random offsets (video seeking), each on its own connection, and
+reports throughput and latency percentiles for both.
+
+Usage: python benchmarks/bench_media_serving.py [--files 4] [--file-mb 256]
+           [--requests 400] [--concurrency 32] [--range-mb 4]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from harness import REPO_ROOT, prepare_environment
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def serve(kind: str, port: int, directory: str) -> None:
+    """Child process: serve ``directory`` at /media with the given implementation."""
+    sys.path.insert(0, str(REPO_ROOT))
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.staticfiles import StaticFiles
+
+    if kind == "media":
+        from media_files import MediaFiles as files_class
+    else:
+        files_class = StaticFiles
+    app = Starlette()
+    app.mount("/media", files_class(directory=directory), name="media")
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_listening(port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def fetch_range(port: int, path: str, start: int, end: int) -> int:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: bench\r\nRange: bytes={start}-{end - 1}\r\nConnection: close\r\n\r\n".encode()
+    )
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    if not head.startswith(b"HTTP/1.1 206"):
+        raise RuntimeError(f"unexpected response: {head[:80]!r}")
+    received = 0
+    while True:
+        chunk = await reader.read(1024 * 1024)
+        if not chunk:
+            break
+        received += len(chunk)
+    writer.close()
+    if received < end - start:
+        raise RuntimeError(f"short body: {received} of {end - start} bytes")
+    return received
+
+
+async def load(port: int, plan, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(path, start, end):
+        async with semaphore:
+            t0 = time.perf_counter()
+            size = await fetch_range(port, path, start, end)
+            latencies.append(time.perf_counter() - t0)
+            return size
+
+    t0 = time.perf_counter()
+    sizes = await asyncio.gather(*(one(*item) for item in plan))
+    return sum(sizes), time.perf_counter() - t0, latencies
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--file-mb", type=int, default=256)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--range-mb", type=float, default=4)
+    args = parser.parse_args()
+
+    root = prepare_environment()
+    media = root / "media" / "uploads" / "bench"
+    media.mkdir(parents=True, exist_ok=True)
+    block = os.urandom(1024 * 1024)
+    for n in range(args.files):
+        path = media / f"video{n}.mp4"
+        with open(path, "wb") as handle:
+            for _ in range(args.file_mb):
+                handle.write(block)
+
+    rng = random.Random(7)
+    range_bytes = int(args.range_mb * 1024 * 1024)
+    file_bytes = args.file_mb * 1024 * 1024
+    plan = []
+    for _ in range(args.requests):
+        start = rng.randrange(0, file_bytes - range_bytes)
+        plan.append((f"/media/uploads/bench/video{rng.randrange(args.files)}.mp4", start, start + range_bytes))
+
+    print(f"{args.requests} range requests of {args.range_mb:g} MB, concurrency {args.concurrency}, "
+          f"{args.files} x {args.file_mb} MB files")
+    try:
+        for kind in ("static", "media"):
+            compare(kind, root / "media", plan, args.concurrency)
+    finally:
+        shutil.rmtree(media, ignore_errors=True)
+
+
+def compare(kind: str, media_root, plan, concurrency: int) -> None:
+    port = free_port()
+    server = subprocess.Popen([sys.executable, __file__, "--serve", kind, str(port), str(media_root)])
+    try:
+        asyncio.run(wait_listening(port))
+        asyncio.run(load(port, plan[:20], concurrency))  # warm page cache and workers
+        total, seconds, latencies = asyncio.run(load(port, plan, concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+    name = "StaticFiles" if kind == "static" else "MediaFiles"
+    print(f"{name:12s} {total / seconds / 1e6:9.1f} MB/s   p50 {statistics.median(latencies) * 1000:7.1f} ms"
+          f"   p99 {percentile(latencies, 99) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--serve":
+        serve(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    else:
+        run()
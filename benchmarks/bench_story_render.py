@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GET /story rendering, parse-and-re-encode vs. spliced section fragments.
+
+Usage: python benchmarks/bench_story_render.py [--sizes 50 500 5000] [--repeat 20]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import crud
+import models
+from story_payload import build_story_payload, render_story_json
+
+
+def make_story(section_count: int) -> models.Story:
+    story = models.Story(id=1, title="Benchmark story", version="1.0", standfirst="Lorem ipsum " * 8)
+    for i in range(section_count):
+        kind = i % 3
+        if kind == 0:
+            data = {"type": "paragraph", "content": "Paragraph text with some unicode — ✓ " * 12}
+        elif kind == 1:
+            data = {"type": "pullquote", "text": "A memorable quote " * 4, "cite": "Someone"}
+        else:
+            data = {
+                "type": "imagegroup",
+                "images": [
+                    {"src": f"/media/uploads/2025/01/01/{i}-{j}.jpg", "caption": "Caption", "alt": "Alt", "credit": "Credit"}
+                    for j in range(4)
+                ],
+            }
+        story.sections.append(
+            models.Section(id=i + 1, type=data["type"], data=crud.normalize_section_data(data), sort_key=i)
+        )
+    return story
+
+
+def parse_path(story: models.Story) -> bytes:
+    """What GET /story did before: json.loads every section, let FastAPI re-encode."""
+    payload = build_story_payload(story)
+    payload["versionNumber"] = 1
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def splice_path(story: models.Story) -> bytes:
+    return render_story_json(story, 1)
+
+
+def measure(fn, story, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(story)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'sections':>8}  {'parse (ms)':>11}  {'splice (ms)':>11}  {'speedup':>8}  {'bytes':>10}")
+    for size in args.sizes:
+        story = make_story(size)
+        body = splice_path(story)
+        if body != parse_path(story):
+            raise SystemExit(f"splice output differs from the parse path at {size} sections")
+        parsed = measure(parse_path, story, args.repeat)
+        spliced = measure(splice_path, story, args.repeat)
+        print(f"{size:>8}  {parsed * 1000:>11.3f}  {spliced * 1000:>11.3f}  {parsed / spliced:>7.1f}x  {len(body):>10}")
+
+
+if __name__ == "__main__":
+    main()
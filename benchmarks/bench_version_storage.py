@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark: StoryVersion storage size and reconstruction latency.
+
+Publishes a story N times (default 1,000), editing one random paragraph
+between publishes, then compares the bytes stored by the deduplicated format
+with what full snapshots would have cost, and times rebuilding versions.
+
+Usage: python benchmarks/bench_version_storage.py [--publishes 1000] [--sections 200]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from harness import prepare_environment
+
+prepare_environment()
+
+from sqlalchemy import func  # noqa: E402
+
+import crud  # noqa: E402
+import models  # noqa: E402
+import schemas  # noqa: E402
+from database import Base, SessionLocal, engine  # noqa: E402
+from story_payload import build_story_payload  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--publishes", type=int, default=1000)
+    parser.add_argument("--sections", type=int, default=200)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    rng = random.Random(42)
+    sections = [
+        schemas.SectionCreate(
+            type="paragraph",
+            data=crud.normalize_section_data({"type": "paragraph", "content": f"Paragraph {i} " + "lorem ipsum " * 40}),
+            sort_order=i,
+        )
+        for i in range(args.sections)
+    ]
+    story = crud.create_story(db, schemas.StoryCreate(title="Versioned story", sections=sections))
+    section_ids = [section.id for section in story.sections]
+
+    full_bytes = 0
+    originals = {}
+    start = time.perf_counter()
+    for n in range(args.publishes):
+        edited = crud.get_section(db, rng.choice(section_ids))
+        crud.update_section(db, edited.id, data={"type": "paragraph", "content": f"Edit {n} " + "lorem ipsum " * 40})
+        entry = crud.record_story_version(db, story.id, build_story_payload(crud.get_story(db, story.id)))
+        full_bytes += len(entry.full_payload.encode("utf-8"))
+        if entry.version_number % max(1, args.publishes // args.samples) == 0:
+            originals[entry.version_number] = entry.full_payload
+        db.expire_all()
+    publish_seconds = time.perf_counter() - start
+
+    manifest_bytes = db.query(func.sum(func.length(models.StoryVersion.payload))).scalar() or 0
+    blob_bytes = db.query(func.sum(func.length(models.SectionBlob.data))).scalar() or 0
+    blob_rows = db.query(func.count(models.SectionBlob.hash)).scalar()
+
+    timings = []
+    for version_number, original in originals.items():
+        db.expire_all()
+        t0 = time.perf_counter()
+        rebuilt = crud.get_story_version_payload(db, story.id, version_number)
+        timings.append(time.perf_counter() - t0)
+        if rebuilt != original:
+            raise SystemExit(f"version {version_number} did not round-trip")
+    db.close()
+
+    stored = manifest_bytes + blob_bytes
+    print(f"publishes:            {args.publishes} ({publish_seconds / args.publishes * 1000:.2f} ms each)")
+    print(f"sections per story:   {args.sections}")
+    print(f"full snapshots:       {full_bytes / 1e6:10.2f} MB")
+    print(f"deduplicated storage: {stored / 1e6:10.2f} MB  (manifests {manifest_bytes / 1e6:.2f} MB, {blob_rows} blobs {blob_bytes / 1e6:.2f} MB)")
+    print(f"reduction:            {full_bytes / max(stored, 1):10.1f}x")
+    print(f"reconstruct latency:  p50 {statistics.median(timings) * 1000:.2f} ms  "
+          f"p99 {percentile(timings, 99) * 1000:.2f} ms  over {len(timings)} versions (all byte-identical)")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,104 @@
+"""Shared helpers for the benchmark scripts: a throwaway app environment and a
+minimal in-process ASGI client (no httpx needed)."""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+from pathlib import Path
+from urllib.parse import urlencode
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def prepare_environment(workdir: Optional[str] = None, db_url: Optional[str] = None) -> Path:
+    """Point the app at a scratch database, story.json and media root.
+
+    Must run before ``main`` (or ``database``) is imported.
+    """
+    root = Path(workdir or tempfile.mkdtemp(prefix="bench-"))
+    root.mkdir(parents=True, exist_ok=True)
+    story_json = root / "story.json"
+    if not story_json.exists():
+        story_json.write_text((REPO_ROOT / "public" / "story.json").read_text(encoding="utf-8"), encoding="utf-8")
+    os.environ["DB_URL"] = db_url or f"sqlite:///{root / 'bench.db'}"
+    os.environ["STORY_JSON_PATH"] = str(story_json)
+    os.environ["MEDIA_ROOT"] = str(root / "media")
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    return root
+
+
+@dataclass
+class ASGIResponse:
+    status: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class ASGIClient:
+    def __init__(self, app):
+        self.app = app
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict] = None,
+        headers: Optional[Dict[str, str]] = None,
+        body: bytes = b"",
+        json_body=None,
+    ) -> ASGIResponse:
+        header_items = dict(headers or {})
+        if json_body is not None:
+            body = json.dumps(json_body).encode("utf-8")
+            header_items.setdefault("content-type", "application/json")
+        if body:
+            header_items.setdefault("content-length", str(len(body)))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method.upper(),
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode("utf-8"),
+            "query_string": urlencode(params or {}, doseq=True).encode("ascii"),
+            "root_path": "",
+            "headers": _encode_headers(header_items.items()),
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        chunks = [body]
+        response = ASGIResponse(status=0)
+        parts = []
+
+        async def receive():
+            if chunks:
+                return {"type": "http.request", "body": chunks.pop(), "more_body": False}
+            await asyncio.sleep(3600)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response.status = message["status"]
+                response.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in message.get("headers", [])}
+            elif message["type"] == "http.response.body":
+                parts.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        response.body = b"".join(parts)
+        return response
+
+    def call(self, method: str, path: str, **kwargs) -> ASGIResponse:
+        """Synchronous convenience wrapper around ``request``."""
+        return asyncio.run(self.request(method, path, **kwargs))
+
+
+def _encode_headers(items: Iterable[Tuple[str, str]]):
+    return [(k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in items]
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Load-test suite for the API hot paths, with JSON results to compare across commits.
+
+Seeds a scratch SQLite database at a chosen scale (posts with media
+galleries, one story with thousands of sections, a long version history),
+then drives each workload for a fixed time with a fixed number of
+concurrent clients (closed loop: every client sends its next request as soon
+as the previous one finishes):
+
+    story_read       GET /story
+    posts_pages      GET /posts, following X-Next-Cursor for up to 5 pages
+    section_edit     PATCH /sections/{id} with new content
+    section_reorder  PATCH /sections/{id} with a new sort_order
+    publish          POST /story/publish
+    upload           POST /upload (multipart, --upload-kb of random bytes)
+    mixed            all of the above, weighted like an editing session with readers
+
+Requests go to a uvicorn process (``--transport uvicorn``, the default: real
+sockets, the real threadpool) or straight into the ASGI app in this process
+(``--transport inproc``: no network, easier to profile).  For every workload
+and operation it reports throughput, errors and p50/p95/p99 latency, and writes
+everything with the scale, commit and machine to a JSON file.
+
+Usage:
+    python benchmarks/load_suite.py [--scale small|medium|large] [--duration 10]
+        [--concurrency 16] [--workloads story_read,mixed] [--output run.json]
+    python benchmarks/load_suite.py --compare base.json new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlencode
+
+from harness import REPO_ROOT, prepare_environment
+
+SCALES = {
+    "small": {"posts": 500, "media_per_post": 4, "sections": 1000, "versions": 30},
+    "medium": {"posts": 5000, "media_per_post": 6, "sections": 3000, "versions": 150},
+    "large": {"posts": 50000, "media_per_post": 8, "sections": 10000, "versions": 600},
+}
+MIXED_WEIGHTS = {
+    "story_read": 60,
+    "posts_pages": 20,
+    "section_edit": 10,
+    "section_reorder": 4,
+    "upload": 4,
+    "publish": 2,
+}
+WORKLOADS = list(MIXED_WEIGHTS) + ["mixed"]
+MAX_PAGES = 5
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(latencies, errors: int) -> dict:
+    if not latencies:
+        return {"count": 0, "errors": errors}
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+# ---------------------------------------------------------------- seeding
+
+def seed(scale: dict, rng: random.Random) -> dict:
+    """Fill the scratch database; returns the ids the workloads pick from."""
+    import crud
+    import schemas
+    from database import SessionLocal
+    from story_payload import build_story_payload
+
+    words = "glacier river harbour council budget election school transit housing climate market archive".split()
+
+    def sentence(n: int) -> str:
+        return " ".join(rng.choice(words) for _ in range(n)).capitalize() + "."
+
+    with SessionLocal() as db:
+        for start in range(0, scale["posts"], 1000):
+            crud.bulk_create_posts(db, [
+                schemas.PostCreate(
+                    title=sentence(6),
+                    content=" ".join(sentence(20) for _ in range(8)),
+                    author="Bench",
+                    media=[
+                        schemas.MediaCreate(kind="image", url=f"/media/uploads/seed/{i}-{j}.jpg", caption=sentence(8), sort_order=j)
+                        for j in range(scale["media_per_post"])
+                    ],
+                )
+                for i in range(start, min(start + 1000, scale["posts"]))
+            ])
+
+        def events():
+            yield "field", ("title", "Load test story")
+            yield "field", ("standfirst", sentence(30))
+            for i in range(scale["sections"]):
+                kind = i % 4
+                if kind in (0, 1):
+                    yield "section", {"type": "paragraph", "content": " ".join(sentence(18) for _ in range(4))}
+                elif kind == 2:
+                    yield "section", {"type": "pullquote", "text": sentence(14), "cite": "Someone"}
+                else:
+                    yield "section", {"type": "imagegroup", "images": [
+                        {"src": f"/media/uploads/seed/s{i}-{j}.jpg", "caption": sentence(8), "alt": "", "credit": "Bench"}
+                        for j in range(3)
+                    ]}
+
+        story = crud.import_story_stream(db, events())
+        story_id = story.id
+        payload = build_story_payload(crud.get_story(db, story_id))
+        sections = payload["sections"]
+        for version in range(scale["versions"]):
+            # each publish changes one section, like an editor's session
+            index = rng.randrange(len(sections))
+            sections[index] = dict(sections[index], content=f"Revision {version}: {sentence(16)}")
+            crud.record_story_version(db, story_id, payload)
+        section_ids = [row.id for row in crud.iter_story_sections(db, story_id)]
+    return {"story_id": story_id, "section_ids": section_ids}
+
+
+# ---------------------------------------------------------------- transports
+
+class UvicornTransport:
+    """Requests over real sockets to a uvicorn process serving main:app."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.process = None
+
+    async def start(self) -> None:
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=REPO_ROOT,
+        )
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                status, _, _ = await self.request("GET", "/healthz")
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            if time.monotonic() > deadline or self.process.poll() is not None:
+                raise RuntimeError("uvicorn did not start")
+            await asyncio.sleep(0.2)
+
+    async def stop(self) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+
+    async def request(self, method, path, params=None, headers=None, body=b""):
+        target = path + ("?" + urlencode(params) if params else "")
+        head = [f"{method} {target} HTTP/1.1", "Host: bench", "Connection: close", f"Content-Length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        header_block, _, payload = raw.partition(b"\r\n\r\n")
+        lines = header_block.decode("latin-1").split("\r\n")
+        response_headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        return int(lines[0].split()[1]), response_headers, payload
+
+
+class InProcessTransport:
+    """Requests straight into the ASGI app in this process (no sockets)."""
+
+    async def start(self) -> None:
+        import main
+        from harness import ASGIClient
+        self.client = ASGIClient(main.app)
+
+    async def stop(self) -> None:
+        from database import async_engine
+        await async_engine.dispose()
+
+    async def request(self, method, path, params=None, headers=None, body=b""):
+        response = await self.client.request(method, path, params=params, headers=headers, body=body)
+        return response.status, response.headers, response.body
+
+
+# ---------------------------------------------------------------- operations
+
+def multipart(filename: str, content: bytes):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return {"Content-Type": f"multipart/form-data; boundary={boundary}"}, body
+
+
+class Client:
+    """One simulated user: picks operations and keeps its own pagination state."""
+
+    def __init__(self, transport, seeded: dict, rng: random.Random, upload_bytes: int):
+        self.transport = transport
+        self.seeded = seeded
+        self.rng = rng
+        self.upload_bytes = upload_bytes
+        self.posts_cursor = None
+        self.posts_page = 0
+
+    async def story_read(self):
+        return await self.transport.request("GET", "/story")
+
+    async def posts_pages(self):
+        params = {"limit": 20}
+        if self.posts_cursor and self.posts_page < MAX_PAGES:
+            params["cursor"] = self.posts_cursor
+        else:
+            self.posts_page = 0
+        status, headers, body = await self.transport.request("GET", "/posts", params=params)
+        self.posts_cursor = headers.get("x-next-cursor")
+        self.posts_page += 1
+        return status, headers, body
+
+    async def section_edit(self):
+        section_id = self.rng.choice(self.seeded["section_ids"])
+        data = json.dumps({"type": "paragraph", "content": f"Edited {time.time()} " + "lorem ipsum " * 30})
+        return await self.transport.request(
+            "PATCH", f"/sections/{section_id}", headers={"Content-Type": "application/json"},
+            body=json.dumps({"data": data}).encode(),
+        )
+
+    async def section_reorder(self):
+        section_id = self.rng.choice(self.seeded["section_ids"])
+        target = self.rng.randrange(len(self.seeded["section_ids"]))
+        return await self.transport.request(
+            "PATCH", f"/sections/{section_id}", headers={"Content-Type": "application/json"},
+            body=json.dumps({"sort_order": target}).encode(),
+        )
+
+    async def publish(self):
+        return await self.transport.request("POST", "/story/publish")
+
+    async def upload(self):
+        headers, body = multipart("clip.mp4", os.urandom(self.upload_bytes))
+        return await self.transport.request("POST", "/upload", headers=headers, body=body)
+
+
+async def run_workload(transport, name: str, seeded: dict, args, seed_value: int) -> dict:
+    operations = list(MIXED_WEIGHTS) if name == "mixed" else [name]
+    weights = [MIXED_WEIGHTS[op] for op in operations]
+    latencies = {op: [] for op in operations}
+    errors = {op: 0 for op in operations}
+    deadline = time.monotonic() + args.duration
+
+    async def user(index: int):
+        rng = random.Random(seed_value * 1000 + index)
+        client = Client(transport, seeded, rng, args.upload_kb * 1024)
+        while time.monotonic() < deadline:
+            op = rng.choices(operations, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                status, _, _ = await getattr(client, op)()
+            except OSError:
+                status = 599
+            elapsed = time.perf_counter() - t0
+            if status >= 400:
+                errors[op] += 1
+            else:
+                latencies[op].append(elapsed)
+
+    started = time.monotonic()
+    await asyncio.gather(*(user(i) for i in range(args.concurrency)))
+    seconds = time.monotonic() - started
+    everything = [value for values in latencies.values() for value in values]
+    total_errors = sum(errors.values())
+    result = {
+        "seconds": round(seconds, 3),
+        "concurrency": args.concurrency,
+        "requests": len(everything) + total_errors,
+        "throughput_rps": round(len(everything) / seconds, 2),
+        "latency": summarize(everything, total_errors),
+        "operations": {op: summarize(latencies[op], errors[op]) for op in operations},
+    }
+    return result
+
+
+def git_info() -> dict:
+    def git(*command):
+        try:
+            return subprocess.run(["git", *command], cwd=REPO_ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "HEAD"), "subject": git("log", "-1", "--format=%s"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def print_result(name: str, result: dict) -> None:
+    latency = result["latency"]
+    print(f"{name:16s} {result['throughput_rps']:9.1f} req/s  p50 {latency.get('p50_ms', 0):8.1f}  "
+          f"p95 {latency.get('p95_ms', 0):8.1f}  p99 {latency.get('p99_ms', 0):8.1f} ms  errors {latency['errors']}")
+    if len(result["operations"]) > 1:
+        for op, stats in result["operations"].items():
+            print(f"  {op:14s} {stats['count']:7d} ok  p50 {stats.get('p50_ms', 0):8.1f}  "
+                  f"p95 {stats.get('p95_ms', 0):8.1f}  p99 {stats.get('p99_ms', 0):8.1f} ms  errors {stats['errors']}")
+
+
+def compare(base_path: str, new_path: str) -> None:
+    """Print throughput and tail-latency changes between two result files."""
+    base = json.loads(Path(base_path).read_text(encoding="utf-8"))
+    new = json.loads(Path(new_path).read_text(encoding="utf-8"))
+
+    def change(old, current, lower_is_better):
+        if not old or current is None:
+            return "      -"
+        delta = (current - old) / old * 100
+        better = delta < 0 if lower_is_better else delta > 0
+        return f"{delta:+6.1f}%{' ' if abs(delta) < 5 else ('+' if better else '!')}"
+
+    print(f"base {base['git'].get('commit', '')[:10]} {base['git'].get('subject', '')}")
+    print(f"new  {new['git'].get('commit', '')[:10]} {new['git'].get('subject', '')}")
+    if base["config"] != new["config"]:
+        print("warning: the runs used different settings; compare with care")
+    print("(+ better, ! worse by 5% or more)")
+    print(f"{'workload / operation':30s} {'req/s':>16s} {'p50':>16s} {'p95':>16s} {'p99':>16s}")
+    for name, result in new["workloads"].items():
+        old = base["workloads"].get(name)
+        if old is None:
+            continue
+        rows = [(name, old["latency"], result["latency"], old["throughput_rps"], result["throughput_rps"])]
+        if len(result["operations"]) > 1:
+            rows += [(f"  {op}", old["operations"].get(op, {}), stats, None, None) for op, stats in result["operations"].items()]
+        for label, old_stats, stats, old_rps, rps in rows:
+            cells = [f"{rps:8.1f} {change(old_rps, rps, False)}" if rps is not None else " " * 16]
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                cells.append(f"{stats.get(key, 0):8.1f} {change(old_stats.get(key), stats.get(key), True)}")
+            print(f"{label:30s} " + " ".join(cells))
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--posts", type=int, help="override the scale's post count")
+    parser.add_argument("--sections", type=int, help="override the scale's section count")
+    parser.add_argument("--versions", type=int, help="override the scale's version history length")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help=f"comma-separated subset of {','.join(WORKLOADS)}")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per workload")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--upload-kb", type=int, default=256)
+    parser.add_argument("--transport", choices=("uvicorn", "inproc"), default="uvicorn")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    workloads = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+    scale = dict(SCALES[args.scale])
+    for key in ("posts", "sections", "versions"):
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+
+    root = prepare_environment()
+    import migrations
+    migrations.upgrade()
+    rng = random.Random(args.seed)
+    t0 = time.perf_counter()
+    seeded = seed(scale, rng)
+    seed_seconds = time.perf_counter() - t0
+    print(f"seeded {scale} in {seed_seconds:.1f}s ({root})")
+
+    transport = UvicornTransport(args.port) if args.transport == "uvicorn" else InProcessTransport()
+    results = {}
+
+    async def drive():
+        await transport.start()
+        try:
+            for index, name in enumerate(workloads):
+                results[name] = await run_workload(transport, name, seeded, args, args.seed + index)
+                print_result(name, results[name])
+        finally:
+            await transport.stop()
+
+    asyncio.run(drive())
+
+    commit = git_info()
+    report = {
+        "suite": "load_suite",
+        "format": 1,
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": commit,
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "scale": scale,
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "upload_kb": args.upload_kb,
+            "transport": args.transport,
+            "seed": args.seed,
+        },
+        "seed_seconds": round(seed_seconds, 2),
+        "workloads": results,
+    }
+    if args.output:
+        output = Path(args.output)
+    else:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"{stamp}-{commit['commit'][:10] or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Query budget check: a fixed maximum number of SQL statements per endpoint.
+
+The budgets and the check live in tests/test_query_budget.py and run with the
+test suite; this runs just that file, printing every endpoint's result.
+
+Usage: python benchmarks/query_budget.py [extra pytest options]
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+TEST_FILE = Path(__file__).resolve().parent.parent / "tests" / "test_query_budget.py"
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([str(TEST_FILE), "-v", *sys.argv[1:]]))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Stress check: concurrent publishes must yield gap-free, duplicate-free version numbers.
+
+Runs THREADS workers that each publish the same story PER_THREAD times
+through crud.record_story_version, each on its own session, then verifies
+the story's versions are exactly 1..N. Works against any SQLAlchemy URL,
+for example a MySQL-compatible server:
+
+    python benchmarks/stress_publish.py --db-url mysql+pymysql://user:pw@127.0.0.1/news_posts
+
+Defaults to a scratch SQLite file. Exit code 1 on any gap, duplicate or error.
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+
+from harness import prepare_environment
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default=None)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--per-thread", type=int, default=40)
+    parser.add_argument("--sections", type=int, default=20)
+    args = parser.parse_args()
+
+    prepare_environment(db_url=args.db_url)
+    import crud
+    import models
+    import schemas
+    from database import Base, SessionLocal, engine
+    from story_payload import build_story_payload
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    story = crud.create_story(db, schemas.StoryCreate(
+        title="Stress story",
+        sections=[
+            schemas.SectionCreate(type="paragraph", data=f'{{"type":"paragraph","content":"{i}"}}', sort_order=i)
+            for i in range(args.sections)
+        ],
+    ))
+    story_id = story.id
+    payload = build_story_payload(story)
+    db.close()
+
+    errors = []
+    barrier = threading.Barrier(args.threads)
+
+    def worker():
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            for _ in range(args.per_thread):
+                crud.record_story_version(session, story_id, payload)
+        except Exception as exc:  # report, keep other workers going
+            errors.append(repr(exc))
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    db = SessionLocal()
+    numbers = [n for (n,) in db.query(models.StoryVersion.version_number).filter(models.StoryVersion.story_id == story_id)]
+    db.close()
+
+    expected = args.threads * args.per_thread
+    duplicates = [n for n, count in Counter(numbers).items() if count > 1]
+    gaps = sorted(set(range(1, max(numbers, default=0) + 1)) - set(numbers))
+    print(f"dialect:     {engine.dialect.name}")
+    print(f"publishes:   {len(numbers)} / {expected} in {elapsed:.2f}s ({len(numbers) / elapsed:.0f}/s, {args.threads} threads)")
+    print(f"duplicates:  {duplicates[:10] or 'none'}")
+    print(f"gaps:        {gaps[:10] or 'none'}")
+    if errors:
+        print(f"errors:      {len(errors)} e.g. {errors[0]}")
+    ok = not errors and not duplicates and not gaps and len(numbers) == expected
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    run()
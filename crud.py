@@ -1,15 +1,48 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, and_, or_, insert, text
+from sqlalchemy.exc import IntegrityError, OperationalError
 from typing import Optional, List
+from datetime import datetime
 import models, schemas
 import json
+import random
+import time
+from pagination import encode_cursor, decode_cursor
+import version_store
+import media_refs
+import search
+
+def normalize_section_data(data) -> str:
+    """Validate section JSON once on write and return it in compact form.
+
+    The stored text is spliced verbatim into the GET /story response, so it
+    must be a JSON object.  Raises ValueError otherwise.
+    """
+    if isinstance(data, str):
+        try:
+            parsed = json.loads(data)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Section data is not valid JSON: {exc}") from exc
+    else:
+        parsed = data
+    if not isinstance(parsed, dict):
+        raise ValueError("Section data must be a JSON object")
+    return json.dumps(parsed, ensure_ascii=False, separators=(",", ":"))
+
+# Sections are ordered by a gapped integer key.  A new or moved section gets
+# the midpoint between its neighbours, so only that row is written; when the
+# gap is used up the story is renumbered once (reorder_sections).
+SORT_KEY_GAP = 1024
+SORT_KEY_CROWDED = 8
+CROWDED_STORIES = "crowded_story_ids"
+IMPORT_BATCH = 1000
 
 def reorder_sections(db: Session, story_id: int, moving_section: Optional[models.Section] = None, target_index: Optional[int] = None):
-    """Rebuild sequential sort_order, optionally inserting a moving section at target_index."""
+    """Renumber every section with evenly gapped keys, optionally inserting a moving section at target_index."""
     sections = (
         db.query(models.Section)
         .filter(models.Section.story_id == story_id)
-        .order_by(models.Section.sort_order.asc(), models.Section.id.asc())
+        .order_by(models.Section.sort_key.asc(), models.Section.id.asc())
         .all()
     )
     if moving_section:
@@ -18,8 +51,94 @@ def reorder_sections(db: Session, story_id: int, moving_section: Optional[models
         insert_at = min(insert_at, len(sections))
         sections.insert(insert_at, moving_section)
     for idx, section in enumerate(sections):
-        if section.sort_order != idx:
-            section.sort_order = idx
+        key = idx * SORT_KEY_GAP
+        if section.sort_key != key:
+            section.sort_key = key
+        section._position = idx
+
+def _ordered_siblings(db: Session, story_id: int, exclude_id: Optional[int] = None):
+    query = db.query(models.Section.sort_key).filter(models.Section.story_id == story_id)
+    if exclude_id is not None:
+        query = query.filter(models.Section.id != exclude_id)
+    return query
+
+def allocate_sort_key(db: Session, story_id: int, target_index: Optional[int], exclude_id: Optional[int] = None) -> Optional[int]:
+    """Key that places a section at target_index among its siblings, or None if there is no room.
+
+    Reads at most two neighbouring keys through the (story_id, sort_order, id) index.
+    """
+    index = 0 if target_index is None else max(0, int(target_index))
+    siblings = _ordered_siblings(db, story_id, exclude_id)
+    ascending = siblings.order_by(models.Section.sort_key.asc(), models.Section.id.asc())
+    if index == 0:
+        before = None
+        after = ascending.limit(1).scalar()
+    else:
+        keys = [row[0] for row in ascending.offset(index - 1).limit(2).all()]
+        if keys:
+            before = keys[0]
+            after = keys[1] if len(keys) > 1 else None
+        else:
+            # past the end: append after the last section
+            before = siblings.order_by(models.Section.sort_key.desc(), models.Section.id.desc()).limit(1).scalar()
+            after = None
+
+    if before is None and after is None:
+        return 0
+    if before is None:
+        return after - SORT_KEY_GAP
+    if after is None:
+        return before + SORT_KEY_GAP
+    if after - before < 2:
+        return None
+    key = (before + after) // 2
+    if min(key - before, after - key) < SORT_KEY_CROWDED:
+        db.info.setdefault(CROWDED_STORIES, set()).add(story_id)
+    return key
+
+def place_section(db: Session, section: models.Section, target_index: Optional[int]) -> None:
+    """Move (or insert) one section to target_index, writing only that row when possible."""
+    key = allocate_sort_key(db, section.story_id, target_index, exclude_id=section.id)
+    if key is None:
+        reorder_sections(db, section.story_id, section, target_index)
+    else:
+        section.sort_key = key
+    db.flush()
+
+def take_crowded_stories(db: Session) -> set:
+    """Stories whose sort keys ran close together during this session; rebalance them off the request path."""
+    return db.info.pop(CROWDED_STORIES, set())
+
+def rebalance_sections(db: Session, story_id: int) -> None:
+    reorder_sections(db, story_id)
+    db.commit()
+
+def assign_positions(db: Session, sections: List[models.Section], from_start: bool = False) -> List[models.Section]:
+    """Fill in Section.sort_order (the dense 0-based index) for a contiguous run of sections.
+
+    One COUNT per story in the run unless the run starts at the top (from_start).
+    """
+    next_position = {}
+    for section in sections:
+        story_id = section.story_id
+        if story_id not in next_position:
+            next_position[story_id] = 0 if from_start else _count_before(db, section)
+        section._position = next_position[story_id]
+        next_position[story_id] += 1
+    return sections
+
+def _count_before(db: Session, section: models.Section) -> int:
+    return (
+        db.query(func.count(models.Section.id))
+        .filter(
+            models.Section.story_id == section.story_id,
+            or_(
+                models.Section.sort_key < section.sort_key,
+                and_(models.Section.sort_key == section.sort_key, models.Section.id < section.id),
+            ),
+        )
+        .scalar()
+    )
 
 def create_post(db: Session, post: schemas.PostCreate) -> models.Post:
     db_post = models.Post(title=post.title, content=post.content, author=post.author, created_at=post.created_at or None)
@@ -41,11 +160,100 @@ def create_post(db: Session, post: schemas.PostCreate) -> models.Post:
     db.refresh(db_post)
     return db_post
 
-def get_posts(db: Session, skip: int = 0, limit: int = 50):
-    return db.query(models.Post).offset(skip).limit(limit).all()
+def bulk_create_posts(db: Session, posts: List[schemas.PostCreate], batch_size: int = IMPORT_BATCH) -> List[models.Post]:
+    """Create many posts with their media in ONE transaction, returned in input order.
+
+    Posts are inserted with INSERT .. RETURNING where the dialect supports it
+    (SQLite, PostgreSQL, MariaDB) and one plain INSERT per post otherwise
+    (MySQL); media rows follow in executemany batches.  The RETURNING inserts
+    are multi-row statements where SQLAlchemy can match the ids back to the
+    rows (PostgreSQL, MariaDB); SQLite has no such guarantee, so it gets one
+    statement per post, still in the one transaction.
+    """
+    posts_table = models.Post.__table__
+    returning = db.get_bind().dialect.insert_executemany_returning
+    post_ids: List[int] = []
+    try:
+        for start in range(0, len(posts), batch_size):
+            # every row carries every column so the whole chunk is one statement
+            rows = [
+                {"title": p.title, "content": p.content, "author": p.author, "created_at": p.created_at or datetime.utcnow()}
+                for p in posts[start:start + batch_size]
+            ]
+            if returning:
+                # RETURNING order is unspecified by the database; SQLAlchemy matches
+                # the returned rows back to the parameter order for us
+                stmt = insert(posts_table).returning(posts_table.c.id, sort_by_parameter_order=True)
+                post_ids.extend(db.execute(stmt, rows).scalars())
+            else:
+                for row in rows:
+                    post_ids.extend(db.execute(insert(posts_table).values(**row)).inserted_primary_key)
+
+        media_rows = [
+            {
+                "post_id": post_id,
+                "kind": m.kind,
+                "url": m.url,
+                "caption": m.caption,
+                "alt_text": m.alt_text,
+                "credit": m.credit,
+                "sort_order": m.sort_order if m.sort_order is not None else i,
+            }
+            for post, post_id in zip(posts, post_ids)
+            for i, m in enumerate(post.media)
+        ]
+        for start in range(0, len(media_rows), batch_size):
+            db.execute(insert(models.Media.__table__), media_rows[start:start + batch_size])
+        if media_rows:
+            media_refs.index_post_media(db, post_ids)
+        search.index_posts(db, post_ids)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    loaded = {}
+    for start in range(0, len(post_ids), batch_size):
+        chunk = post_ids[start:start + batch_size]
+        for post in db.query(models.Post).options(selectinload(models.Post.media)).filter(models.Post.id.in_(chunk)):
+            loaded[post.id] = post
+    return [loaded[post_id] for post_id in post_ids]
+
+def get_posts(db: Session, skip: int = 0, limit: int = 50, cursor: Optional[str] = None):
+    """Newest posts first, ordered by (created_at, id).
+
+    Pass the ``cursor`` from ``posts_next_cursor`` to continue after the
+    previous page; ``skip`` is kept for old clients but degrades with depth.
+    Raises pagination.InvalidCursor for a malformed cursor.
+    """
+    query = db.query(models.Post).options(selectinload(models.Post.media))
+    if cursor:
+        created_at, post_id = decode_cursor(cursor, (datetime, int))
+        query = query.filter(or_(
+            models.Post.created_at < created_at,
+            and_(models.Post.created_at == created_at, models.Post.id < post_id),
+        ))
+    elif skip:
+        query = query.offset(skip)
+    return (
+        query.order_by(models.Post.created_at.desc(), models.Post.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+def posts_next_cursor(posts: List[models.Post], limit: int) -> Optional[str]:
+    if not posts or len(posts) < limit:
+        return None
+    last = posts[-1]
+    return encode_cursor((last.created_at, last.id))
 
 def get_post(db: Session, post_id: int):
-    return db.query(models.Post).filter(models.Post.id == post_id).first()
+    return (
+        db.query(models.Post)
+        .options(selectinload(models.Post.media))
+        .filter(models.Post.id == post_id)
+        .first()
+    )
 
 def delete_post(db: Session, post_id: int) -> bool:
     post = get_post(db, post_id)
@@ -69,28 +277,107 @@ def update_post(db: Session, post_id: int, payload: schemas.PostUpdate):
     if payload.created_at is not None:
         post.created_at = payload.created_at
 
-    # full replace media if provided
     if payload.media is not None:
-        # delete old
-        for m in list(post.media):
-            db.delete(m)
-        # add new
-        for i, m in enumerate(payload.media):
-            media = models.Media(
-                post_id=post.id,
-                kind=m.kind,
-                url=m.url,
-                caption=m.caption,
-                alt_text=m.alt_text,
-                credit=m.credit,
-                sort_order=m.sort_order if m.sort_order is not None else i
-            )
-            db.add(media)
+        try:
+            reconcile_media(db, post, payload.media)
+        except ValueError:
+            db.rollback()
+            raise
 
     db.commit()
     db.refresh(post)
     return post
 
+MEDIA_FIELDS = ("kind", "url", "caption", "alt_text", "credit", "sort_order")
+
+def reconcile_media(db: Session, post: models.Post, incoming: List[schemas.MediaUpdate]) -> None:
+    """Make post.media equal to ``incoming`` while touching as few rows as possible.
+
+    Each item is matched to an existing row by id, else by url; matched rows
+    are updated only in the fields that differ, unmatched items are inserted
+    and rows nobody matched are deleted.  Raises ValueError for an id that
+    does not belong to the post.
+    """
+    unmatched = {media.id: media for media in post.media}
+    by_url = {}
+    for media in post.media:
+        by_url.setdefault(media.url, []).append(media)
+
+    claims = []
+    for item in incoming:
+        if item.id is not None:
+            media = unmatched.pop(item.id, None)
+            if media is None:
+                raise ValueError(f"media {item.id} does not belong to post {post.id}")
+            claims.append(media)
+        else:
+            claims.append(None)
+    # second pass so an explicit id always wins over a url match
+    for i, item in enumerate(incoming):
+        if claims[i] is None:
+            candidates = [media for media in by_url.get(item.url, ()) if media.id in unmatched]
+            if candidates:
+                claims[i] = unmatched.pop(candidates[0].id)
+
+    for i, (item, media) in enumerate(zip(incoming, claims)):
+        values = {field: getattr(item, field) for field in MEDIA_FIELDS}
+        if values["sort_order"] is None:
+            values["sort_order"] = i
+        if media is None:
+            post.media.append(models.Media(**values))
+            continue
+        for field, value in values.items():
+            if getattr(media, field) != value:
+                setattr(media, field, value)
+    for media in unmatched.values():
+        post.media.remove(media)  # delete-orphan removes the row
+
+def apply_media_operations(db: Session, post_id: int, operations: List[schemas.MediaOperation]) -> Optional[List[models.Media]]:
+    """Apply ordered create/update/delete operations to a post's media in one transaction.
+
+    Returns the post's media, None if the post does not exist; raises
+    ValueError (after rolling back) for an invalid operation.
+    """
+    post = get_post(db, post_id)
+    if not post:
+        return None
+    by_id = {media.id: media for media in post.media}
+
+    try:
+        for op_index, op in enumerate(operations):
+            if op.op == "create":
+                if op.kind is None or op.url is None:
+                    raise ValueError(f"operation {op_index}: create requires kind and url")
+                sort_order = op.sort_order
+                if sort_order is None:
+                    sort_order = max((media.sort_order for media in post.media), default=-1) + 1
+                post.media.append(models.Media(
+                    kind=op.kind, url=op.url, caption=op.caption, alt_text=op.alt_text,
+                    credit=op.credit, sort_order=sort_order,
+                ))
+                continue
+            media = by_id.get(op.id) if op.id is not None else None
+            if media is None:
+                raise ValueError(f"operation {op_index}: media {op.id} not found in post {post_id}")
+            if op.op == "delete":
+                del by_id[media.id]
+                post.media.remove(media)
+            else:
+                # only the fields the client sent; caption/alt_text/credit may be cleared with null
+                for field in MEDIA_FIELDS:
+                    if field not in op.model_fields_set:
+                        continue
+                    value = getattr(op, field)
+                    if value is None and field in ("kind", "url", "sort_order"):
+                        raise ValueError(f"operation {op_index}: {field} cannot be null")
+                    setattr(media, field, value)
+        db.commit()
+    except ValueError:
+        db.rollback()
+        raise
+    db.refresh(post)
+    return post.media
+
 # Story CRUD
 def create_story(db: Session, story: schemas.StoryCreate) -> models.Story:
     db_story = models.Story(
@@ -105,11 +392,12 @@ def create_story(db: Session, story: schemas.StoryCreate) -> models.Story:
     
     # add sections
     for i, section in enumerate(story.sections):
+        position = section.sort_order if section.sort_order is not None else i
         db_section = models.Section(
             story_id=db_story.id,
             type=section.type,
-            data=section.data,
-            sort_order=section.sort_order if section.sort_order is not None else i
+            data=normalize_section_data(section.data),
+            sort_key=position * SORT_KEY_GAP
         )
         db.add(db_section)
     
@@ -117,14 +405,84 @@ def create_story(db: Session, story: schemas.StoryCreate) -> models.Story:
     db.refresh(db_story)
     return db_story
 
+def import_story_stream(db: Session, events, batch_size: int = IMPORT_BATCH) -> models.Story:
+    """Create a story from ``story_stream.iter_story_json`` events in one transaction.
+
+    Sections are inserted in executemany batches as they are parsed, never
+    held as ORM objects, so memory does not grow with the number of sections.
+    """
+    db_story = models.Story(title="Story", version="1.0", standfirst="")
+    db.add(db_story)
+    db.flush()  # so we have db_story.id
+
+    fields = {}
+    batch = []
+    position = 0
+    try:
+        for kind, value in events:
+            if kind == "field":
+                key, field_value = value
+                fields[key] = field_value
+                continue
+            batch.append({
+                "story_id": db_story.id,
+                "type": value.get("type", "unknown"),
+                "data": normalize_section_data(value),
+                "sort_key": position * SORT_KEY_GAP,
+            })
+            position += 1
+            if len(batch) >= batch_size:
+                db.execute(insert(models.Section), batch)
+                batch = []
+        if batch:
+            db.execute(insert(models.Section), batch)
+
+        theme = fields.get("theme") or {}
+        db_story.title = fields.get("title") or "Story"
+        db_story.standfirst = fields.get("standfirst") or ""
+        db_story.version = fields.get("version", "1.0")
+        db_story.theme_font = theme.get("font")
+        db_story.theme_primary_color = theme.get("primaryColor")
+        media_refs.index_story_sections(db, db_story.id)
+        search.index_story_sections(db, db_story.id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return db_story
+
+def iter_story_sections(db: Session, story_id: int, batch_size: int = IMPORT_BATCH):
+    """Yield (id, type, data) rows for every section of a story in order, streaming from the database."""
+    query = (
+        db.query(models.Section.id, models.Section.type, models.Section.data)
+        .filter(models.Section.story_id == story_id)
+        .order_by(models.Section.sort_key.asc(), models.Section.id.asc())
+        .yield_per(batch_size)
+    )
+    for row in query:
+        yield row
+
 def get_stories(db: Session, skip: int = 0, limit: int = 50):
     return db.query(models.Story).offset(skip).limit(limit).all()
 
 def get_story(db: Session, story_id: int):
-    return db.query(models.Story).filter(models.Story.id == story_id).first()
+    return (
+        db.query(models.Story)
+        .options(selectinload(models.Story.sections))
+        .filter(models.Story.id == story_id)
+        .first()
+    )
 
 def get_latest_story(db: Session):
-    return db.query(models.Story).order_by(models.Story.created_at.desc()).first()
+    return (
+        db.query(models.Story)
+        .options(selectinload(models.Story.sections))
+        .order_by(models.Story.created_at.desc())
+        .first()
+    )
+
+def get_latest_story_id(db: Session) -> Optional[int]:
+    return db.query(models.Story.id).order_by(models.Story.created_at.desc()).limit(1).scalar()
 
 def delete_story(db: Session, story_id: int) -> bool:
     story = get_story(db, story_id)
@@ -153,66 +511,197 @@ def update_story(db: Session, story_id: int, payload: schemas.StoryUpdate) -> Op
     return story
 
 # Section CRUD
-def get_sections(db: Session, story_id: Optional[int] = None, skip: int = 0, limit: int = 100):
+def get_sections(db: Session, story_id: Optional[int] = None, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    """Sections in story order, keyset-paginated via ``cursor``."""
     query = db.query(models.Section)
     if story_id is not None:
         query = query.filter(models.Section.story_id == story_id)
-    return query.order_by(models.Section.sort_order).offset(skip).limit(limit).all()
+    if cursor:
+        sort_key, section_id = decode_cursor(cursor, (int, int))
+        query = query.filter(or_(
+            models.Section.sort_key > sort_key,
+            and_(models.Section.sort_key == sort_key, models.Section.id > section_id),
+        ))
+    elif skip:
+        query = query.offset(skip)
+    sections = (
+        query.order_by(models.Section.sort_key.asc(), models.Section.id.asc())
+        .limit(limit)
+        .all()
+    )
+    return assign_positions(db, sections, from_start=not cursor and not skip)
+
+def sections_next_cursor(sections: List[models.Section], limit: int) -> Optional[str]:
+    if not sections or len(sections) < limit:
+        return None
+    last = sections[-1]
+    return encode_cursor((last.sort_key, last.id))
 
 def get_section(db: Session, section_id: int):
-    return db.query(models.Section).filter(models.Section.id == section_id).first()
+    section = db.query(models.Section).filter(models.Section.id == section_id).first()
+    if section:
+        assign_positions(db, [section])
+    return section
 
 def create_section(db: Session, section: schemas.SectionCreate, story_id: int) -> models.Section:
+    sort_key = allocate_sort_key(db, story_id, section.sort_order)
     db_section = models.Section(
         story_id=story_id,
         type=section.type,
-        data=section.data,
-        sort_order=section.sort_order
+        data=normalize_section_data(section.data),
+        sort_key=sort_key if sort_key is not None else 0
     )
     db.add(db_section)
-    db.flush()
-    reorder_sections(db, story_id, db_section, section.sort_order)
+    if sort_key is None:
+        db.flush()
+        reorder_sections(db, story_id, db_section, section.sort_order)
     db.commit()
     db.refresh(db_section)
-    return db_section
+    return assign_positions(db, [db_section])[0]
 
 def update_section(db: Session, section_id: int, section_type: str = None, data: str = None, sort_order: int = None) -> models.Section:
     section = get_section(db, section_id)
     if not section:
         return None
+    if data is not None:
+        data = normalize_section_data(data)
     if section_type is not None:
         section.type = section_type
     if data is not None:
         section.data = data
     if sort_order is not None:
-        section.sort_order = sort_order
-        db.flush()
-        reorder_sections(db, section.story_id, section, sort_order)
+        place_section(db, section, sort_order)
     else:
         db.flush()
     db.commit()
     db.refresh(section)
-    return section
+    return assign_positions(db, [section])[0]
 
 def delete_section(db: Session, section_id: int) -> Optional[int]:
     section = get_section(db, section_id)
     if not section:
         return None
     story_id = section.story_id
+    # Positions of the remaining sections close up on read; no renumbering needed.
     db.delete(section)
-    db.flush()
-    reorder_sections(db, story_id)
     db.commit()
     return story_id
 
-# ========== Story versioning ==========
-def list_story_versions(db: Session, story_id: int) -> List[models.StoryVersion]:
-    return (
-        db.query(models.StoryVersion)
-        .filter(models.StoryVersion.story_id == story_id)
-        .order_by(models.StoryVersion.version_number.desc())
+def apply_section_batch(db: Session, story_id: int, operations: List[schemas.SectionOperation]) -> Optional[List[models.Section]]:
+    """Apply ordered create/update/delete/move operations to a story in one transaction.
+
+    Positions are resolved in memory, then a single pass writes sort keys only
+    for rows that are new or out of order.  Returns the story's sections, None
+    if the story does not exist; raises ValueError (after rolling back) for an
+    invalid operation.
+    """
+    if db.query(models.Story.id).filter(models.Story.id == story_id).scalar() is None:
+        return None
+    ordered = (
+        db.query(models.Section)
+        .filter(models.Section.story_id == story_id)
+        .order_by(models.Section.sort_key.asc(), models.Section.id.asc())
         .all()
     )
+    by_id = {section.id: section for section in ordered}
+    moved = set()
+
+    def insert_at(section, target_index):
+        index = len(ordered) if target_index is None else min(max(0, target_index), len(ordered))
+        ordered.insert(index, section)
+        moved.add(id(section))
+
+    def existing(op_index, op):
+        section = by_id.get(op.id) if op.id is not None else None
+        if section is None:
+            raise ValueError(f"operation {op_index}: section {op.id} not found in story {story_id}")
+        return section
+
+    try:
+        for op_index, op in enumerate(operations):
+            if op.op == "create":
+                if op.type is None or op.data is None:
+                    raise ValueError(f"operation {op_index}: create requires type and data")
+                section = models.Section(story_id=story_id, type=op.type, data=normalize_section_data(op.data), sort_key=0)
+                db.add(section)
+                insert_at(section, op.sort_order)
+            elif op.op == "delete":
+                section = existing(op_index, op)
+                ordered.remove(section)
+                del by_id[section.id]
+                db.delete(section)
+            else:
+                section = existing(op_index, op)
+                if op.op == "move" and op.sort_order is None:
+                    raise ValueError(f"operation {op_index}: move requires sort_order")
+                if op.data is not None:
+                    section.data = normalize_section_data(op.data)
+                if op.type is not None:
+                    section.type = op.type
+                if op.sort_order is not None:
+                    ordered.remove(section)
+                    insert_at(section, op.sort_order)
+    except ValueError:
+        db.rollback()
+        raise
+
+    _rekey_sections(ordered, moved)
+    db.commit()
+    return get_sections(db, story_id=story_id, limit=len(ordered) or 1)
+
+def _rekey_sections(ordered: List[models.Section], moved: set) -> None:
+    """Single reorder pass: keep keys that are already increasing, fill the runs between them."""
+    anchors = []  # indexes whose current key is kept
+    last_key = None
+    for index, section in enumerate(ordered):
+        if id(section) in moved:
+            continue
+        if last_key is None or section.sort_key > last_key:
+            anchors.append(index)
+            last_key = section.sort_key
+
+    bounds = [-1] + anchors + [len(ordered)]
+    for lo_index, hi_index in zip(bounds, bounds[1:]):
+        run = ordered[lo_index + 1:hi_index]
+        if not run:
+            continue
+        lo = ordered[lo_index].sort_key if lo_index >= 0 else None
+        hi = ordered[hi_index].sort_key if hi_index < len(ordered) else None
+        if lo is None and hi is None:
+            keys = [i * SORT_KEY_GAP for i in range(len(run))]
+        elif hi is None:
+            keys = [lo + (i + 1) * SORT_KEY_GAP for i in range(len(run))]
+        elif lo is None:
+            keys = [hi - (len(run) - i) * SORT_KEY_GAP for i in range(len(run))]
+        else:
+            step = (hi - lo) // (len(run) + 1)
+            if step < 1:
+                # not enough room between the anchors: renumber the whole story
+                for index, section in enumerate(ordered):
+                    if section.sort_key != index * SORT_KEY_GAP:
+                        section.sort_key = index * SORT_KEY_GAP
+                return
+            keys = [lo + (i + 1) * step for i in range(len(run))]
+        for section, key in zip(run, keys):
+            if section.sort_key != key:
+                section.sort_key = key
+
+# ========== Story versioning ==========
+def list_story_versions(db: Session, story_id: int, limit: Optional[int] = None, cursor: Optional[str] = None) -> List[models.StoryVersion]:
+    """Newest versions first; payloads stay deferred.  ``cursor`` continues after a previous page."""
+    query = db.query(models.StoryVersion).filter(models.StoryVersion.story_id == story_id)
+    if cursor:
+        (version_number,) = decode_cursor(cursor, (int,))
+        query = query.filter(models.StoryVersion.version_number < version_number)
+    query = query.order_by(models.StoryVersion.version_number.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def versions_next_cursor(versions: List[models.StoryVersion], limit: int) -> Optional[str]:
+    if not versions or len(versions) < limit:
+        return None
+    return encode_cursor((versions[-1].version_number,))
 
 def get_story_version(db: Session, story_id: int, version_number: Optional[int] = None) -> Optional[models.StoryVersion]:
     query = db.query(models.StoryVersion).filter(models.StoryVersion.story_id == story_id)
@@ -221,9 +710,105 @@ def get_story_version(db: Session, story_id: int, version_number: Optional[int]
         return query.first()
     return query.order_by(models.StoryVersion.version_number.desc()).first()
 
+# keeps IN (...) lists and executemany batches well under driver parameter limits
+BLOB_BATCH = 500
+
+def get_story_version_payload(db: Session, story_id: int, version_number: int) -> Optional[str]:
+    """Return the serialized payload of one version, reassembled from section blobs if needed."""
+    stored = (
+        db.query(models.StoryVersion.payload)
+        .filter(
+            models.StoryVersion.story_id == story_id,
+            models.StoryVersion.version_number == version_number,
+        )
+        .scalar()
+    )
+    if stored is None or not version_store.is_manifest(stored):
+        return stored
+    prefix, hashes, suffix = version_store.unpack_manifest(stored)
+    blobs = {}
+    unique = list(set(hashes))
+    for start in range(0, len(unique), BLOB_BATCH):
+        chunk = unique[start:start + BLOB_BATCH]
+        blobs.update(
+            db.query(models.SectionBlob.hash, models.SectionBlob.data)
+            .filter(models.SectionBlob.hash.in_(chunk))
+            .all()
+        )
+    return version_store.assemble(prefix, hashes, blobs, suffix)
+
+def _store_section_blobs(db: Session, blobs: dict) -> None:
+    """Insert the blobs that are not stored yet; concurrent publishers may race on the same hash."""
+    hashes = list(blobs)
+    existing = set()
+    for start in range(0, len(hashes), BLOB_BATCH):
+        chunk = hashes[start:start + BLOB_BATCH]
+        existing.update(
+            h for (h,) in db.query(models.SectionBlob.hash).filter(models.SectionBlob.hash.in_(chunk))
+        )
+    missing = [{"hash": h, "data": blobs[h]} for h in hashes if h not in existing]
+    if not missing:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(models.SectionBlob).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        stmt = pg_insert(models.SectionBlob).on_conflict_do_nothing()
+    elif dialect in ("mysql", "mariadb"):
+        stmt = insert(models.SectionBlob).prefix_with("IGNORE")
+    else:
+        stmt = insert(models.SectionBlob)
+    for start in range(0, len(missing), BLOB_BATCH):
+        db.execute(stmt, missing[start:start + BLOB_BATCH])
+
+# Version numbers are max + 1 per story, guarded by the unique
+# (story_id, version_number) index.  Publishers first take a write lock on the
+# story row (a no-op UPDATE: a row lock on MySQL/PostgreSQL, the database write
+# lock on SQLite) so concurrent publishes queue instead of racing; anything
+# that still collides rolls back and retries with a fresh read.  Nothing is
+# committed by a failed attempt, so numbers stay gap-free.
+PUBLISH_ATTEMPTS = 10
+
+VERSION_UNIQUE_CONSTRAINT = "uq_story_versions_story_version"
+# SQLite reports the columns rather than the constraint name
+_SQLITE_VERSION_CONFLICT = "UNIQUE constraint failed: story_versions.story_id, story_versions.version_number"
+# MySQL lock wait timeout / deadlock, PostgreSQL deadlock / serialization failure
+_RETRYABLE_LOCK_CODES = (1205, 1213, "40P01", "40001")
+
+def _retryable_publish_error(exc: Exception) -> bool:
+    """A lost race for the next version number or a lock conflict; anything else is a real error."""
+    orig = getattr(exc, "orig", None)
+    if orig is None:
+        return False
+    message = str(orig)
+    if isinstance(exc, IntegrityError):
+        constraint = getattr(getattr(orig, "diag", None), "constraint_name", None)
+        return (
+            constraint == VERSION_UNIQUE_CONSTRAINT
+            or VERSION_UNIQUE_CONSTRAINT in message
+            or _SQLITE_VERSION_CONFLICT in message
+        )
+    code = getattr(orig, "pgcode", None) or (orig.args[0] if orig.args else None)
+    return code in _RETRYABLE_LOCK_CODES or "database is locked" in message or "deadlock" in message.lower()
+
 def record_story_version(db: Session, story_id: int, payload: dict):
+    """Store a snapshot of ``payload``; unchanged sections are shared with earlier versions."""
     if payload is None:
         return None
+    for attempt in range(PUBLISH_ATTEMPTS):
+        try:
+            return _insert_story_version(db, story_id, payload)
+        except (IntegrityError, OperationalError) as exc:
+            db.rollback()
+            if attempt == PUBLISH_ATTEMPTS - 1 or not _retryable_publish_error(exc):
+                raise
+            time.sleep(random.uniform(0, 0.005 * (2 ** attempt)))
+
+def _insert_story_version(db: Session, story_id: int, payload: dict) -> models.StoryVersion:
+    # raw SQL so Story.updated_at's onupdate does not fire
+    db.execute(text("UPDATE stories SET id = id WHERE id = :story_id"), {"story_id": story_id})
     max_version = (
         db.query(func.max(models.StoryVersion.version_number))
         .filter(models.StoryVersion.story_id == story_id)
@@ -232,11 +817,17 @@ def record_story_version(db: Session, story_id: int, payload: dict):
     next_version = max_version + 1
     snapshot_payload = dict(payload)
     snapshot_payload.setdefault("versionNumber", next_version)
+    full_text, manifest, blobs = version_store.pack_snapshot(snapshot_payload)
+    _store_section_blobs(db, blobs)
     version_entry = models.StoryVersion(
         story_id=story_id,
         version_number=next_version,
-        payload=json.dumps(snapshot_payload, ensure_ascii=False)
+        payload=manifest,
+        payload_size=len(full_text.encode("utf-8")),
+        payload_hash=version_store.content_hash(full_text)
     )
+    # the reassembled document, so callers never need to rebuild it (media_refs indexes it too)
+    version_entry.full_payload = full_text
     db.add(version_entry)
     db.commit()
     db.refresh(version_entry)
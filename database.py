@@ -1,8 +1,163 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-DB_URL = os.getenv("DB_URL", "sqlite:///./app.db")
-engine = create_engine(DB_URL, pool_pre_ping=True)
+# DB_URL wins; DATABASE_URL is accepted too (older .env files and most PaaS set that name)
+DB_URL = os.getenv("DB_URL") or os.getenv("DATABASE_URL") or "sqlite:///./app.db"
+# optional read replica: GET requests are served from it (see read_session)
+DB_REPLICA_URL = os.getenv("DB_REPLICA_URL") or None
+# the same databases through an asyncio driver; derived from the URLs above unless set
+DB_ASYNC_URL = os.getenv("DB_ASYNC_URL") or None
+DB_ASYNC_REPLICA_URL = os.getenv("DB_ASYNC_REPLICA_URL") or None
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# below MySQL's wait_timeout so the server never closes a connection the pool still holds
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# after a commit this process reads from the primary for this long, to ride out replica lag
+DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", 5))
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+
+def is_sqlite(url) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url) -> dict:
+    """create_engine() keyword arguments for ``url`` from the DB_POOL_* settings."""
+    url = make_url(url)
+    options = {"pool_pre_ping": True, "pool_recycle": DB_POOL_RECYCLE}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options  # in-memory databases use a single-connection pool
+    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """WAL so readers never block the writer (and vice versa), NORMAL sync (durable
+    at checkpoints, no fsync per commit), mmap reads and a busy timeout instead of
+    immediate "database is locked" errors."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    finally:
+        cursor.close()
+
+
+# sync driver -> its asyncio counterpart
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_url(url):
+    """``url`` with its driver swapped for the asyncio one (``sqlite`` -> ``sqlite+aiosqlite``)."""
+    url = make_url(url)
+    if url.get_dialect().is_async:
+        return url
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"no asyncio driver configured for {backend!r}; set DB_ASYNC_URL")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def make_engine(url):
+    bind = create_engine(url, **engine_options(url))
+    if is_sqlite(url):
+        event.listen(bind, "connect", _sqlite_pragmas)
+    return bind
+
+
+def make_async_engine(url):
+    options = engine_options(url)
+    if is_sqlite(url) and "pool_size" in options:
+        # aiosqlite defaults to NullPool (a new connection and thread per checkout)
+        options["poolclass"] = AsyncAdaptedQueuePool
+    bind = create_async_engine(url, **options)
+    if is_sqlite(url):
+        event.listen(bind.sync_engine, "connect", _sqlite_pragmas)
+    return bind
+
+
+class ReadOnlySession(Session):
+    """Session class of the replica sessionmakers; flushing changes raises."""
+
+
+@event.listens_for(ReadOnlySession, "before_flush")
+def _refuse_replica_writes(session, flush_context, instances) -> None:
+    if session.new or session.dirty or session.deleted:
+        raise RuntimeError("read sessions are read-only; use SessionLocal for writes")
+
+
+engine = make_engine(DB_URL)
+replica_engine = make_engine(DB_REPLICA_URL) if DB_REPLICA_URL else engine
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine, class_=ReadOnlySession)
+Base = declarative_base()
+
+# Async engines for the read-only endpoints: waiting on the database suspends a
+# coroutine instead of holding one of the threadpool's worker threads.
+async_engine = make_async_engine(DB_ASYNC_URL or async_url(DB_URL))
+if DB_ASYNC_REPLICA_URL or DB_REPLICA_URL:
+    async_replica_engine = make_async_engine(DB_ASYNC_REPLICA_URL or async_url(DB_REPLICA_URL))
+else:
+    async_replica_engine = async_engine
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_replica_engine, autoflush=False, expire_on_commit=False, sync_session_class=ReadOnlySession
+)
+
+_last_commit = float("-inf")
+
+
+@event.listens_for(engine, "commit")
+def _remember_commit(conn) -> None:
+    global _last_commit
+    _last_commit = time.monotonic()
+
+
+def read_session() -> Session:
+    """A session for read-only work: on the replica when one is configured and this
+    process has not committed within DB_REPLICA_STICKY_SECONDS, else on the primary."""
+    if replica_engine is engine or time.monotonic() - _last_commit < DB_REPLICA_STICKY_SECONDS:
+        return SessionLocal()
+    return ReadSessionLocal()
+
+
+def async_read_session() -> AsyncSession:
+    """``read_session`` for the async endpoints."""
+    if async_replica_engine is async_engine or time.monotonic() - _last_commit < DB_REPLICA_STICKY_SECONDS:
+        return AsyncSessionLocal()
+    return AsyncReadSessionLocal()
+
+
+@contextmanager
+def count_queries(bind=None):
+    """Collect every SQL statement executed on ``bind`` (default: the sync and async
+    primary engines) inside the block."""
+    binds = [bind] if bind is not None else [engine, async_engine.sync_engine]
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for target in binds:
+        event.listen(target, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        for target in binds:
+            event.remove(target, "before_cursor_execute", _record)
@@ -0,0 +1,234 @@
+"""Responsive image derivatives (resized widths, WebP/AVIF) built in a process pool.
+
+For an original at ``MEDIA_ROOT/<path>`` the derivatives are cached next to it
+in ``<path>.derivatives/``: ``w640.webp``, ``w640.jpg`` ... plus a
+``manifest.json`` describing them, including ready-made ``srcset`` strings
+per MIME type.  The manifest is served by the media mount at
+``<original url>.derivatives/manifest.json``, so anything holding an image URL
+(``Media.url``, ``imagegif``/``imagegroup`` sections) can find its srcset.
+
+Uploads only *schedule* work (``derivatives.schedule``); resizing happens in
+worker processes, never on the request path.  Pillow is optional: without it
+scheduling is a no-op.
+
+Backfill existing media with ``python image_derivatives.py``.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import media_store
+
+try:  # Pillow is optional; without it originals are simply served as they are
+    from PIL import Image, ImageOps, features
+except ImportError:  # pragma: no cover - depends on the deployment image
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = tuple(
+    int(width) for width in os.getenv("IMAGE_DERIVATIVE_WIDTHS", "320,640,960,1280,1920").split(",") if width.strip()
+)
+IMAGE_WORKERS = int(os.getenv("IMAGE_DERIVATIVE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+DERIVATIVE_SUFFIX = media_store.DERIVATIVE_SUFFIX
+MANIFEST_NAME = "manifest.json"
+SOURCE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+
+# format name -> (file extension, MIME type, Pillow save options)
+FORMATS = {
+    "avif": (".avif", "image/avif", {"quality": 55}),
+    "webp": (".webp", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": (".jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+    "png": (".png", "image/png", {"optimize": True}),
+}
+
+
+def is_image(relative_path: Path) -> bool:
+    return relative_path.suffix.lower() in SOURCE_EXTENSIONS and DERIVATIVE_SUFFIX not in relative_path.as_posix()
+
+
+def derivatives_dir(relative_path: Path) -> Path:
+    return relative_path.parent / f"{relative_path.name}{DERIVATIVE_SUFFIX}"
+
+
+def manifest_path(relative_path: Path) -> Path:
+    return derivatives_dir(relative_path) / MANIFEST_NAME
+
+
+def relative_path_for_url(url: str) -> Optional[Path]:
+    """MEDIA_ROOT-relative path of a media URL (absolute or /media/...), None if it is not ours."""
+    prefix = f"{media_store.MEDIA_BASE_URL}{media_store.MEDIA_URL_PREFIX.rstrip('/')}/"
+    if url.startswith(prefix):
+        url = url[len(prefix):]
+    elif url.startswith(media_store.MEDIA_URL_PREFIX.rstrip("/") + "/"):
+        url = url[len(media_store.MEDIA_URL_PREFIX.rstrip("/")) + 1:]
+    else:
+        return None
+    try:
+        return media_store.media_relative_path(url.split("?", 1)[0])
+    except ValueError:
+        return None
+
+
+def load_manifest(relative_path: Path) -> Optional[dict]:
+    try:
+        return json.loads((media_store.MEDIA_ROOT / manifest_path(relative_path)).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _output_formats(source_format: str) -> List[str]:
+    formats = [name for name in ("avif", "webp") if features.check(name)]
+    # plus a fallback in the original's family for browsers without either
+    formats.append("png" if source_format in ("PNG", "GIF") else "jpeg")
+    return formats
+
+
+def _write_image(image, path: Path, fmt: str) -> int:
+    tmp = path.with_name(f".{path.name}.tmp")
+    _, _, options = FORMATS[fmt]
+    if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.save(tmp, format=fmt.upper(), **options)
+    os.replace(tmp, path)
+    return path.stat().st_size
+
+
+def source_digest(root: Path, relative_path: str) -> str:
+    """SHA-256 of an original: read from a content-addressed path, hashed otherwise."""
+    path = Path(relative_path)
+    digest = media_store.content_digest(path)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    with open(root / path, "rb") as source:
+        for chunk in iter(lambda: source.read(media_store.CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def build_derivatives(media_root: str, relative_path: str, widths: Sequence[int] = DERIVATIVE_WIDTHS, url_prefix: str = "") -> Optional[dict]:
+    """Create the derivatives and manifest for one original; runs in a worker process.
+
+    Returns the manifest, or None for files that are not (static) images.
+    Derivatives are reused while the manifest records the original's current
+    digest.  Not its mtime: re-uploading identical bytes touches the original
+    (media GC grace period) without changing it.
+    """
+    root = Path(media_root)
+    source = root / relative_path
+    out_dir = root / derivatives_dir(Path(relative_path))
+    manifest_file = out_dir / MANIFEST_NAME
+    digest = source_digest(root, relative_path)
+    try:
+        existing = json.loads(manifest_file.read_text(encoding="utf-8"))
+        if existing.get("sourceSha256") == digest:
+            return existing
+    except (OSError, ValueError):
+        pass
+
+    with Image.open(source) as opened:
+        if getattr(opened, "is_animated", False):
+            return None  # resizing would drop the animation
+        source_format = opened.format
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+    width, height = image.size
+    out_dir.mkdir(parents=True, exist_ok=True)
+    base_url = f"{url_prefix}/{derivatives_dir(Path(relative_path)).as_posix()}"
+
+    variants = []
+    for target in sorted(set(w for w in widths if w < width)) + [width]:
+        resized = image if target == width else image.resize(
+            (target, max(1, round(height * target / width))), Image.LANCZOS
+        )
+        for fmt in _output_formats(source_format):
+            extension, mime, _ = FORMATS[fmt]
+            if target == width and fmt.upper() == source_format:
+                # the original itself is the full-width fallback
+                url, size = f"{url_prefix}/{Path(relative_path).as_posix()}", source.stat().st_size
+            else:
+                name = f"w{target}{extension}"
+                url, size = f"{base_url}/{name}", _write_image(resized, out_dir / name, fmt)
+            variants.append({"width": target, "height": resized.size[1], "type": mime, "url": url, "bytes": size})
+
+    srcset: Dict[str, str] = {}
+    for variant in variants:
+        entry = f"{variant['url']} {variant['width']}w"
+        srcset[variant["type"]] = f"{srcset[variant['type']]}, {entry}" if variant["type"] in srcset else entry
+    manifest = {
+        "source": f"{url_prefix}/{Path(relative_path).as_posix()}",
+        "sourceSha256": digest,
+        "width": width,
+        "height": height,
+        "variants": variants,
+        "srcset": srcset,
+    }
+    tmp = manifest_file.with_name(f".{MANIFEST_NAME}.tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, manifest_file)
+    return manifest
+
+
+class DerivativeGenerator:
+    """Submits derivative jobs to a lazily started process pool, one job per file at a time."""
+
+    def __init__(self, workers: int = IMAGE_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._running: Dict[str, Future] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None and self.workers > 0
+
+    def schedule(self, relative_path: Path) -> Optional[Future]:
+        """Queue derivative generation for an uploaded file; returns immediately."""
+        if not self.enabled or not is_image(relative_path):
+            return None
+        key = relative_path.as_posix()
+        with self._lock:
+            if key in self._running:
+                return self._running[key]
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            future = self._executor.submit(
+                build_derivatives, str(media_store.MEDIA_ROOT), key, DERIVATIVE_WIDTHS, media_store.MEDIA_URL_PREFIX.rstrip("/")
+            )
+            self._running[key] = future
+        future.add_done_callback(lambda done: self._finished(key, done))
+        return future
+
+    def _finished(self, key: str, future: Future) -> None:
+        with self._lock:
+            self._running.pop(key, None)
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("image derivatives failed for %s: %s", key, future.exception())
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+derivatives = DerivativeGenerator()
+
+
+if __name__ == "__main__":
+    # backfill: build missing derivatives for everything already under MEDIA_ROOT
+    logging.basicConfig(level=logging.INFO)
+    pending = []
+    for path in sorted(media_store.MEDIA_ROOT.rglob("*")):
+        relative = path.relative_to(media_store.MEDIA_ROOT)
+        if path.is_file() and is_image(relative) and not relative.parts[0].startswith("."):
+            pending.append(derivatives.schedule(relative))
+    done = sum(1 for future in pending if future is not None and future.exception() is None)
+    derivatives.shutdown()
+    logger.info("derivatives ready for %d of %d images", done, len(pending))
@@ -1,22 +1,59 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Header, Request, Response, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from pathlib import Path, PurePosixPath
+from typing import List, Optional, Union
+from contextlib import asynccontextmanager
+from pathlib import Path
+import asyncio
 import json
-import os
-import shutil
-import uuid
 import logging
-from datetime import datetime
-import models, schemas, crud
-from database import SessionLocal, engine, Base
+import os
+import metrics, migrations, schemas, crud, async_crud, search, story_import, media_store, media_refs, upload_sessions, image_derivatives
+from database import Base, SessionLocal, engine, replica_engine, read_session, async_read_session, async_engine, async_replica_engine
+from media_store import MEDIA_ROOT, MEDIA_URL_PREFIX, MEDIA_BASE_URL
+from image_derivatives import derivatives
+from media_files import MediaFiles
+from pagination import InvalidCursor
+from story_payload import build_story_payload, render_story_json
+from story_stream import iter_story_json
+from story_sync import StoryJsonSyncer
+from story_cache import story_cache, version_cache, etag_matches, negotiate_encoding, RenderedStory, EncodedVersion
+
+logger = logging.getLogger(__name__)
+
+# 启动时自动迁移（开发默认开启）；多实例生产环境设 AUTO_MIGRATE=0，部署时执行 python -m migrations
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1") not in ("0", "false", "no")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if AUTO_MIGRATE:
+        await run_in_threadpool(migrations.upgrade, engine)
+    sweeper = asyncio.create_task(sweep_upload_sessions())
+    yield
+    sweeper.cancel()
+    derivatives.shutdown(wait=False)
+    # write out any story.json sync still waiting in its debounce window
+    story_syncer.stop()
+    await async_engine.dispose()
+    if async_replica_engine is not async_engine:
+        await async_replica_engine.dispose()
+
+UPLOAD_SESSION_SWEEP_INTERVAL = float(os.getenv("UPLOAD_SESSION_SWEEP_INTERVAL", 600))
+
+async def sweep_upload_sessions():
+    """Periodically delete resumable upload sessions that were abandoned."""
+    while True:
+        try:
+            await run_in_threadpool(upload_sessions.remove_expired)
+        except Exception:
+            logger.exception("upload session cleanup failed")
+        await asyncio.sleep(UPLOAD_SESSION_SWEEP_INTERVAL)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Posts Backend", version="1.0.0")
+app = FastAPI(title="Posts Backend", version="1.0.0", lifespan=lifespan)
 
 backend_dir = Path(__file__).resolve().parent
 project_root = backend_dir.parent
@@ -53,63 +90,41 @@ def _discover_default_story_path() -> Path:
 _default_story_json_path = _discover_default_story_path()
 STORY_JSON_PATH = Path(os.getenv("STORY_JSON_PATH", _default_story_json_path))
 PUBLIC_DIR = STORY_JSON_PATH.parent
-MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", backend_dir / "static_media")).resolve()
-MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
-MEDIA_URL_PREFIX = os.getenv("MEDIA_URL_PREFIX", "/media")
-if not MEDIA_URL_PREFIX.startswith("/"):
-    MEDIA_URL_PREFIX = f"/{MEDIA_URL_PREFIX}"
-MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "http://localhost:8888").rstrip("/")
-app.mount(MEDIA_URL_PREFIX, StaticFiles(directory=MEDIA_ROOT), name="media")
-
-
-def build_story_payload(story: models.Story) -> dict:
-    """Assemble a story payload compatible with story.json."""
-    payload = {
-        "id": story.id,
-        "version": story.version or "1.0",
-        "title": story.title or "Story",
-        "standfirst": story.standfirst or "",
-        "theme": {
-            "font": story.theme_font or "Montserrat",
-            "primaryColor": story.theme_primary_color or "#00007a",
-        },
-        "sections": [],
-    }
 
-    for section in story.sections:
-        raw_data = section.data or "{}"
-        try:
-            parsed = json.loads(raw_data)
-        except json.JSONDecodeError:
-            parsed = {"type": section.type}
-        payload["sections"].append(parsed)
 
-    return payload
+def story_response(rendered: RenderedStory, if_none_match: Optional[str]) -> Response:
+    headers = {"ETag": rendered.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, rendered.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=rendered.body, media_type="application/json", headers=headers)
 
 
-def sync_story_json(db: Session, story_id: int) -> Optional[dict]:
-    """Write the current story state back to story.json for static fallback."""
-    story = crud.get_story(db, story_id)
-    if not story:
-        return None
+def version_response(encoded: EncodedVersion, accept_encoding: Optional[str], if_none_match: Optional[str]) -> Response:
+    """Serve a published snapshot; its bytes never change so clients may cache it forever."""
+    coding = negotiate_encoding(accept_encoding, encoded.bodies)
+    etag = encoded.etag if coding == "identity" else f'{encoded.etag[:-1]}-{coding}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if coding != "identity":
+        headers["Content-Encoding"] = coding
+    return Response(content=encoded.bodies[coding], media_type="application/json", headers=headers)
 
-    payload = build_story_payload(story)
 
-    if not STORY_JSON_PATH.exists():
-        logging.getLogger(__name__).warning(
-            "story.json not found at %s; skipping sync to avoid creating new files",
-            STORY_JSON_PATH,
-        )
-        return payload
+story_syncer = StoryJsonSyncer(
+    SessionLocal,
+    STORY_JSON_PATH,
+    delay=float(os.getenv("STORY_JSON_SYNC_DELAY", "0.5")),
+)
 
-    try:
-        STORY_JSON_PATH.write_text(
-            json.dumps(payload, ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
-    except OSError as exc:
-        logging.getLogger(__name__).warning("Failed to sync story.json: %s", exc)
-    return payload
+
+def sync_story_json(story_id: int) -> None:
+    """Queue a write-behind refresh of story.json (the static fallback) for this story."""
+    story_syncer.schedule(story_id)
 
 # CORS for Vite dev (5173) and local file preview
 app.add_middleware(
@@ -118,31 +133,72 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-def get_db():
-    db = SessionLocal()
+# 每个路由的延迟 / SQL 次数与耗时 / 响应大小，见 GET /metrics
+for _engine in {engine, replica_engine, async_engine.sync_engine, async_replica_engine.sync_engine}:
+    metrics.instrument_engine(_engine)
+metrics.instrument_models(Base)
+app.add_middleware(metrics.MetricsMiddleware)
+
+READ_METHODS = {"GET", "HEAD"}
+
+def get_db(request: Request):
+    """GET/HEAD handlers only read, so they may be served by the read replica."""
+    db = read_session() if request.method in READ_METHODS else SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db():
+    """AsyncSession for the read-only async endpoints (replica-routed like get_db for GET)."""
+    async with async_read_session() as db:
+        yield db
+
+def rebalance_story_sections(story_id: int) -> None:
+    """Background task: respace a story's section sort keys once they run out of room."""
+    db = SessionLocal()
+    try:
+        crud.rebalance_sections(db, story_id)
+    finally:
+        db.close()
+
+
+def schedule_rebalance(db: Session, background_tasks: BackgroundTasks) -> None:
+    for story_id in crud.take_crowded_stories(db):
+        background_tasks.add_task(rebalance_story_sections, story_id)
+
 @app.get("/healthz")
 def health():
     return {"ok": True}
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus text exposition of this worker's request, SQL and render metrics."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/posts", response_model=schemas.PostRead)
 def create_post(post: schemas.PostCreate, db: Session = Depends(get_db)):
     created = crud.create_post(db, post)
     return created
 
 @app.get("/posts", response_model=List[schemas.PostRead])
-def list_posts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_posts(db, skip=skip, limit=limit)
+async def list_posts(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """Newest posts first; follow the X-Next-Cursor response header for the next page."""
+    try:
+        posts = await async_crud.get_posts(db, skip=skip, limit=limit, cursor=cursor)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    next_cursor = crud.posts_next_cursor(posts, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return posts
 
 @app.get("/posts/{post_id}", response_model=schemas.PostRead)
-def read_post(post_id: int, db: Session = Depends(get_db)):
-    post = crud.get_post(db, post_id)
+async def read_post(post_id: int, db: AsyncSession = Depends(get_async_db)):
+    post = await async_crud.get_post(db, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     return post
@@ -150,11 +206,25 @@ def read_post(post_id: int, db: Session = Depends(get_db)):
 @app.put("/posts/{post_id}", response_model=schemas.PostRead)
 @app.patch("/posts/{post_id}", response_model=schemas.PostRead)
 def update_post(post_id: int, payload: schemas.PostUpdate, db: Session = Depends(get_db)):
-    post = crud.update_post(db, post_id, payload)
+    try:
+        post = crud.update_post(db, post_id, payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     return post
 
+@app.patch("/posts/{post_id}/media", response_model=List[schemas.MediaRead])
+def patch_post_media(post_id: int, batch: schemas.MediaBatch, db: Session = Depends(get_db)):
+    """Create/update/delete individual media items of a post in one transaction."""
+    try:
+        media = crud.apply_media_operations(db, post_id, batch.operations)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if media is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return media
+
 @app.delete("/posts/{post_id}")
 def delete_post(post_id: int, db: Session = Depends(get_db)):
     ok = crud.delete_post(db, post_id)
@@ -164,33 +234,50 @@ def delete_post(post_id: int, db: Session = Depends(get_db)):
 
 # Sections CRUD API
 @app.get("/sections", response_model=List[schemas.SectionRead])
-def list_sections(story_id: Optional[int] = None, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_sections(db, story_id=story_id, skip=skip, limit=limit)
+async def list_sections(response: Response, story_id: Optional[int] = None, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    try:
+        sections = await async_crud.get_sections(db, story_id=story_id, skip=skip, limit=limit, cursor=cursor)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    next_cursor = crud.sections_next_cursor(sections, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return sections
 
 @app.get("/sections/{section_id}", response_model=schemas.SectionRead)
-def read_section(section_id: int, db: Session = Depends(get_db)):
-    section = crud.get_section(db, section_id)
+async def read_section(section_id: int, db: AsyncSession = Depends(get_async_db)):
+    section = await async_crud.get_section(db, section_id)
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
     return section
 
 @app.post("/sections", response_model=schemas.SectionRead)
-def create_section(section: schemas.SectionCreate, story_id: int, db: Session = Depends(get_db)):
-    created = crud.create_section(db, section, story_id)
-    sync_story_json(db, created.story_id)
+def create_section(section: schemas.SectionCreate, story_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    try:
+        created = crud.create_section(db, section, story_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    schedule_rebalance(db, background_tasks)
+    story_cache.invalidate(created.story_id)
+    sync_story_json(created.story_id)
     return created
 
 @app.patch("/sections/{section_id}", response_model=schemas.SectionRead)
-def update_section_endpoint(section_id: int, section_update: dict, db: Session = Depends(get_db)):
-    section = crud.update_section(
-        db, section_id,
-        section_type=section_update.get("type"),
-        data=section_update.get("data"),
-        sort_order=section_update.get("sort_order")
-    )
+def update_section_endpoint(section_id: int, section_update: dict, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    try:
+        section = crud.update_section(
+            db, section_id,
+            section_type=section_update.get("type"),
+            data=section_update.get("data"),
+            sort_order=section_update.get("sort_order")
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
-    sync_story_json(db, section.story_id)
+    schedule_rebalance(db, background_tasks)
+    story_cache.invalidate(section.story_id)
+    sync_story_json(section.story_id)
     return section
 
 @app.delete("/sections/{section_id}")
@@ -198,33 +285,102 @@ def delete_section_endpoint(section_id: int, db: Session = Depends(get_db)):
     story_id = crud.delete_section(db, section_id)
     if story_id is None:
         raise HTTPException(status_code=404, detail="Section not found")
-    sync_story_json(db, story_id)
+    story_cache.invalidate(story_id)
+    sync_story_json(story_id)
     return {"deleted": True, "id": section_id}
 
+@app.post("/stories/{story_id}/sections:batch", response_model=List[schemas.SectionRead])
+def batch_sections(story_id: int, batch: schemas.SectionBatch, db: Session = Depends(get_db)):
+    """Apply many section edits in one transaction with a single story.json sync."""
+    try:
+        sections = crud.apply_section_batch(db, story_id, batch.operations)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if sections is None:
+        raise HTTPException(status_code=404, detail="Story not found")
+    story_cache.invalidate(story_id)
+    sync_story_json(story_id)
+    return sections
+
 # Get full story data (compatible with story.json format)
 @app.get("/story")
-def get_story(version: Optional[int] = None, db: Session = Depends(get_db)):
+async def get_story(
+    version: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
     """获取完整的 story 数据（兼容 story.json 格式）"""
-    story = crud.get_latest_story(db)
+    if version is not None:
+        story_id = story_cache.latest_story_id
+        if story_id is None:
+            generation = story_cache.latest_generation()
+            story_id = await async_crud.get_latest_story_id(db)
+            if story_id is None:
+                raise HTTPException(status_code=404, detail="No story found")
+            story_cache.remember_latest(story_id, generation)
+        encoded = version_cache.get(story_id, version)
+        if encoded is None:
+            # Snapshots are stored already serialized; only compress them, never parse.
+            raw_payload = await async_crud.get_story_version_payload(db, story_id, version)
+            if raw_payload is None:
+                raise HTTPException(status_code=404, detail="Version not found")
+            # gzip -9 / brotli 11 of a whole snapshot is too slow for the event loop
+            encoded = await run_in_threadpool(version_cache.put, story_id, version, raw_payload.encode("utf-8"))
+        return version_response(encoded, accept_encoding, if_none_match)
+
+    story_id = story_cache.latest_story_id
+    if story_id is not None:
+        cached = story_cache.get(story_id)
+        if cached:
+            return story_response(cached, if_none_match)
+    else:
+        generation = story_cache.latest_generation()
+        story_id = await async_crud.get_latest_story_id(db)
+        if story_id is None:
+            raise HTTPException(status_code=404, detail="No story found")
+        story_cache.remember_latest(story_id, generation)
+
+    # Snapshot the change counter before reading so a concurrent edit is never cached as current.
+    revision = story_cache.revision(story_id)
+    story = await async_crud.get_story(db, story_id)
     if not story:
+        story_cache.forget_latest()
         raise HTTPException(status_code=404, detail="No story found")
-
-    if version is not None:
-        snapshot = crud.get_story_version(db, story.id, version)
-        if not snapshot:
-            raise HTTPException(status_code=404, detail="Version not found")
-        try:
-            payload = json.loads(snapshot.payload)
-            payload["versionNumber"] = snapshot.version_number
-            return payload
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=500, detail="Corrupted version payload")
-
-    latest_snapshot = crud.get_story_version(db, story.id)
-    payload = build_story_payload(story)
-    if latest_snapshot:
-        payload["versionNumber"] = latest_snapshot.version_number
-    return payload
+    latest_snapshot = await async_crud.get_story_version(db, story.id)
+    version_number = latest_snapshot.version_number if latest_snapshot else None
+    rendered = story_cache.put(story.id, revision, render_story_json(story, version_number))
+    return story_response(rendered, if_none_match)
+
+@app.get("/story/versions", response_model=List[schemas.StoryVersionSummary])
+async def list_story_versions(response: Response, limit: int = 50, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """Version history of the latest story, newest first, without loading any payload."""
+    story_id = story_cache.latest_story_id
+    if story_id is None:
+        story_id = await async_crud.get_latest_story_id(db)
+        if story_id is None:
+            raise HTTPException(status_code=404, detail="No story found")
+    try:
+        versions = await async_crud.list_story_versions(db, story_id, limit=limit, cursor=cursor)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    next_cursor = crud.versions_next_cursor(versions, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return versions
+
+# 全文检索：posts 的标题/正文 + sections 中的文字字段
+@app.get("/search", response_model=List[schemas.SearchHit])
+async def search_content(response: Response, q: str, type: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """Ranked hits with highlighted snippets; ``type`` is post or section.  Follow X-Next-Cursor for more."""
+    try:
+        hits = await async_crud.search(db, q, type, limit, cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    next_cursor = search.next_cursor(hits, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return hits
 
 @app.post("/story/publish")
 def publish_story(db: Session = Depends(get_db)):
@@ -235,6 +391,8 @@ def publish_story(db: Session = Depends(get_db)):
     version_entry = crud.record_story_version(db, story.id, payload)
     if not version_entry:
         raise HTTPException(status_code=500, detail="Unable to create version")
+    story_cache.invalidate(story.id)
+    version_cache.put(story.id, version_entry.version_number, version_entry.full_payload.encode("utf-8"))
     return {
         "versionNumber": version_entry.version_number,
         "createdAt": version_entry.created_at
@@ -245,255 +403,218 @@ def update_story(story_id: int, payload: schemas.StoryUpdate, db: Session = Depe
     updated = crud.update_story(db, story_id, payload)
     if not updated:
         raise HTTPException(status_code=404, detail="Story not found")
-    sync_story_json(db, story_id)
+    story_cache.invalidate(story_id)
+    sync_story_json(story_id)
     return build_story_payload(updated)
 
 # Optional: Import story.json from the frontend and convert sections into posts
-@app.post("/import/story", response_model=List[schemas.PostRead])
-def import_story(frontend_root: Optional[str] = None, db: Session = Depends(get_db)):
+@app.post("/import/story", response_model=Union[List[schemas.PostRead], schemas.ImportSummary])
+def import_story(frontend_root: Optional[str] = None, dry_run: bool = False, db: Session = Depends(get_db)):
+    """One Post per section, written in a single transaction; dry_run only reports counts."""
+    story = load_story_file(frontend_root)
+    return import_posts(db, story_import.section_posts(story), dry_run)
+
+def load_story_file(frontend_root: Optional[str]) -> dict:
     # If not provided, assume /mnt/data/project/.../frontend/public/story.json in this environment
-    if not frontend_root:
-        frontend_root = "F:/work/edit-web/frontend/public"
-    story_path = Path(frontend_root) / "story.json"
+    story_path = story_import.story_json_path(frontend_root)
     if not story_path.exists():
         raise HTTPException(status_code=404, detail=f"story.json not found at {story_path}")
-    story = json.loads(story_path.read_text(encoding="utf-8"))
-
-    results = []
-    # Strategy: one Post per section with all textual content, collect media URLs.
-    sections = story.get("sections", [])
-    for idx, sec in enumerate(sections):
-        media_list = []
-        text_blob = []
-
-        t = sec.get("type")
-        if t in ("paragraph",):
-            content = sec.get("content", "")
-            text_blob.append(content)
-        if t in ("pullquote",):
-            text_blob.append(sec.get("text", ""))
-            if sec.get("cite"):
-                text_blob.append(f"— {sec.get('cite')}")
-        if t in ("imagegif",):
-            src = sec.get("src")
-            if src:
-                media_list.append({"kind": "gif" if src.lower().endswith(('.gif')) else "image", "url": src, "caption": sec.get("caption"), "alt_text": sec.get("alt", ""), "credit": sec.get("credit", ""), "sort_order": 0})
-        if t in ("video",):
-            src = sec.get("src")
-            if src:
-                media_list.append({"kind": "video", "url": src, "caption": sec.get("caption"), "alt_text": sec.get("alt", ""), "credit": sec.get("credit", ""), "sort_order": 0})
-        if t in ("imagegroup",):
-            imgs = sec.get("images", [])
-            for i, im in enumerate(imgs):
-                media_list.append({"kind": "image", "url": im.get("src"), "caption": im.get("caption"), "alt_text": im.get("alt", ""), "credit": im.get("credit", ""), "sort_order": i})
-
-        title = story.get("title", f"Section {idx+1}")
-        content_joined = "\n\n".join([s for s in text_blob if s])
-
-        created = crud.create_post(db, schemas.PostCreate(
-            title=title,
-            content=content_joined or None,
-            media=[schemas.MediaCreate(**m) for m in media_list]
-        ))
-        results.append(created)
-
-    return results
+    return json.loads(story_path.read_text(encoding="utf-8"))
+
+def import_posts(db: Session, posts: List[schemas.PostCreate], dry_run: bool):
+    if dry_run:
+        return schemas.ImportSummary(posts=len(posts), media=sum(len(p.media) for p in posts))
+    return crud.bulk_create_posts(db, posts)
 
 # Import story.json from uploaded file
 @app.post("/import/story_upload", response_model=schemas.StoryRead)
 async def import_story_upload(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """从上传的文件导入 story.json"""
+    """从上传的文件导入 story.json
+
+    上传内容按流解析，sections 分批写入数据库，内存占用与文件大小无关。
+    """
     try:
-        # 读取上传的文件
-        content = await file.read()
-        story_json = json.loads(content.decode('utf-8'))
-        
-        title = story_json.get("title") or "Story"
-        standfirst = story_json.get("standfirst") or ""
-        version = story_json.get("version", "1.0")
-        theme = story_json.get("theme", {})
-        theme_font = theme.get("font")
-        theme_primary_color = theme.get("primaryColor")
-        sections = story_json.get("sections", [])
-        
-        # 创建 SectionCreate 对象数组
-        section_creates = []
-        for i, section in enumerate(sections):
-            section_creates.append(schemas.SectionCreate(
-                type=section.get("type", "unknown"),
-                data=json.dumps(section, ensure_ascii=False),
-                sort_order=i
-            ))
-        
-        # 创建 Story
-        created = crud.create_story(db, schemas.StoryCreate(
-            title=title,
-            version=version,
-            standfirst=standfirst,
-            theme_font=theme_font,
-            theme_primary_color=theme_primary_color,
-            sections=section_creates
-        ))
-        sync_story_json(db, created.id)
-        return created
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+        head = await run_in_threadpool(import_story_head, db, iter_story_json(file.file))
+    except (json.JSONDecodeError, UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid story.json: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    story_cache.forget_latest()
+    sync_story_json(head.id)
+    return StreamingResponse(stream_story_read(head), media_type="application/json")
+
+def import_story_head(db: Session, payload) -> schemas.StoryRead:
+    """Import the story and read back its columns while still in the worker thread.
+
+    The commit expires ``created``; touching its attributes on the event loop
+    would run a blocking refresh there.  Sections are streamed by
+    ``stream_story_read`` instead of being loaded through the relationship.
+    """
+    created = crud.import_story_stream(db, payload)
+    return schemas.StoryRead(
+        id=created.id,
+        title=created.title,
+        version=created.version,
+        standfirst=created.standfirst,
+        theme_font=created.theme_font,
+        theme_primary_color=created.theme_primary_color,
+        created_at=created.created_at,
+        updated_at=created.updated_at,
+    )
+
+def stream_story_read(head: schemas.StoryRead):
+    """Serialize a StoryRead section by section, reading sections from a session of its own."""
+    text = head.model_dump_json()
+    yield text[:-len("[]}")] + "["
+    db = SessionLocal()
+    try:
+        for position, (section_id, section_type, data) in enumerate(crud.iter_story_sections(db, head.id)):
+            section = schemas.SectionRead(
+                id=section_id, story_id=head.id, type=section_type, data=data, sort_order=position
+            )
+            yield ("," if position else "") + section.model_dump_json()
+    finally:
+        db.close()
+    yield "]}"
 
 # Import entire story.json as ONE post (merge all sections)
-@app.post("/import/story_merged", response_model=schemas.PostRead)
-def import_story_merged(frontend_root: Optional[str] = None, db: Session = Depends(get_db)):
-    if not frontend_root:
-        frontend_root = "F:/work/edit-web/frontend/public"
-    story_path = Path(frontend_root) / "story.json"
-    if not story_path.exists():
-        raise HTTPException(status_code=404, detail=f"story.json not found at {story_path}")
-    story = json.loads(story_path.read_text(encoding="utf-8"))
-
-    title = story.get("title") or "Story"
-    standfirst = story.get("standfirst") or ""
-    version = story.get("version", "1.0")
-    theme = story.get("theme", {})
-    theme_font = theme.get("font")
-    theme_primary_color = theme.get("primaryColor")
-    sections = story.get("sections", [])
-    
-    # 将 sections 转换为 JSON 字符串存储
-    sections_json = json.dumps(sections, ensure_ascii=False)
-
-    # Collect all text and media with stable order
-    text_parts = []
-    media_list = []
-    m_index = 0
-
-    # include standfirst up front if present
-    if standfirst:
-        text_parts.append(standfirst)
-
-    for sec in sections:
-        t = sec.get("type")
-        # text-like
-        if t == "paragraph":
-            content = sec.get("content", "")
-            if content:
-                text_parts.append(content)
-        elif t == "pullquote":
-            txt = sec.get("text", "")
-            cite = sec.get("cite") or ""
-            if txt:
-                if cite:
-                    text_parts.append(f"{txt}\n— {cite}")
-                else:
-                    text_parts.append(txt)
-        # media-like
-        elif t == "imagegif":
-            src = sec.get("src")
-            if src:
-                media_list.append({
-                    "kind": "gif" if src.lower().endswith(('.gif',)) else "image",
-                    "url": src,
-                    "caption": sec.get("caption"),
-                    "alt_text": sec.get("alt", ""),
-                    "credit": sec.get("credit", ""),
-                    "sort_order": m_index
-                })
-                m_index += 1
-        elif t == "video":
-            src = sec.get("src")
-            if src:
-                media_list.append({
-                    "kind": "video",
-                    "url": src,
-                    "caption": sec.get("caption"),
-                    "alt_text": sec.get("alt", ""),
-                    "credit": sec.get("credit", ""),
-                    "sort_order": m_index
-                })
-                m_index += 1
-        elif t == "imagegroup":
-            imgs = sec.get("images", [])
-            for im in imgs:
-                src = im.get("src")
-                if not src: 
-                    continue
-                media_list.append({
-                    "kind": "image",
-                    "url": src,
-                    "caption": im.get("caption"),
-                    "alt_text": im.get("alt", ""),
-                    "credit": im.get("credit", ""),
-                    "sort_order": m_index
-                })
-                m_index += 1
-        # ignore other unknown types gracefully
-
-    merged_text = "\n\n".join([s for s in text_parts if s])
-    created = crud.create_post(db, schemas.PostCreate(
-        title=title,
-        content=merged_text or None,
-        media=[schemas.MediaCreate(**m) for m in media_list],
-        version=version,
-        standfirst=standfirst,
-        theme_font=theme_font,
-        theme_primary_color=theme_primary_color,
-        sections_data=sections_json
-    ))
-    return created
+@app.post("/import/story_merged", response_model=Union[schemas.PostRead, schemas.ImportSummary])
+def import_story_merged(frontend_root: Optional[str] = None, dry_run: bool = False, db: Session = Depends(get_db)):
+    story = load_story_file(frontend_root)
+    created = import_posts(db, [story_import.merged_post(story)], dry_run)
+    return created if dry_run else created[0]
 
 # 文件上传 API
 @app.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
-    target_path: Optional[str] = Form(None)
+    target_path: Optional[str] = Form(None),
+    sha256: Optional[str] = Form(None),
 ):
     """保存上传的文件到 MEDIA_ROOT，并返回可直接访问的 URL。
 
     - file: 上传的二进制文件
-    - target_path: （可选）相对路径，例如 /media/uploads/foo.jpg。若未提供则自动生成。
+    - target_path: （可选）相对路径，例如 /media/uploads/foo.jpg。若未提供则按内容 SHA-256 存放，相同内容只存一份。
+    - sha256: （可选）客户端算好的内容哈希；已存在相同内容时直接返回已有 URL，不再写盘。
+
+    文件按块写入，并在线程池中执行，不阻塞事件循环。
     """
+    extension = media_store.clean_extension(file.filename)
     try:
-        original_name = Path(file.filename or "upload")
-        extension = original_name.suffix
-
-        if target_path:
-            pure_target = PurePosixPath(target_path.lstrip('/'))
-            if any(part == '..' for part in pure_target.parts):
-                raise HTTPException(status_code=400, detail="非法目标路径")
-            if not pure_target.parts:
-                raise HTTPException(status_code=400, detail="目标路径不能为空")
-            relative_path = Path(*pure_target.parts)
-        else:
-            today = datetime.utcnow()
-            generated_name = f"{uuid.uuid4().hex}{extension}"
-            relative_path = Path("uploads") / today.strftime("%Y/%m/%d") / generated_name
-
-        full_path = (MEDIA_ROOT / relative_path).resolve()
-        if MEDIA_ROOT not in full_path.parents and full_path != MEDIA_ROOT:
-            raise HTTPException(status_code=400, detail="目标路径不在允许的 media 目录内")
-
-        full_path.parent.mkdir(parents=True, exist_ok=True)
-
-        with open(full_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        media_prefix = MEDIA_URL_PREFIX.rstrip("/")
-        if media_prefix:
-            public_path = f"{media_prefix}/{relative_path.as_posix()}"
-        else:
-            public_path = f"/{relative_path.as_posix()}"
-        public_url = f"{MEDIA_BASE_URL}{public_path}"
-
-        return {
-            "success": True,
-            "url": public_url,
-            "path": f"/{relative_path.as_posix()}",
-            "filename": full_path.name
-        }
-    except HTTPException:
-        raise
+        relative_path = media_store.target_relative_path(target_path) if target_path else None
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    try:
+        if relative_path is None and sha256:
+            existing = await run_in_threadpool(media_store.find_content, sha256, extension)
+            if existing:
+                return stored_media_response(existing)
+        stored = await run_in_threadpool(media_store.save_stream, file.file, extension, relative_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"文件上传失败: {str(e)}")
+    return stored_media_response(stored)
+
+def stored_media_response(stored: media_store.StoredFile) -> dict:
+    """/upload result; images also get their responsive derivatives queued (built off the request path)."""
+    result = media_store.upload_result(stored)
+    if derivatives.schedule(stored.relative_path) is not None:
+        manifest = image_derivatives.manifest_path(stored.relative_path)
+        result["derivatives"] = f"{MEDIA_BASE_URL}{media_store.public_path(manifest)}"
+    return result
+
+@app.get("/derivatives")
+async def read_derivatives(url: str):
+    """图片的响应式派生图清单（srcset）；尚未生成时返回 404。"""
+    relative_path = image_derivatives.relative_path_for_url(url)
+    manifest = await run_in_threadpool(image_derivatives.load_manifest, relative_path) if relative_path else None
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="No derivatives for this media URL")
+    return manifest
+
+# 可续传的分片上传（大视频）
+@app.post("/uploads", response_model=schemas.UploadSessionRead, status_code=201)
+async def create_upload_session(payload: schemas.UploadSessionCreate):
+    """创建上传会话；之后用 PUT + Content-Range 以任意顺序上传分片，最后 finalize。"""
+    try:
+        return await run_in_threadpool(upload_sessions.create_session, payload.filename, payload.size, payload.target_path)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+async def _existing_session(upload_id: str) -> upload_sessions.UploadSession:
+    session = await run_in_threadpool(upload_sessions.get_session, upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+@app.get("/uploads/{upload_id}", response_model=schemas.UploadSessionRead)
+async def read_upload_session(upload_id: str):
+    """已收到的字节区间，用于断点续传。"""
+    return await _existing_session(upload_id)
+
+@app.put("/uploads/{upload_id}", response_model=schemas.UploadSessionRead)
+async def put_upload_range(upload_id: str, request: Request, content_range: Optional[str] = Header(None)):
+    """写入一个分片：Content-Range: bytes <start>-<end>/<total>，请求体即该区间的字节。"""
+    session = await _existing_session(upload_id)
+    try:
+        start, end, total = upload_sessions.parse_content_range(content_range)
+        handle = await run_in_threadpool(upload_sessions.open_range, session, start, end, total)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    written = 0
+    pending = bytearray()
+    try:
+        async for chunk in request.stream():
+            written += len(chunk)
+            if written > end - start:
+                raise HTTPException(status_code=400, detail="body is longer than its Content-Range")
+            pending += chunk
+            if len(pending) >= media_store.CHUNK_SIZE:
+                await run_in_threadpool(handle.write, bytes(pending))
+                pending.clear()
+        if written != end - start:
+            raise HTTPException(status_code=400, detail=f"expected {end - start} bytes, received {written}")
+        await run_in_threadpool(handle.write, bytes(pending))
+    except BaseException:
+        await run_in_threadpool(handle.close)
+        raise
+    await run_in_threadpool(upload_sessions.commit_range, session, handle, start, end)
+    return await _existing_session(upload_id)
+
+@app.post("/uploads/{upload_id}/finalize")
+async def finalize_upload_session(upload_id: str):
+    """所有分片到齐后放入 MEDIA_ROOT，返回与 /upload 相同结构的结果。"""
+    session = await _existing_session(upload_id)
+    try:
+        stored = await run_in_threadpool(upload_sessions.finalize_session, session)
+    except upload_sessions.UploadSessionError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    except FileNotFoundError:
+        # finalized concurrently by another request
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return stored_media_response(stored)
+
+@app.delete("/uploads/{upload_id}")
+async def delete_upload_session(upload_id: str):
+    if not await run_in_threadpool(upload_sessions.delete_session, upload_id):
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return {"deleted": True, "id": upload_id}
+
+# 媒体文件被哪些内容引用（section / media / 历史版本）
+@app.get(MEDIA_URL_PREFIX.rstrip("/") + "/{path:path}/references", response_model=schemas.MediaReferences)
+def media_references(path: str, db: Session = Depends(get_db)):
+    relative_path = media_refs.normalize_path(path)
+    if relative_path is None:
+        raise HTTPException(status_code=400, detail="Invalid media path")
+    return schemas.MediaReferences(
+        path=relative_path,
+        exists=(MEDIA_ROOT / relative_path).is_file(),
+        references=media_refs.references_to(db, relative_path),
+    )
+
+# mounted last so the API routes under the same prefix above take precedence
+app.mount(MEDIA_URL_PREFIX, MediaFiles(directory=MEDIA_ROOT), name="media")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,127 @@
+"""Serving files under MEDIA_ROOT.
+
+``MediaFiles`` is the ``StaticFiles`` mount for ``MEDIA_URL_PREFIX`` with:
+
+- long-lived ``Cache-Control: immutable`` for paths whose bytes never change
+  (content-addressed ``sha256/...``, random-named ``uploads/YYYY/MM/DD/...``
+  and their ``.derivatives``), revalidation for everything else;
+- a strong ETag taken from the digest for content-addressed files;
+- precompressed ``.br`` / ``.gz`` sidecars when the client accepts them;
+- byte ranges (Starlette's ``FileResponse``) read in large blocks, or handed
+  to the server as ``http.response.zerocopysend`` (sendfile) when the ASGI
+  server offers that extension;
+- nothing under dot-directories (``.incoming`` upload scratch space).
+"""
+import os
+import re
+from mimetypes import guess_type
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+from story_cache import negotiate_encoding
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+BLOCK_SIZE = 1024 * 1024
+SIDECARS = {"br": ".br", "gzip": ".gz"}
+
+_CONTENT_ADDRESSED = re.compile(r"^sha256/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})[^/]*(/|$)")
+_DATED_UPLOAD = re.compile(r"^uploads/\d{4}/\d{2}/\d{2}/[0-9a-f]{32}[^/]*(/|$)")
+
+
+def is_immutable(path: str) -> bool:
+    """True for media paths whose content can never change under the same URL."""
+    return bool(_CONTENT_ADDRESSED.match(path) or _DATED_UPLOAD.match(path))
+
+
+class MediaFileResponse(FileResponse):
+    """FileResponse that reads in 1 MiB blocks and uses zero-copy send when the server supports it."""
+
+    chunk_size = BLOCK_SIZE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self._zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+        await super().__call__(scope, receive, send)
+
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        if not self._zerocopy or send_header_only:
+            return await super()._handle_simple(send, send_header_only)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await self._zerocopy_send(send, 0, int(self.headers["content-length"]))
+
+    async def _handle_single_range(self, send: Send, start: int, end: int, file_size: int, send_header_only: bool) -> None:
+        if not self._zerocopy or send_header_only:
+            return await super()._handle_single_range(send, start, end, file_size, send_header_only)
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        await self._zerocopy_send(send, start, end - start)
+
+    async def _zerocopy_send(self, send: Send, offset: int, count: int) -> None:
+        with open(self.path, "rb") as file:
+            await send({
+                "type": "http.response.zerocopysend",
+                "file": file.fileno(),
+                "offset": offset,
+                "count": count,
+                "more_body": False,
+            })
+
+
+class MediaFiles(StaticFiles):
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if any(part.startswith(".") for part in path.replace("\\", "/").split("/")):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        path = os.path.relpath(full_path, os.path.realpath(self.directory)).replace(os.sep, "/")
+        immutable = is_immutable(path)
+        headers = {"cache-control": IMMUTABLE if immutable else REVALIDATE}
+        match = _CONTENT_ADDRESSED.match(path)
+        if match and match.group(2) == "":
+            headers["etag"] = f'"{match.group(1)}"'
+
+        coding, sidecar = self._sidecar(full_path, request_headers)
+        if coding != "identity":
+            # the etag is per representation; ranges are only offered on the identity body
+            response = MediaFileResponse(
+                sidecar[0], status_code=status_code, stat_result=sidecar[1],
+                media_type=guess_type(full_path)[0] or "text/plain",
+            )
+            base_etag = headers.pop("etag", None) or response.headers["etag"]
+            response.headers["etag"] = f'{base_etag[:-1]}-{coding}"'
+            response.headers["content-encoding"] = coding
+            response.headers["vary"] = "Accept-Encoding"
+            del response.headers["accept-ranges"]
+            response.headers.update(headers)
+        else:
+            response = MediaFileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+            if self._has_sidecars(full_path):
+                response.headers["vary"] = "Accept-Encoding"
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def _sidecar(self, full_path, request_headers: Headers):
+        """(coding, (path, stat)) of the best precompressed sibling, or ("identity", None)."""
+        if "range" in request_headers:
+            return "identity", None
+        available = {}
+        for coding, suffix in SIDECARS.items():
+            try:
+                available[coding] = (full_path + suffix, os.stat(full_path + suffix))
+            except OSError:
+                continue
+        if not available:
+            return "identity", None
+        coding = negotiate_encoding(request_headers.get("accept-encoding"), available)
+        return coding, available.get(coding)
+
+    def _has_sidecars(self, full_path) -> bool:
+        return any(os.path.exists(full_path + suffix) for suffix in SIDECARS.values())
@@ -0,0 +1,338 @@
+"""Index of which rows reference which files under MEDIA_ROOT, and the
+garbage collector built on it.
+
+References are found by scanning text for media URLs: ``<MEDIA_BASE_URL>/media/...``,
+``/media/...`` and the bare ``/uploads/...`` / ``/sha256/...`` paths /upload
+returns.  Derivative URLs (``x.jpg.derivatives/w640.webp``) count as
+references to their original.
+
+The ``media_references`` table is kept current by ORM flush hooks whenever a
+Section (``data``), a Media row (``url``) or a StoryVersion (its full
+snapshot) is inserted, changed or deleted, including delete-orphan removals.  Core bulk inserts
+bypass the ORM and index their rows with ``index_story_sections`` /
+``index_post_media``.
+
+Command line::
+
+    python media_refs.py rebuild            # (re)index every existing row
+    python media_refs.py gc [--dry-run] [--min-age HOURS] [--batch 200] [--rate 50]
+"""
+import argparse
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+import media_store
+import models
+import version_store
+
+logger = logging.getLogger(__name__)
+
+SECTION, MEDIA, VERSION = "section", "media", "version"
+MAX_PATH_LENGTH = 512
+GC_ROOTS = ("uploads", media_store.CONTENT_DIR)
+GC_MIN_AGE = float(os.getenv("MEDIA_GC_MIN_AGE", 24 * 3600))
+QUERY_BATCH = 500
+
+_PATH_CHARS = r"[^\s\"'<>()?#\\]+"
+_MEDIA_URL = re.compile(
+    rf"(?:{re.escape(media_store.MEDIA_BASE_URL)}|(?<![\w.:/-])){re.escape(media_store.MEDIA_URL_PREFIX.rstrip('/'))}/({_PATH_CHARS})"
+    rf"|(?<![\w.:/-])/((?:uploads|{media_store.CONTENT_DIR})/{_PATH_CHARS})"
+)
+
+
+def normalize_path(path: str) -> Optional[str]:
+    """MEDIA_ROOT-relative path a referenced URL path stands for, None if unusable."""
+    path = path.split(".derivatives/", 1)[0]
+    parts = [part for part in path.split("/") if part]
+    if not parts or any(part in (".", "..") or part.startswith(".") for part in parts):
+        return None
+    path = "/".join(parts)
+    return path if len(path) <= MAX_PATH_LENGTH else None
+
+
+def extract_media_paths(text: Optional[str]) -> Set[str]:
+    """Every media file mentioned anywhere in ``text``."""
+    if not text:
+        return set()
+    found = set()
+    for match in _MEDIA_URL.finditer(text):
+        path = normalize_path(match.group(1) or match.group(2))
+        if path:
+            found.add(path)
+    return found
+
+
+def _section_text(section: models.Section) -> Optional[str]:
+    return section.data
+
+
+def _media_text(media: models.Media) -> Optional[str]:
+    return media.url
+
+
+def _version_text(version: models.StoryVersion) -> Optional[str]:
+    full_text = version.__dict__.get("full_payload")
+    if full_text is None and "payload" in version.__dict__:
+        full_text = version.payload
+    return full_text
+
+
+# mapped class -> (source type, attribute whose change matters, text getter)
+TRACKED = {
+    models.Section: (SECTION, "data", _section_text),
+    models.Media: (MEDIA, "url", _media_text),
+    models.StoryVersion: (VERSION, "payload", _version_text),
+}
+
+
+def index_rows(connection, source_type: str, rows: Iterable[Tuple[int, Optional[str]]], replace: bool = True) -> None:
+    """Set the references of (source id, text) rows; ``replace`` drops what they referenced before."""
+    rows = list(rows)
+    if not rows:
+        return
+    table = models.MediaReference.__table__
+    for start in range(0, len(rows), QUERY_BATCH):
+        chunk = rows[start:start + QUERY_BATCH]
+        if replace:
+            connection.execute(delete(table).where(
+                table.c.source_type == source_type,
+                table.c.source_id.in_([source_id for source_id, _ in chunk]),
+            ))
+        values = [
+            {"path": path, "source_type": source_type, "source_id": source_id}
+            for source_id, text in chunk
+            for path in sorted(extract_media_paths(text))
+        ]
+        if values:
+            connection.execute(insert(table), values)
+
+
+def forget_rows(connection, source_type: str, source_ids: List[int]) -> None:
+    table = models.MediaReference.__table__
+    for start in range(0, len(source_ids), QUERY_BATCH):
+        connection.execute(delete(table).where(
+            table.c.source_type == source_type,
+            table.c.source_id.in_(source_ids[start:start + QUERY_BATCH]),
+        ))
+
+
+@event.listens_for(Session, "after_flush")
+def _track_references(session: Session, flush_context) -> None:
+    changed: Dict[str, List[Tuple[int, Optional[str]]]] = {}
+    for obj in session.new:
+        spec = TRACKED.get(type(obj))
+        if spec:
+            changed.setdefault(spec[0], []).append((obj.id, spec[2](obj)))
+    for obj in session.dirty:
+        spec = TRACKED.get(type(obj))
+        if spec and inspect(obj).attrs[spec[1]].history.has_changes():
+            changed.setdefault(spec[0], []).append((obj.id, spec[2](obj)))
+    if not changed:
+        return
+    connection = session.connection()
+    for source_type, rows in changed.items():
+        index_rows(connection, source_type, rows)
+
+
+# session.deleted misses rows removed by delete-orphan (post.media.remove(...)),
+# so deletions are collected as each row actually leaves the database.
+_DELETED = "media_refs_deleted"
+
+
+@event.listens_for(Session, "persistent_to_deleted")
+def _note_deleted(session: Session, obj) -> None:
+    spec = TRACKED.get(type(obj))
+    if spec:
+        session.info.setdefault(_DELETED, {}).setdefault(spec[0], []).append(inspect(obj).identity[0])
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _forget_deleted(session: Session, flush_context) -> None:
+    removed = session.info.pop(_DELETED, None)
+    if not removed:
+        return
+    connection = session.connection()
+    for source_type, source_ids in removed.items():
+        forget_rows(connection, source_type, source_ids)
+
+
+def references_to(db: Session, path: str) -> List[models.MediaReference]:
+    return (
+        db.query(models.MediaReference)
+        .filter(models.MediaReference.path == path)
+        .order_by(models.MediaReference.source_type, models.MediaReference.source_id)
+        .all()
+    )
+
+
+def _index_select(db: Session, source_type: str, id_column, text_column, *criteria, batch_size: int = QUERY_BATCH, replace: bool = False) -> int:
+    """Index (id, text) rows matching ``criteria`` in id-ordered pages (no open cursor between pages)."""
+    indexed, last_id = 0, 0
+    while True:
+        rows = db.execute(
+            select(id_column, text_column).where(id_column > last_id, *criteria).order_by(id_column).limit(batch_size)
+        ).all()
+        if not rows:
+            return indexed
+        last_id = rows[-1][0]
+        if source_type == VERSION:
+            rows = [(row_id, full_version_text(db, payload)) for row_id, payload in rows]
+        index_rows(db.connection(), source_type, rows, replace=replace)
+        indexed += len(rows)
+
+
+def index_story_sections(db: Session, story_id: int) -> int:
+    """For sections written with Core bulk inserts (crud.import_story_stream)."""
+    return _index_select(db, SECTION, models.Section.id, models.Section.data, models.Section.story_id == story_id)
+
+
+def index_post_media(db: Session, post_ids: List[int]) -> int:
+    """For media written with Core bulk inserts (crud.bulk_create_posts)."""
+    indexed = 0
+    for start in range(0, len(post_ids), QUERY_BATCH):
+        chunk = post_ids[start:start + QUERY_BATCH]
+        indexed += _index_select(db, MEDIA, models.Media.id, models.Media.url, models.Media.post_id.in_(chunk))
+    return indexed
+
+
+def rebuild(db: Session) -> Dict[str, int]:
+    """Re-index every section, media row and version from scratch (for existing data)."""
+    db.execute(delete(models.MediaReference.__table__))
+    counts = {
+        SECTION: _index_select(db, SECTION, models.Section.id, models.Section.data),
+        MEDIA: _index_select(db, MEDIA, models.Media.id, models.Media.url),
+        VERSION: _index_select(db, VERSION, models.StoryVersion.id, models.StoryVersion.payload),
+    }
+    db.commit()
+    return counts
+
+
+def full_version_text(db: Session, payload: str) -> str:
+    """Section blobs hold the section JSON of deduplicated snapshots; index the whole document."""
+    if not version_store.is_manifest(payload):
+        return payload
+    prefix, hashes, suffix = version_store.unpack_manifest(payload)
+    blobs = {}
+    unique = list(set(hashes))
+    for start in range(0, len(unique), QUERY_BATCH):
+        chunk = unique[start:start + QUERY_BATCH]
+        blobs.update(db.query(models.SectionBlob.hash, models.SectionBlob.data).filter(models.SectionBlob.hash.in_(chunk)).all())
+    return version_store.assemble(prefix, hashes, blobs, suffix)
+
+
+def _gc_candidates(root: Path) -> Iterator[Path]:
+    """Original files under the GC roots (sidecars and derivatives go with their original)."""
+    for top in GC_ROOTS:
+        base = root / top
+        if not base.is_dir():
+            continue
+        for dirpath, dirnames, filenames in os.walk(base):
+            dirnames[:] = sorted(d for d in dirnames if not d.endswith(".derivatives") and not d.startswith("."))
+            for name in sorted(filenames):
+                if name.startswith("."):
+                    continue
+                if name.endswith((".gz", ".br")) and name[:-3] in filenames:
+                    continue
+                yield Path(dirpath) / name
+
+
+def _remove_with_companions(full_path: Path) -> int:
+    removed = 0
+    for companion in (full_path, full_path.with_name(full_path.name + ".gz"), full_path.with_name(full_path.name + ".br")):
+        try:
+            removed += companion.stat().st_size
+            companion.unlink()
+        except OSError:
+            continue
+    shutil.rmtree(full_path.with_name(full_path.name + ".derivatives"), ignore_errors=True)
+    return removed
+
+
+def collect_garbage(
+    session_factory: Callable[[], Session],
+    min_age: float = GC_MIN_AGE,
+    batch_size: int = 200,
+    rate: float = 50.0,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """Delete files under uploads/ and sha256/ that no row references.
+
+    Files are checked ``batch_size`` at a time with one indexed query per
+    batch; files modified within ``min_age`` seconds are kept (they may be
+    an upload whose section is not saved yet; deduplicated re-uploads touch
+    the file for the same reason).  Deletions are throttled to ``rate`` files
+    per second so the sweep never saturates the media volume.
+    """
+    root = media_store.MEDIA_ROOT
+    stats = {"scanned": 0, "referenced": 0, "recent": 0, "deleted": 0, "bytes": 0}
+    cutoff = time.time() - min_age
+    interval = 1.0 / rate if rate > 0 else 0.0
+
+    def sweep(batch: List[Path]) -> None:
+        relative = {path.relative_to(root).as_posix(): path for path in batch}
+        with session_factory() as db:
+            referenced = set(db.scalars(
+                select(models.MediaReference.path).where(models.MediaReference.path.in_(list(relative))).distinct()
+            ))
+        for relative_path, full_path in relative.items():
+            if relative_path in referenced:
+                stats["referenced"] += 1
+                continue
+            try:
+                if full_path.stat().st_mtime > cutoff:
+                    stats["recent"] += 1
+                    continue
+            except OSError:
+                continue
+            stats["deleted"] += 1
+            if dry_run:
+                logger.info("would delete %s", relative_path)
+                stats["bytes"] += full_path.stat().st_size
+                continue
+            started = time.monotonic()
+            stats["bytes"] += _remove_with_companions(full_path)
+            logger.info("deleted %s", relative_path)
+            pause = interval - (time.monotonic() - started)
+            if pause > 0:
+                time.sleep(pause)
+
+    batch: List[Path] = []
+    for full_path in _gc_candidates(root):
+        stats["scanned"] += 1
+        batch.append(full_path)
+        if len(batch) >= batch_size:
+            sweep(batch)
+            batch = []
+    if batch:
+        sweep(batch)
+    return stats
+
+
+if __name__ == "__main__":
+    from database import Base, SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Media reference index and orphaned upload GC")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="re-index all sections, media and versions")
+    gc = sub.add_parser("gc", help="delete unreferenced files under uploads/ and sha256/")
+    gc.add_argument("--dry-run", action="store_true")
+    gc.add_argument("--min-age", type=float, default=GC_MIN_AGE / 3600, help="keep files younger than this many hours")
+    gc.add_argument("--batch", type=int, default=200)
+    gc.add_argument("--rate", type=float, default=50.0, help="max deletions per second")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    Base.metadata.create_all(bind=engine)
+    if args.command == "rebuild":
+        with SessionLocal() as db:
+            print(rebuild(db))
+    else:
+        print(collect_garbage(SessionLocal, args.min_age * 3600, args.batch, args.rate, args.dry_run))
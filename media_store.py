@@ -0,0 +1,208 @@
+"""Files under MEDIA_ROOT and the URLs they are served at.
+
+Uploads are streamed to a temporary file in chunks while their SHA-256 is
+computed, then moved into place with ``os.replace``.  Without an explicit
+target they are stored content-addressed (``sha256/ab/cd/<digest><ext>``), so
+identical bytes are kept once and re-uploading them returns the existing URL.
+Everything here is blocking file I/O: call it from a worker thread
+(``run_in_threadpool``), never directly on the event loop.
+"""
+import gzip
+import hashlib
+import os
+import re
+import uuid
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Optional
+
+try:  # brotli is optional; gzip alone covers every browser
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deployment image
+    brotli = None
+
+backend_dir = Path(__file__).resolve().parent
+
+MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", backend_dir / "static_media")).resolve()
+MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
+MEDIA_URL_PREFIX = os.getenv("MEDIA_URL_PREFIX", "/media")
+if not MEDIA_URL_PREFIX.startswith("/"):
+    MEDIA_URL_PREFIX = f"/{MEDIA_URL_PREFIX}"
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "http://localhost:8888").rstrip("/")
+
+CHUNK_SIZE = 1024 * 1024
+CONTENT_DIR = "sha256"
+INCOMING_DIR = ".incoming"
+DERIVATIVE_SUFFIX = ".derivatives"
+# text-like files get .gz (and .br with brotli installed) siblings for the media mount to serve
+COMPRESSIBLE_EXTENSIONS = {".svg", ".json", ".txt", ".css", ".js", ".vtt", ".csv", ".xml", ".html", ".geojson"}
+PRECOMPRESS_MAX_SIZE = 32 * 1024 * 1024
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+_EXTENSION = re.compile(r"^\.[0-9A-Za-z]{1,16}$")
+
+
+@dataclass
+class StoredFile:
+    relative_path: Path
+    sha256: str
+    size: int
+    deduplicated: bool = False
+
+
+def public_path(relative_path: Path) -> str:
+    media_prefix = MEDIA_URL_PREFIX.rstrip("/")
+    if media_prefix:
+        return f"{media_prefix}/{relative_path.as_posix()}"
+    return f"/{relative_path.as_posix()}"
+
+
+def upload_result(stored: StoredFile) -> dict:
+    """The JSON body /upload returns for a stored file."""
+    return {
+        "success": True,
+        "url": f"{MEDIA_BASE_URL}{public_path(stored.relative_path)}",
+        "path": f"/{stored.relative_path.as_posix()}",
+        "filename": stored.relative_path.name,
+        "sha256": stored.sha256,
+        "size": stored.size,
+        "deduplicated": stored.deduplicated,
+    }
+
+
+def clean_extension(filename: Optional[str]) -> str:
+    extension = Path(filename or "upload").suffix.lower()
+    return extension if _EXTENSION.match(extension) else ""
+
+
+def media_relative_path(path: str) -> Path:
+    """Validate a client supplied path like /media/uploads/foo.jpg (anywhere under MEDIA_ROOT); raises ValueError."""
+    pure_target = PurePosixPath(path.lstrip('/'))
+    if any(part == '..' for part in pure_target.parts):
+        raise ValueError("非法目标路径")
+    if not pure_target.parts:
+        raise ValueError("目标路径不能为空")
+    relative_path = Path(*pure_target.parts)
+    full_path = (MEDIA_ROOT / relative_path).resolve()
+    if MEDIA_ROOT not in full_path.parents:
+        raise ValueError("目标路径不在允许的 media 目录内")
+    return relative_path
+
+
+def target_relative_path(target_path: str) -> Path:
+    """``media_relative_path`` for a path an upload may write to; raises ValueError.
+
+    The content-addressed tree, temporary files (any dot-segment such as
+    ``.incoming``) and derivative caches are managed by the server: a file
+    written there would be served as immutable content under another digest.
+    """
+    relative_path = media_relative_path(target_path)
+    if relative_path.parts[0] == CONTENT_DIR:
+        raise ValueError(f"目标路径不能位于 {CONTENT_DIR}/ 目录")
+    if any(part.startswith('.') for part in relative_path.parts):
+        raise ValueError("目标路径不能包含以 . 开头的目录或文件名")
+    if any(part.endswith(DERIVATIVE_SUFFIX) for part in relative_path.parts):
+        raise ValueError(f"目标路径不能位于 {DERIVATIVE_SUFFIX} 目录")
+    return relative_path
+
+
+def content_relative_path(digest: str, extension: str) -> Path:
+    return Path(CONTENT_DIR) / digest[:2] / digest[2:4] / f"{digest}{extension}"
+
+
+def content_digest(relative_path: Path) -> Optional[str]:
+    """The SHA-256 a content-addressed path is named after, None for any other path."""
+    if relative_path.parts and relative_path.parts[0] == CONTENT_DIR and _DIGEST.match(relative_path.stem):
+        return relative_path.stem
+    return None
+
+
+def find_content(digest: str, extension: str) -> Optional[StoredFile]:
+    """The already stored file with this SHA-256 (hex) and extension, if any."""
+    digest = digest.lower()
+    if not _DIGEST.match(digest):
+        return None
+    relative_path = content_relative_path(digest, extension)
+    try:
+        size = (MEDIA_ROOT / relative_path).stat().st_size
+        _touch(MEDIA_ROOT / relative_path)
+    except OSError:
+        return None
+    return StoredFile(relative_path, digest, size, deduplicated=True)
+
+
+def _touch(full_path: Path) -> None:
+    # a re-upload is about to be referenced again: restart the media GC grace period
+    os.utime(full_path)
+
+
+def incoming_path() -> Path:
+    """A fresh temporary path on the same filesystem as MEDIA_ROOT (so os.replace is atomic)."""
+    directory = MEDIA_ROOT / INCOMING_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / uuid.uuid4().hex
+
+
+def store_file(tmp_path: Path, digest: str, size: int, extension: str, relative_path: Optional[Path] = None) -> StoredFile:
+    """Move a fully written temporary file into place.
+
+    With ``relative_path`` the file goes exactly there (replacing what was
+    there); otherwise into the content-addressed layout, where an existing
+    copy wins and ``tmp_path`` is discarded.
+    """
+    deduplicated = False
+    if relative_path is None:
+        relative_path = content_relative_path(digest, extension)
+        deduplicated = (MEDIA_ROOT / relative_path).exists()
+    if deduplicated:
+        tmp_path.unlink()
+        _touch(MEDIA_ROOT / relative_path)
+    else:
+        full_path = MEDIA_ROOT / relative_path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, full_path)
+        precompress(relative_path)
+    return StoredFile(relative_path, digest, size, deduplicated)
+
+
+def precompress(relative_path: Path) -> None:
+    """Write .gz/.br siblings for compressible files (served by media_files.MediaFiles)."""
+    full_path = MEDIA_ROOT / relative_path
+    if relative_path.suffix.lower() not in COMPRESSIBLE_EXTENSIONS or full_path.stat().st_size > PRECOMPRESS_MAX_SIZE:
+        return
+    data = full_path.read_bytes()
+    encoded = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded[".br"] = brotli.compress(data, quality=11)
+    for suffix, body in encoded.items():
+        sidecar = full_path.with_name(full_path.name + suffix)
+        if len(body) >= len(data):
+            # not worth it; drop a stale sidecar from an earlier version of a target_path file
+            sidecar.unlink(missing_ok=True)
+            continue
+        tmp = full_path.with_name(f".{full_path.name}{suffix}.tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, sidecar)
+
+
+def save_stream(fileobj: BinaryIO, extension: str = "", relative_path: Optional[Path] = None, chunk_size: int = CHUNK_SIZE) -> StoredFile:
+    """Copy ``fileobj`` into MEDIA_ROOT chunk by chunk, hashing it on the way."""
+    tmp_path = incoming_path()
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as buffer:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                buffer.write(chunk)
+                size += len(chunk)
+        return store_file(tmp_path, sha256.hexdigest(), size, extension, relative_path)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise
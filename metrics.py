@@ -0,0 +1,325 @@
+"""Per-route request metrics in the Prometheus text format, served on GET /metrics.
+
+``MetricsMiddleware`` times every HTTP request and records its response size.
+SQLAlchemy event hooks on the app's engines (``instrument_engine``) and the
+``timed`` decorator on render/sync functions add into a ``RequestStats``
+object that lives in a context variable.  The variable is set for the
+request's task and is copied into threadpool workers and greenlets, so the
+sync endpoints, the async ones and their dependencies all add to the same
+object.  When the response is finished, the totals are observed once into
+histograms labelled with the route template (``/sections/{section_id}``,
+never the raw path, to keep the number of series bounded):
+
+- ``http_request_duration_seconds``, ``http_response_size_bytes``,
+  ``http_requests_total{status}``
+- ``app_request_sql_statements``, ``app_request_sql_seconds``,
+  ``app_request_rows_loaded`` (ORM instances: rows turned into model objects)
+- ``app_stage_seconds{stage}``: ``render_story_json``, ``build_story_payload``,
+  ``story_json_sync``.  Stages include any lazy loads they trigger.
+
+Work done outside a request (the story.json write-behind thread, migrations,
+the upload sweeper) goes to the ``app_background_sql_*`` counters, and its
+stages are labelled ``route="background"``.
+
+The hot path is a few attribute updates per statement and one locked update
+per histogram per request.  Every worker process keeps its own numbers; with
+several uvicorn workers, scrape each one or run one worker per container.
+"""
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BACKGROUND = "background"
+UNMATCHED = "unmatched"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        lines = self.header()
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def collect(self):
+        lines = self.header()
+        with self._lock:
+            items = [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items()]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % _number(bound if bound == float("inf") else float(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+ROUTE = ("method", "route")
+
+requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code.", ROUTE + ("status",)))
+requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "HTTP requests being served right now."))
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last byte of its response.", ROUTE))
+response_size = registry.register(Histogram(
+    "http_response_size_bytes", "Response body size.", ROUTE, SIZE_BUCKETS))
+sql_statements = registry.register(Histogram(
+    "app_request_sql_statements", "SQL statements executed per request.", ROUTE, COUNT_BUCKETS))
+sql_seconds = registry.register(Histogram(
+    "app_request_sql_seconds", "Time spent executing SQL per request.", ROUTE))
+rows_loaded = registry.register(Histogram(
+    "app_request_rows_loaded", "ORM rows loaded into objects per request.", ROUTE, ROW_BUCKETS))
+stage_seconds = registry.register(Histogram(
+    "app_stage_seconds", "Time spent in instrumented stages (render, story.json sync).", ("route", "stage")))
+background_statements = registry.register(Counter(
+    "app_background_sql_statements_total", "SQL statements executed outside any request."))
+background_sql_seconds = registry.register(Counter(
+    "app_background_sql_seconds_total", "Time spent executing SQL outside any request."))
+
+
+class RequestStats:
+    __slots__ = ("statements", "sql_seconds", "rows", "stages")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.stages: Dict[str, float] = {}
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+# ---------------------------------------------------------------- SQLAlchemy hooks
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+    stats = _current.get()
+    if stats is None:
+        background_statements.inc()
+        background_sql_seconds.inc(amount=elapsed)
+    else:
+        stats.statements += 1
+        stats.sql_seconds += elapsed
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute does not run for a failed statement
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("metrics_started"):
+        connection.info["metrics_started"].pop()
+
+
+def _loaded(target, context):
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += 1
+
+
+def instrument_engine(engine) -> None:
+    """Count and time every statement run on ``engine`` (a sync Engine; pass ``async_engine.sync_engine``)."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def instrument_models(base) -> None:
+    """Count ORM instances loaded for every model mapped on ``base``."""
+    if not event.contains(base, "load", _loaded):
+        event.listen(base, "load", _loaded, propagate=True)
+
+
+# ---------------------------------------------------------------- stages
+
+def record_stage(stage: str, seconds: float) -> None:
+    stats = _current.get()
+    if stats is None:
+        stage_seconds.observe((BACKGROUND, stage), seconds)
+    else:
+        stats.stages[stage] = stats.stages.get(stage, 0.0) + seconds
+
+
+def timed(stage: str):
+    """Decorator: add the function's run time to ``stage`` for the current request."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_stage(stage, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+# ---------------------------------------------------------------- ASGI middleware
+
+_route_paths: Dict[int, Dict[object, str]] = {}
+
+
+def route_template(scope) -> str:
+    """The path template of the route that handled ``scope`` (set by the router), else "unmatched"."""
+    endpoint = scope.get("endpoint")
+    router = scope.get("router")
+    if endpoint is None or router is None:
+        return UNMATCHED
+    paths = _route_paths.get(id(router))
+    if paths is None or endpoint not in paths:
+        # (re)built lazily so routes added after startup are picked up
+        paths = {}
+        for route in router.routes:
+            target = getattr(route, "endpoint", None) or getattr(route, "app", None)
+            if target is not None:
+                paths.setdefault(target, getattr(route, "path", UNMATCHED) or "/")
+        paths.setdefault(endpoint, UNMATCHED)
+        _route_paths[id(router)] = paths
+    return paths.get(endpoint, UNMATCHED)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        size = 0
+        duration = None
+
+        async def send_wrapper(message):
+            nonlocal status, size, duration
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    # background tasks run after this; they count toward SQL, not latency
+                    duration = time.perf_counter() - started
+            await send(message)
+
+        requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            requests_in_progress.dec()
+            labels = (scope["method"], route_template(scope))
+            requests_total.inc(labels + (str(status),))
+            request_duration.observe(labels, duration if duration is not None else time.perf_counter() - started)
+            response_size.observe(labels, size)
+            sql_statements.observe(labels, stats.statements)
+            sql_seconds.observe(labels, stats.sql_seconds)
+            rows_loaded.observe(labels, stats.rows)
+            for stage, seconds in stats.stages.items():
+                stage_seconds.observe((labels[1], stage), seconds)
+
+
+def render() -> str:
+    return registry.render()
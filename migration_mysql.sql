@@ -10,7 +10,7 @@ CREATE TABLE IF NOT EXISTS `posts` (
   `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`),
-  KEY `idx_posts_created_at` (`created_at`)
+  KEY `idx_posts_created_at_id` (`created_at`, `id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 CREATE TABLE IF NOT EXISTS `media` (
@@ -25,4 +25,69 @@ CREATE TABLE IF NOT EXISTS `media` (
   PRIMARY KEY (`id`),
   KEY `idx_media_post_id` (`post_id`),
   CONSTRAINT `fk_media_post` FOREIGN KEY (`post_id`) REFERENCES `posts` (`id`) ON DELETE CASCADE
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
\ No newline at end of file
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `stories` (
+  `id` INT NOT NULL AUTO_INCREMENT,
+  `title` VARCHAR(255) NULL,
+  `version` VARCHAR(16) NULL,
+  `standfirst` TEXT NULL,
+  `theme_font` VARCHAR(128) NULL,
+  `theme_primary_color` VARCHAR(16) NULL,
+  `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  KEY `idx_stories_created_at` (`created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `sections` (
+  `id` INT NOT NULL AUTO_INCREMENT,
+  `story_id` INT NOT NULL,
+  `type` VARCHAR(32) NOT NULL,
+  `sort_order` INT NOT NULL DEFAULT 0,
+  `data` LONGTEXT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_sections_story_sort` (`story_id`, `sort_order`, `id`),
+  CONSTRAINT `fk_sections_story` FOREIGN KEY (`story_id`) REFERENCES `stories` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `section_blobs` (
+  `hash` VARCHAR(32) NOT NULL,
+  `data` LONGTEXT NOT NULL,
+  PRIMARY KEY (`hash`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `story_versions` (
+  `id` INT NOT NULL AUTO_INCREMENT,
+  `story_id` INT NOT NULL,
+  `version_number` INT NOT NULL,
+  `payload` LONGTEXT NOT NULL,
+  `payload_size` INT NULL,
+  `payload_hash` VARCHAR(32) NULL,
+  `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_story_versions_story_version` (`story_id`, `version_number`),
+  CONSTRAINT `fk_story_versions_story` FOREIGN KEY (`story_id`) REFERENCES `stories` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `media_references` (
+  `id` INT NOT NULL AUTO_INCREMENT,
+  `path` VARCHAR(512) NOT NULL,
+  `source_type` VARCHAR(16) NOT NULL,
+  `source_id` INT NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_media_references_source_path` (`source_type`, `source_id`, `path`),
+  KEY `idx_media_references_path` (`path`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 全文检索（search.py）；ngram parser 让中文（无空格分词）也能按子串检索
+CREATE TABLE IF NOT EXISTS `search_documents` (
+  `id` INT NOT NULL AUTO_INCREMENT,
+  `source_type` VARCHAR(16) NOT NULL,
+  `source_id` INT NOT NULL,
+  `title` VARCHAR(255) NULL,
+  `body` LONGTEXT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_search_documents_source` (`source_type`, `source_id`),
+  FULLTEXT KEY `ft_search_documents_text` (`title`, `body`) WITH PARSER ngram
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
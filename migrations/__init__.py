@@ -0,0 +1,256 @@
+"""Versioned schema migrations.
+
+Each ``mNNNN_<name>.py`` module in this package is one up-migration with an
+``upgrade(migration)`` function; they run in version order and each applied
+version is recorded in ``schema_migrations``.  Tables that do not exist yet
+are created from the models first (``create_all`` never alters an existing
+table); migrations bring *existing* tables up to date, so every step must be
+idempotent: a fresh database already has what it adds.
+
+Long-running work is meant to be done online:
+
+- ``Migration.create_index`` builds indexes without blocking writes where the
+  database can (MySQL ``ALGORITHM=INPLACE, LOCK=NONE``, PostgreSQL
+  ``CONCURRENTLY``; SQLite holds its write lock while building);
+- ``Migration.backfill`` walks a table in primary-key order, one short
+  transaction per batch of MIGRATION_BATCH_SIZE rows, sleeping
+  MIGRATION_BATCH_PAUSE seconds between batches.  The batch's position is
+  committed in the same transaction as its rows, so an interrupted run
+  resumes after the last finished batch.
+
+Only one runner works at a time (MySQL ``GET_LOCK`` / a lock file next to a
+SQLite database).  Command line: ``python -m migrations [upgrade|status]``.
+"""
+import importlib
+import json
+import logging
+import os
+import pkgutil
+import re
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", 1000))
+BATCH_PAUSE = float(os.getenv("MIGRATION_BATCH_PAUSE", 0.05))
+LOCK_TIMEOUT = int(os.getenv("MIGRATION_LOCK_TIMEOUT", 600))
+_MODULE_NAME = re.compile(r"^m(\d{4})_(\w+)$")
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(128), nullable=False),
+    Column("checkpoint", Text, nullable=True),      # JSON {step: last key} of an unfinished backfill
+    Column("started_at", DateTime, nullable=False),
+    Column("applied_at", DateTime, nullable=True),  # NULL while running or after an interruption
+)
+
+
+@dataclass
+class MigrationScript:
+    version: int
+    name: str
+    upgrade: Callable[["Migration"], None]
+    description: str
+
+
+def discover() -> List[MigrationScript]:
+    scripts = []
+    for module_info in pkgutil.iter_modules(__path__):
+        match = _MODULE_NAME.match(module_info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f"{__name__}.{module_info.name}")
+        description = (module.__doc__ or "").strip().splitlines()[0] if module.__doc__ else match.group(2)
+        scripts.append(MigrationScript(int(match.group(1)), match.group(2), module.upgrade, description))
+    scripts.sort(key=lambda script: script.version)
+    versions = [script.version for script in scripts]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"duplicate migration versions in {versions}")
+    return scripts
+
+
+class Migration:
+    """What an ``upgrade`` function works with: the engine plus idempotent, online-friendly helpers."""
+
+    def __init__(self, bind: Engine, script: MigrationScript, checkpoint: Optional[str], batch_size: int, pause: float):
+        self.bind = bind
+        self.script = script
+        self.checkpoint: Dict[str, object] = json.loads(checkpoint) if checkpoint else {}
+        self.batch_size = batch_size
+        self.pause = pause
+
+    @property
+    def dialect(self) -> str:
+        return self.bind.dialect.name
+
+    def has_index(self, table: str, name: str) -> bool:
+        inspector = inspect(self.bind)
+        names = {index["name"] for index in inspector.get_indexes(table)}
+        names.update(constraint["name"] for constraint in inspector.get_unique_constraints(table))
+        return name in names
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in {info["name"] for info in inspect(self.bind).get_columns(table)}
+
+    def add_column(self, table: str, column: str, ddl: str) -> None:
+        """``ALTER TABLE ... ADD COLUMN`` unless it exists; keep ``ddl`` nullable or defaulted so it is instant."""
+        if self.has_column(table, column):
+            return
+        with self.bind.begin() as connection:
+            connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+        logger.info("added column %s.%s", table, column)
+
+    def create_index(self, name: str, table: str, columns: Sequence[str], unique: bool = False) -> None:
+        """Create an index unless it exists, without blocking writes where the database allows it."""
+        if self.has_index(table, name):
+            return
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        column_list = ", ".join(columns)
+        started = time.monotonic()
+        if self.dialect == "mysql":
+            with self.bind.begin() as connection:
+                connection.exec_driver_sql(
+                    f"CREATE {kind} {name} ON {table} ({column_list}) ALGORITHM=INPLACE LOCK=NONE"
+                )
+        elif self.dialect == "postgresql":
+            # CONCURRENTLY cannot run inside a transaction
+            with self.bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                connection.exec_driver_sql(f"CREATE {kind} CONCURRENTLY {name} ON {table} ({column_list})")
+        else:
+            with self.bind.begin() as connection:
+                connection.exec_driver_sql(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({column_list})")
+        logger.info("created index %s on %s (%s) in %.1fs", name, table, column_list, time.monotonic() - started)
+
+    def backfill(self, step: str, columns: Sequence, process: Callable[[Session, list], None], *criteria) -> int:
+        """Feed every row of ``select(*columns)`` to ``process(db, rows)`` in resumable batches.
+
+        ``columns[0]`` must be the table's integer primary key; rows come in
+        its order.  ``process`` writes through ``db`` (a Session whose
+        transaction also records the checkpoint), so a batch is either fully
+        done and recorded or rolled back and redone on the next run.
+        """
+        key = columns[0]
+        last = self.checkpoint.get(step, 0)
+        done = 0
+        while True:
+            started = time.monotonic()
+            with Session(self.bind) as db, db.begin():
+                rows = db.execute(
+                    select(*columns).where(key > last, *criteria).order_by(key).limit(self.batch_size)
+                ).all()
+                if not rows:
+                    break
+                process(db, rows)
+                last = rows[-1][0]
+                self.checkpoint[step] = last
+                db.execute(
+                    update(schema_migrations)
+                    .where(schema_migrations.c.version == self.script.version)
+                    .values(checkpoint=json.dumps(self.checkpoint))
+                )
+            done += len(rows)
+            logger.info("%s: %s %d rows (up to id %s, %.2fs per batch)", self.script.name, step, done, last, time.monotonic() - started)
+            time.sleep(self.pause)  # throttle: let other traffic in between batches
+        return done
+
+
+@contextmanager
+def _runner_lock(bind: Engine):
+    """Keep concurrent runners (several app workers starting at once) from interleaving."""
+    if bind.dialect.name == "mysql":
+        with bind.connect() as connection:
+            got = connection.execute(text("SELECT GET_LOCK('schema_migrations', :timeout)"), {"timeout": LOCK_TIMEOUT}).scalar()
+            if got != 1:
+                raise RuntimeError("timed out waiting for another migration runner")
+            try:
+                yield
+            finally:
+                connection.execute(text("SELECT RELEASE_LOCK('schema_migrations')"))
+        return
+    database = bind.url.database if bind.dialect.name == "sqlite" else None
+    if not database or database == ":memory:":
+        yield
+        return
+    try:
+        import fcntl
+    except ImportError:  # pragma: no cover - Windows
+        yield
+        return
+    with open(f"{database}.migrate.lock", "w") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _recorded(bind: Engine) -> Dict[int, dict]:
+    with bind.connect() as connection:
+        return {row.version: row._asdict() for row in connection.execute(select(schema_migrations))}
+
+
+def upgrade(bind: Optional[Engine] = None, target: Optional[int] = None, batch_size: int = BATCH_SIZE, pause: float = BATCH_PAUSE) -> List[int]:
+    """Create missing tables, then apply every pending migration up to ``target``; returns the versions applied."""
+    if bind is None:
+        from database import engine as bind
+    from database import Base
+    import models  # noqa: F401  (registers the tables on Base.metadata)
+    import search  # noqa: F401  (attaches the FTS5 DDL to search_documents)
+
+    applied = []
+    with _runner_lock(bind):
+        schema_migrations.create(bind, checkfirst=True)
+        Base.metadata.create_all(bind=bind)
+        recorded = _recorded(bind)
+        for script in discover():
+            if target is not None and script.version > target:
+                break
+            row = recorded.get(script.version)
+            if row and row["applied_at"] is not None:
+                continue
+            if row is None:
+                with bind.begin() as connection:
+                    connection.execute(schema_migrations.insert().values(
+                        version=script.version, name=script.name, started_at=datetime.utcnow()
+                    ))
+                logger.info("applying %04d %s: %s", script.version, script.name, script.description)
+            else:
+                logger.info("resuming %04d %s from %s", script.version, script.name, row["checkpoint"] or "the start")
+            script.upgrade(Migration(bind, script, row["checkpoint"] if row else None, batch_size, pause))
+            with bind.begin() as connection:
+                connection.execute(
+                    update(schema_migrations)
+                    .where(schema_migrations.c.version == script.version)
+                    .values(applied_at=datetime.utcnow(), checkpoint=None)
+                )
+            applied.append(script.version)
+    return applied
+
+
+def status(bind: Optional[Engine] = None) -> List[dict]:
+    """Every known migration with its state: applied, in progress (interrupted) or pending."""
+    if bind is None:
+        from database import engine as bind
+    recorded = _recorded(bind) if inspect(bind).has_table("schema_migrations") else {}
+    rows = []
+    for script in discover():
+        row = recorded.get(script.version)
+        state = "pending" if row is None else "applied" if row["applied_at"] else "in progress"
+        rows.append({
+            "version": script.version,
+            "name": script.name,
+            "state": state,
+            "applied_at": row["applied_at"] if row else None,
+            "checkpoint": row["checkpoint"] if row else None,
+        })
+    return rows
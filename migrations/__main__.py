@@ -0,0 +1,27 @@
+"""python -m migrations [upgrade [--target N] [--batch-size N] [--pause S] | status]"""
+import argparse
+import logging
+
+import migrations
+
+parser = argparse.ArgumentParser(prog="python -m migrations", description="Versioned schema migrations")
+sub = parser.add_subparsers(dest="command")
+up = sub.add_parser("upgrade", help="create missing tables and apply pending migrations (the default)")
+up.add_argument("--target", type=int, default=None, help="stop after this version")
+up.add_argument("--batch-size", type=int, default=migrations.BATCH_SIZE, help="rows per backfill transaction")
+up.add_argument("--pause", type=float, default=migrations.BATCH_PAUSE, help="seconds to sleep between backfill batches")
+sub.add_parser("status", help="list migrations and whether they are applied")
+args = parser.parse_args()
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+if args.command == "status":
+    for row in migrations.status():
+        extra = f"  checkpoint {row['checkpoint']}" if row["checkpoint"] else ""
+        print(f"{row['version']:04d}  {row['name']:<36} {row['state']}{extra}")
+else:
+    applied = migrations.upgrade(
+        target=getattr(args, "target", None),
+        batch_size=getattr(args, "batch_size", migrations.BATCH_SIZE),
+        pause=getattr(args, "pause", migrations.BATCH_PAUSE),
+    )
+    print(f"applied {len(applied)} migration(s): {', '.join(f'{v:04d}' for v in applied) or 'none pending'}")
@@ -0,0 +1,5 @@
+"""Index stories.created_at for the latest-story lookup on every /story request."""
+
+
+def upgrade(migration):
+    migration.create_index("idx_stories_created_at", "stories", ["created_at"])
@@ -0,0 +1,5 @@
+"""Index sections (story_id, sort_order, id) for ordered, keyset-paginated section reads."""
+
+
+def upgrade(migration):
+    migration.create_index("idx_sections_story_sort", "sections", ["story_id", "sort_order", "id"])
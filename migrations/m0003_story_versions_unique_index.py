@@ -0,0 +1,22 @@
+"""Unique (story_id, version_number) on story_versions, plus its payload_size / payload_hash columns.
+
+Replaces the old migrate_story_versions.py script.
+"""
+from sqlalchemy import text
+
+
+def upgrade(migration):
+    migration.add_column("story_versions", "payload_size", "INTEGER")
+    migration.add_column("story_versions", "payload_hash", "VARCHAR(32)")
+    if migration.has_index("story_versions", "uq_story_versions_story_version"):
+        return
+    with migration.bind.connect() as connection:
+        duplicates = connection.execute(text(
+            "SELECT story_id, version_number, COUNT(*) FROM story_versions "
+            "GROUP BY story_id, version_number HAVING COUNT(*) > 1"
+        )).fetchall()
+    if duplicates:
+        raise RuntimeError(f"duplicate version numbers must be resolved first: {duplicates[:10]}")
+    migration.create_index(
+        "uq_story_versions_story_version", "story_versions", ["story_id", "version_number"], unique=True
+    )
@@ -0,0 +1,20 @@
+"""Index posts and sections written before full-text search existed."""
+import models
+import search
+
+
+def _posts(db, rows):
+    search.index_documents(db.connection(), search.POST, [
+        (post_id, title, search.plain_text(content)) for post_id, title, content in rows
+    ])
+
+
+def _sections(db, rows):
+    search.index_documents(db.connection(), search.SECTION, [
+        (section_id, None, search.section_text(data)) for section_id, data in rows
+    ])
+
+
+def upgrade(migration):
+    migration.backfill("posts", (models.Post.id, models.Post.title, models.Post.content), _posts)
+    migration.backfill("sections", (models.Section.id, models.Section.data), _sections)
@@ -0,0 +1,21 @@
+"""Record media references of sections, media rows and versions written before the index existed."""
+import media_refs
+import models
+
+
+def _rows(source_type):
+    def process(db, rows):
+        media_refs.index_rows(db.connection(), source_type, rows)
+    return process
+
+
+def _versions(db, rows):
+    media_refs.index_rows(db.connection(), media_refs.VERSION, [
+        (version_id, media_refs.full_version_text(db, payload)) for version_id, payload in rows
+    ])
+
+
+def upgrade(migration):
+    migration.backfill("sections", (models.Section.id, models.Section.data), _rows(media_refs.SECTION))
+    migration.backfill("media", (models.Media.id, models.Media.url), _rows(media_refs.MEDIA))
+    migration.backfill("versions", (models.StoryVersion.id, models.StoryVersion.payload), _versions)
@@ -0,0 +1,5 @@
+"""Index posts (created_at, id) for the keyset-paginated /posts feed."""
+
+
+def upgrade(migration):
+    migration.create_index("idx_posts_created_at_id", "posts", ["created_at", "id"])
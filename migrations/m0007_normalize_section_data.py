@@ -0,0 +1,42 @@
+"""Rewrite section data stored before write-time validation as compact JSON objects.
+
+GET /story splices ``sections.data`` into the response verbatim, which is
+only safe for text that went through ``crud.normalize_section_data``.  Older
+rows are normalized the same way; a row that is not a JSON object becomes
+``{"type": <type>}``, which is what ``build_story_payload`` already made of it.
+"""
+import json
+
+from sqlalchemy import update
+
+import crud
+import media_refs
+import models
+import search
+
+
+def _normalized(section_type, data):
+    try:
+        return crud.normalize_section_data(data)
+    except ValueError:
+        return json.dumps({"type": section_type}, ensure_ascii=False, separators=(",", ":"))
+
+
+def _sections(db, rows):
+    changed = []
+    for section_id, section_type, data in rows:
+        if not data:
+            continue  # rendered as {} already
+        normalized = _normalized(section_type, data)
+        if normalized != data:
+            db.execute(update(models.Section).where(models.Section.id == section_id).values(data=normalized))
+            changed.append((section_id, normalized))
+    if changed:
+        media_refs.index_rows(db.connection(), media_refs.SECTION, changed)
+        search.index_documents(db.connection(), search.SECTION, [
+            (section_id, None, search.section_text(data)) for section_id, data in changed
+        ])
+
+
+def upgrade(migration):
+    migration.backfill("sections", (models.Section.id, models.Section.type, models.Section.data), _sections)
@@ -0,0 +1,25 @@
+"""Rebuild the full-text index so Chinese substrings match: SQLite trigram tokenizer, MySQL ngram parser.
+
+SQLite's search_fts is recreated from search_documents (the data is not
+touched).  On MySQL the FULLTEXT index is rebuilt in place; writes to
+search_documents wait while it builds (LOCK=SHARED, the least InnoDB allows
+for FULLTEXT).
+"""
+import search
+
+
+def upgrade(migration):
+    if migration.dialect == "sqlite":
+        with migration.bind.begin() as connection:
+            search.create_fts(connection)
+    elif migration.dialect == "mysql":
+        with migration.bind.begin() as connection:
+            ddl = connection.exec_driver_sql("SHOW CREATE TABLE search_documents").one()[1]
+            if "ngram" in ddl:
+                return
+            if migration.has_index("search_documents", "ft_search_documents_text"):
+                connection.exec_driver_sql("ALTER TABLE search_documents DROP INDEX ft_search_documents_text")
+            connection.exec_driver_sql(
+                "ALTER TABLE search_documents ADD FULLTEXT INDEX ft_search_documents_text (title, body) "
+                "WITH PARSER ngram, ALGORITHM=INPLACE, LOCK=SHARED"
+            )
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from database import Base
 
@@ -19,7 +19,7 @@ class Story(Base):
         "Section",
         back_populates="story",
         cascade="all, delete-orphan",
-        order_by="Section.sort_order"
+        order_by="[Section.sort_key, Section.id]"
     )
     versions = relationship(
         "StoryVersion",
@@ -28,19 +28,45 @@ class Story(Base):
         order_by="StoryVersion.version_number.desc()"
     )
 
+    __table_args__ = (
+        # latest story lookup (crud.get_latest_story_id)
+        Index("idx_stories_created_at", "created_at"),
+    )
+
 class Section(Base):
     """Section 表 - 存储 sections 数组中的每个 item"""
     __tablename__ = "sections"
     id = Column(Integer, primary_key=True, index=True)
     story_id = Column(Integer, ForeignKey("stories.id", ondelete="CASCADE"), nullable=False, index=True)
     type = Column(String(32), nullable=False)  # video, paragraph, pullquote, imagegroup, etc.
-    sort_order = Column(Integer, default=0, nullable=False)
+    # Gapped ordering key; the column keeps its historical name.  Inserting or
+    # moving a section only writes that row (see crud.allocate_sort_key).
+    sort_key = Column("sort_order", Integer, default=0, nullable=False)
     
     # 存储 section 的完整 JSON 数据
     data = Column(Text, nullable=True)  # JSON string containing all section properties
     
     story = relationship("Story", back_populates="sections")
 
+    @property
+    def sort_order(self) -> int:
+        """0-based position within the story (what SectionRead exposes).
+
+        crud fills this in when it reads sections; otherwise it is derived
+        from the story's loaded section list.
+        """
+        position = self.__dict__.get("_position")
+        if position is None:
+            for index, sibling in enumerate(self.story.sections):
+                sibling._position = index
+            position = self.__dict__["_position"]
+        return position
+
+    __table_args__ = (
+        # keyset pagination / ordered reads within a story
+        Index("idx_sections_story_sort", "story_id", "sort_order", "id"),
+    )
+
 class Post(Base):
     __tablename__ = "posts"
     id = Column(Integer, primary_key=True, index=True)
@@ -53,6 +79,11 @@ class Post(Base):
 
     media = relationship("Media", back_populates="post", cascade="all, delete-orphan", order_by="Media.sort_order")
 
+    __table_args__ = (
+        # keyset pagination: newest first by (created_at, id)
+        Index("idx_posts_created_at_id", "created_at", "id"),
+    )
+
 class Media(Base):
     __tablename__ = "media"
     id = Column(Integer, primary_key=True, index=True)
@@ -73,7 +104,56 @@ class StoryVersion(Base):
     id = Column(Integer, primary_key=True, index=True)
     story_id = Column(Integer, ForeignKey("stories.id", ondelete="CASCADE"), nullable=False, index=True)
     version_number = Column(Integer, nullable=False)
-    payload = Column(Text, nullable=False)  # JSON payload (story.json 兼容格式)
+    # JSON payload (story.json 兼容格式); deferred so listing versions never pulls the blobs
+    payload = deferred(Column(Text, nullable=False))
+    # size and content hash of the full serialized snapshot, for listings that skip the payload
+    payload_size = Column(Integer, nullable=True)
+    payload_hash = Column(String(32), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     story = relationship("Story", back_populates="versions")
+
+    __table_args__ = (
+        # version lookups, history listing and the max(version_number) probe on publish
+        UniqueConstraint("story_id", "version_number", name="uq_story_versions_story_version"),
+    )
+
+
+class SectionBlob(Base):
+    """Section JSON shared by StoryVersion snapshots, addressed by a content hash (see version_store)"""
+    __tablename__ = "section_blobs"
+    hash = Column(String(32), primary_key=True)
+    data = Column(Text, nullable=False)
+
+
+class MediaReference(Base):
+    """Which rows mention which file under MEDIA_ROOT (maintained by media_refs on every flush)."""
+    __tablename__ = "media_references"
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String(512), nullable=False)          # MEDIA_ROOT-relative, e.g. uploads/2024/05/01/<hex>.jpg
+    source_type = Column(String(16), nullable=False)    # section | media | version
+    source_id = Column(Integer, nullable=False)         # sections.id / media.id / story_versions.id
+
+    __table_args__ = (
+        UniqueConstraint("source_type", "source_id", "path", name="uq_media_references_source_path"),
+        Index("idx_media_references_path", "path"),
+    )
+
+
+class SearchDocument(Base):
+    """Searchable text of a post or section (maintained by search on every flush).
+
+    SQLite indexes it with the FTS5 table ``search_fts`` (created by search.py);
+    MySQL with the FULLTEXT index below.
+    """
+    __tablename__ = "search_documents"
+    id = Column(Integer, primary_key=True, index=True)
+    source_type = Column(String(16), nullable=False)    # post | section
+    source_id = Column(Integer, nullable=False)         # posts.id / sections.id
+    title = Column(String(255), nullable=True)
+    body = Column(Text, nullable=True)                  # plain text, HTML stripped
+
+    __table_args__ = (
+        UniqueConstraint("source_type", "source_id", name="uq_search_documents_source"),
+        Index("ft_search_documents_text", "title", "body", mysql_prefix="FULLTEXT", mysql_with_parser="ngram").ddl_if(dialect="mysql"),
+    )
@@ -0,0 +1,37 @@
+"""Opaque keyset-pagination cursors.
+
+A cursor encodes the sort key of the last row of a page; the next page is
+fetched with a range condition on that key instead of OFFSET, so deep pages
+cost the same as the first one.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Sequence
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values: Sequence) -> str:
+    plain = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(plain, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token: str, types: Sequence[type]) -> list:
+    """Decode a cursor produced by ``encode_cursor`` and coerce each value to ``types``."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise InvalidCursor("Malformed cursor")
+        return [
+            datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for value, kind in zip(values, types)
+        ]
+    except InvalidCursor:
+        raise
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Malformed cursor") from exc
@@ -19,6 +19,22 @@ class MediaRead(MediaBase):
     class Config:
         from_attributes = True
 
+class MediaUpdate(MediaBase):
+    id: Optional[int] = None  # existing media row; matched by url when omitted
+
+class MediaOperation(BaseModel):
+    op: str = Field(pattern="^(create|update|delete)$")
+    id: Optional[int] = None          # existing media (update / delete)
+    kind: Optional[str] = Field(default=None, pattern="^(image|gif|video)$")
+    url: Optional[str] = None
+    caption: Optional[str] = None
+    alt_text: Optional[str] = None
+    credit: Optional[str] = None
+    sort_order: Optional[int] = None  # create appends when omitted
+
+class MediaBatch(BaseModel):
+    operations: List[MediaOperation]
+
 class SectionBase(BaseModel):
     type: str
     data: str  # JSON string
@@ -33,6 +49,16 @@ class SectionRead(SectionBase):
     class Config:
         from_attributes = True
 
+class SectionOperation(BaseModel):
+    op: str = Field(pattern="^(create|update|delete|move)$")
+    id: Optional[int] = None          # existing section (update / delete / move)
+    type: Optional[str] = None
+    data: Optional[str] = None        # JSON string
+    sort_order: Optional[int] = None  # target index; create appends when omitted
+
+class SectionBatch(BaseModel):
+    operations: List[SectionOperation]
+
 class StoryBase(BaseModel):
     title: Optional[str] = None
     version: Optional[str] = None
@@ -54,6 +80,14 @@ class StoryRead(StoryBase):
     class Config:
         from_attributes = True
 
+class StoryVersionSummary(BaseModel):
+    version_number: int
+    created_at: datetime
+    size: Optional[int] = Field(default=None, validation_alias="payload_size")
+    content_hash: Optional[str] = Field(default=None, validation_alias="payload_hash")
+    class Config:
+        from_attributes = True
+
 class PostBase(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
@@ -69,7 +103,7 @@ class PostUpdate(BaseModel):
     author: Optional[str] = None
     # allow resetting created_at if needed
     created_at: Optional[datetime] = None
-    media: Optional[List[MediaCreate]] = None  # full replace when provided
+    media: Optional[List[MediaUpdate]] = None  # the full new list; reconciled against existing rows
 
 class PostRead(PostBase):
     id: int
@@ -77,3 +111,47 @@ class PostRead(PostBase):
     media: List[MediaRead] = []
     class Config:
         from_attributes = True
+
+class ImportSummary(BaseModel):
+    """Result of an import run with dry_run=true: what would be written."""
+    dry_run: bool = True
+    posts: int
+    media: int
+
+class UploadSessionCreate(BaseModel):
+    filename: Optional[str] = None
+    size: int = Field(ge=0)  # total bytes the client will send
+    target_path: Optional[str] = None  # same meaning as /upload's target_path
+
+class UploadSessionRead(BaseModel):
+    id: str
+    filename: str
+    size: int
+    received: List[List[int]]  # merged [start, end) ranges already stored
+    received_bytes: int
+    complete: bool
+    expires_at: datetime
+    class Config:
+        from_attributes = True
+
+class MediaReferenceRead(BaseModel):
+    source_type: str  # section | media | version
+    source_id: int
+    class Config:
+        from_attributes = True
+
+class MediaReferences(BaseModel):
+    path: str
+    exists: bool
+    references: List[MediaReferenceRead]
+
+class SearchHit(BaseModel):
+    source_type: str  # post | section
+    source_id: int
+    title: Optional[str] = None
+    snippet: str  # HTML-escaped, matches wrapped in <mark>
+    score: float  # higher is more relevant
+    story_id: Optional[int] = None  # sections only
+    section_type: Optional[str] = None
+    class Config:
+        from_attributes = True
@@ -0,0 +1,384 @@
+"""Full-text search over posts and story sections.
+
+Every post (title + content) and section (the text fields of its JSON) has
+one row in ``search_documents``.  The rows are kept current by an
+``after_flush`` hook, inside the same transaction as the change, for every
+ORM flush that inserts, edits or deletes a Post or a Section.  Core bulk
+inserts bypass the ORM and index their rows with ``index_posts`` /
+``index_story_sections``.
+
+The index itself is SQLite FTS5 (the external-content table ``search_fts``,
+synced from ``search_documents`` by triggers) or the MySQL FULLTEXT index
+declared on the model.  Results are ranked (bm25 / MATCH ... AGAINST) and
+paginated with a keyset cursor on (rank, id).
+
+Chinese text has no spaces between words, so word tokenizers would only find
+whole runs of it.  SQLite therefore uses the ``trigram`` tokenizer (any
+substring of 3+ characters, case-insensitive); shorter terms, such as most
+two-character Chinese words, cannot use the index and are matched with LIKE
+on the documents the other terms found, or on every document when the query
+has no longer term.  MySQL uses the ``ngram`` FULLTEXT parser, which indexes
+``ngram_token_size`` (default 2) character chunks.
+
+Command line::
+
+    python search.py rebuild        # (re)index every existing post and section
+"""
+import html
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import DDL, delete, event, insert, inspect, select, text
+from sqlalchemy.orm import Session
+
+import models
+from pagination import decode_cursor, encode_cursor
+
+POST, SECTION = "post", "section"
+SOURCE_TYPES = (POST, SECTION)
+QUERY_BATCH = 500
+MAX_TERMS = 16
+SNIPPET_CHARS = 160
+TITLE_WEIGHT = 4.0
+# section JSON keys holding reader-visible text (paragraph content, pullquote
+# text / cite, image and video captions, image group items)
+TEXT_FIELDS = ("title", "content", "text", "cite", "caption", "alt", "credit")
+FTS_TOKENIZER = os.getenv("SEARCH_FTS_TOKENIZER", "trigram")
+TRIGRAM = FTS_TOKENIZER.split()[0] == "trigram"
+TRIGRAM_MIN_CHARS = 3
+
+_TAG = re.compile(r"<[^>]+>")
+_SPACE = re.compile(r"\s+")
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+_FTS_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+    f"title, body, content='search_documents', content_rowid='id', tokenize='{FTS_TOKENIZER}')"
+)
+_FTS_DDL = (
+    _FTS_TABLE,
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+)
+
+for _statement in _FTS_DDL:
+    event.listen(models.SearchDocument.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+
+def create_fts(connection) -> None:
+    """Create the SQLite FTS table and triggers if missing (create_all does this for new databases).
+
+    A table built with a different tokenizer than FTS_TOKENIZER is dropped
+    and rebuilt from ``search_documents``.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    existing = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'search_fts'"
+    ).scalar()
+    stale = existing is not None and f"tokenize='{FTS_TOKENIZER}'" not in existing
+    if stale:
+        connection.exec_driver_sql("DROP TABLE search_fts")
+    for statement in _FTS_DDL:
+        connection.exec_driver_sql(statement)
+    if stale:
+        connection.exec_driver_sql("INSERT INTO search_fts(search_fts) VALUES ('rebuild')")
+
+
+def plain_text(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    return _SPACE.sub(" ", html.unescape(_TAG.sub(" ", value))).strip()
+
+
+def section_text(data: Optional[str]) -> str:
+    """The reader-visible text of a section's JSON, in document order."""
+    try:
+        parsed = json.loads(data) if data else None
+    except ValueError:
+        return plain_text(data)
+    parts: List[str] = []
+
+    def walk(node) -> None:
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in TEXT_FIELDS and isinstance(value, str):
+                    parts.append(plain_text(value))
+                elif isinstance(value, (dict, list)):
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(parsed)
+    return " ".join(part for part in parts if part)
+
+
+def _post_document(post: models.Post) -> Tuple[Optional[str], str]:
+    return post.title, plain_text(post.content)
+
+
+def _section_document(section: models.Section) -> Tuple[Optional[str], str]:
+    return None, section_text(section.data)
+
+
+# mapped class -> (source type, attributes whose change matters, document builder)
+TRACKED = {
+    models.Post: (POST, ("title", "content"), _post_document),
+    models.Section: (SECTION, ("data",), _section_document),
+}
+
+
+def index_documents(connection, source_type: str, rows: Iterable[Tuple[int, Optional[str], str]]) -> None:
+    """Replace the documents of (source id, title, body) rows; empty ones are just removed."""
+    rows = list(rows)
+    table = models.SearchDocument.__table__
+    for start in range(0, len(rows), QUERY_BATCH):
+        chunk = rows[start:start + QUERY_BATCH]
+        connection.execute(delete(table).where(
+            table.c.source_type == source_type,
+            table.c.source_id.in_([source_id for source_id, _, _ in chunk]),
+        ))
+        values = [
+            {"source_type": source_type, "source_id": source_id, "title": title, "body": body}
+            for source_id, title, body in chunk
+            if title or body
+        ]
+        if values:
+            connection.execute(insert(table), values)
+
+
+def forget_documents(connection, source_type: str, source_ids: List[int]) -> None:
+    table = models.SearchDocument.__table__
+    for start in range(0, len(source_ids), QUERY_BATCH):
+        connection.execute(delete(table).where(
+            table.c.source_type == source_type,
+            table.c.source_id.in_(source_ids[start:start + QUERY_BATCH]),
+        ))
+
+
+@event.listens_for(Session, "after_flush")
+def _track_documents(session: Session, flush_context) -> None:
+    changed: Dict[str, list] = {}
+    removed: Dict[str, List[int]] = {}
+    for obj in session.new:
+        spec = TRACKED.get(type(obj))
+        if spec:
+            changed.setdefault(spec[0], []).append((obj.id, *spec[2](obj)))
+    for obj in session.dirty:
+        spec = TRACKED.get(type(obj))
+        if spec and any(inspect(obj).attrs[name].history.has_changes() for name in spec[1]):
+            changed.setdefault(spec[0], []).append((obj.id, *spec[2](obj)))
+    for obj in session.deleted:
+        spec = TRACKED.get(type(obj))
+        if spec:
+            removed.setdefault(spec[0], []).append(obj.id)
+    if not changed and not removed:
+        return
+    connection = session.connection()
+    for source_type, source_ids in removed.items():
+        forget_documents(connection, source_type, source_ids)
+    for source_type, rows in changed.items():
+        index_documents(connection, source_type, rows)
+
+
+def _index_select(db: Session, source_type: str, columns, *criteria) -> int:
+    """Index rows matching ``criteria`` in id-ordered pages (no open cursor between pages)."""
+    id_column = columns[0]
+    indexed, last_id = 0, 0
+    while True:
+        rows = db.execute(
+            select(*columns).where(id_column > last_id, *criteria).order_by(id_column).limit(QUERY_BATCH)
+        ).all()
+        if not rows:
+            return indexed
+        last_id = rows[-1][0]
+        if source_type == POST:
+            documents = [(row_id, title, plain_text(content)) for row_id, title, content in rows]
+        else:
+            documents = [(row_id, None, section_text(data)) for row_id, data in rows]
+        index_documents(db.connection(), source_type, documents)
+        indexed += len(rows)
+
+
+def index_posts(db: Session, post_ids: List[int]) -> int:
+    """For posts written with Core bulk inserts (crud.bulk_create_posts)."""
+    indexed = 0
+    for start in range(0, len(post_ids), QUERY_BATCH):
+        chunk = post_ids[start:start + QUERY_BATCH]
+        indexed += _index_select(db, POST, (models.Post.id, models.Post.title, models.Post.content), models.Post.id.in_(chunk))
+    return indexed
+
+
+def index_story_sections(db: Session, story_id: int) -> int:
+    """For sections written with Core bulk inserts (crud.import_story_stream)."""
+    return _index_select(db, SECTION, (models.Section.id, models.Section.data), models.Section.story_id == story_id)
+
+
+def rebuild(db: Session) -> Dict[str, int]:
+    """Re-index every post and section from scratch (for existing data)."""
+    create_fts(db.connection())
+    db.execute(delete(models.SearchDocument.__table__))
+    counts = {
+        POST: _index_select(db, POST, (models.Post.id, models.Post.title, models.Post.content)),
+        SECTION: _index_select(db, SECTION, (models.Section.id, models.Section.data)),
+    }
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(text("INSERT INTO search_fts(search_fts) VALUES ('optimize')"))
+    db.commit()
+    return counts
+
+
+@dataclass
+class SearchHit:
+    source_type: str
+    source_id: int
+    title: Optional[str]
+    snippet: str
+    score: float                    # higher is more relevant
+    story_id: Optional[int] = None  # for sections
+    section_type: Optional[str] = None
+    rank: float = 0.0               # sort key, ascending (kept for the cursor)
+    document_id: int = 0
+
+
+def query_terms(query: str) -> List[str]:
+    """Words of a user query; raises ValueError when there are none."""
+    terms = _TERM.findall(query or "")[:MAX_TERMS]
+    if not terms:
+        raise ValueError("search query must contain at least one word")
+    return terms
+
+
+def fts5_query(terms: List[str]) -> str:
+    """All terms, each quoted (no FTS syntax from users); the last one also matches as a prefix.
+
+    With the trigram tokenizer every term already matches as a substring.
+    """
+    quoted = ['"%s"' % term.replace('"', '""') for term in terms]
+    if not TRIGRAM:
+        quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def like_pattern(term: str) -> str:
+    """LIKE pattern for a term anywhere in the text (escape character: backslash)."""
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def make_snippet(body: Optional[str], terms: List[str], width: int = SNIPPET_CHARS) -> str:
+    """HTML-escaped excerpt of ``body`` around the first match, matches wrapped in <mark>."""
+    if not body:
+        return ""
+    pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    match = pattern.search(body)
+    start = 0 if match is None else max(0, match.start() - width // 3)
+    if start:
+        space = body.find(" ", start)
+        start = space + 1 if 0 <= space < start + 20 else start
+    end = min(len(body), start + width)
+    excerpt = html.escape(body[start:end])
+    excerpt = pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", excerpt)
+    return ("…" if start else "") + excerpt + ("…" if end < len(body) else "")
+
+
+def _ranked_sql(dialect: str, source_type: Optional[str], after: bool, match: bool = True, like_terms: int = 0) -> str:
+    filters = "AND d.source_type = :source_type" if source_type else ""
+    filters += "".join(
+        f" AND (d.title LIKE :like{i} ESCAPE '\\' OR d.body LIKE :like{i} ESCAPE '\\')" for i in range(like_terms)
+    )
+    if dialect == "sqlite" and not match:
+        # only terms too short for the trigram index: scan, unranked
+        inner = (
+            "SELECT d.id, d.source_type, d.source_id, d.title, d.body, 0.0 AS rank "
+            f"FROM search_documents AS d WHERE 1 = 1 {filters}"
+        )
+    elif dialect == "sqlite":
+        inner = (
+            "SELECT d.id, d.source_type, d.source_id, d.title, d.body, "
+            f"bm25(search_fts, {TITLE_WEIGHT}, 1.0) AS rank "
+            "FROM search_fts JOIN search_documents AS d ON d.id = search_fts.rowid "
+            f"WHERE search_fts MATCH :match {filters}"
+        )
+    else:
+        score = "MATCH(d.title, d.body) AGAINST (:match IN NATURAL LANGUAGE MODE)"
+        inner = (
+            f"SELECT d.id, d.source_type, d.source_id, d.title, d.body, -{score} AS rank "
+            f"FROM search_documents AS d WHERE {score} {filters}"
+        )
+    keyset = "WHERE hits.rank > :rank OR (hits.rank = :rank AND hits.id > :id)" if after else ""
+    return f"SELECT * FROM ({inner}) AS hits {keyset} ORDER BY hits.rank, hits.id LIMIT :limit"
+
+
+def search(db: Session, query: str, source_type: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None) -> List[SearchHit]:
+    """Ranked hits for ``query``, best first.
+
+    Pass the cursor from ``next_cursor`` to continue after the previous page.
+    Raises ValueError for an empty query or unknown ``source_type`` and
+    pagination.InvalidCursor for a malformed cursor.
+    """
+    if source_type is not None and source_type not in SOURCE_TYPES:
+        raise ValueError(f"type must be one of {', '.join(SOURCE_TYPES)}")
+    terms = query_terms(query)
+    dialect = db.get_bind().dialect.name
+    params = {"source_type": source_type, "limit": limit}
+    match_terms, like_terms = terms, []
+    if dialect == "sqlite" and TRIGRAM:
+        match_terms = [term for term in terms if len(term) >= TRIGRAM_MIN_CHARS]
+        like_terms = [term for term in terms if len(term) < TRIGRAM_MIN_CHARS]
+    if match_terms:
+        params["match"] = fts5_query(match_terms) if dialect == "sqlite" else " ".join(match_terms)
+    for i, term in enumerate(like_terms):
+        params[f"like{i}"] = like_pattern(term)
+    if cursor:
+        params["rank"], params["id"] = decode_cursor(cursor, (float, int))
+    sql = _ranked_sql(dialect, source_type, bool(cursor), bool(match_terms), len(like_terms))
+    rows = db.execute(text(sql), params).all()
+
+    hits = [
+        SearchHit(
+            source_type=row.source_type,
+            source_id=row.source_id,
+            title=row.title,
+            snippet=make_snippet(row.body, terms),
+            score=-row.rank,
+            rank=row.rank,
+            document_id=row.id,
+        )
+        for row in rows
+    ]
+    section_ids = [hit.source_id for hit in hits if hit.source_type == SECTION]
+    if section_ids:
+        sections = {
+            row.id: row
+            for row in db.execute(
+                select(models.Section.id, models.Section.story_id, models.Section.type).where(models.Section.id.in_(section_ids))
+            )
+        }
+        for hit in hits:
+            section = sections.get(hit.source_id) if hit.source_type == SECTION else None
+            if section is not None:
+                hit.story_id, hit.section_type = section.story_id, section.type
+    return hits
+
+
+def next_cursor(hits: List[SearchHit], limit: int) -> Optional[str]:
+    if not hits or len(hits) < limit:
+        return None
+    return encode_cursor((hits[-1].rank, hits[-1].document_id))
+
+
+if __name__ == "__main__":
+    from database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        print(rebuild(db))
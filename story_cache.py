@@ -0,0 +1,238 @@
+"""In-process caches for GET /story responses.
+
+``StoryCache`` holds the rendered latest story.  Entries are keyed by story
+id and guarded by a per-story change counter: mutations call ``invalidate``
+which bumps the counter and drops the entry, and a render that started before
+the bump is never stored.  The cache lives in a single worker process, so
+other workers' edits and imports are only noticed once an entry is older than
+``STORY_CACHE_TTL`` seconds (default 5).  The TTL covers both the rendered
+body and the remembered latest story id.  ``STORY_CACHE_TTL=none`` keeps both
+until this process changes them, which is only correct with a single worker.
+
+``VersionCache`` holds published snapshots.  Those never change, so they are
+kept as precompressed bytes and served without any JSON work.
+"""
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+try:  # brotli is optional; gzip alone covers every browser
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deployment image
+    brotli = None
+
+
+@dataclass(frozen=True)
+class RenderedStory:
+    body: bytes
+    etag: str
+    created: float
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the exact response bytes."""
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against ``etag`` (weak comparison, RFC 9110)."""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class StoryCache:
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._revisions: Dict[int, int] = {}
+        self._entries: Dict[int, Tuple[int, RenderedStory]] = {}
+        self._latest_story_id: Optional[int] = None
+        self._latest_at = 0.0
+        self._latest_generation = 0
+
+    def revision(self, story_id: int) -> int:
+        with self._lock:
+            return self._revisions.get(story_id, 0)
+
+    def get(self, story_id: int) -> Optional[RenderedStory]:
+        with self._lock:
+            entry = self._entries.get(story_id)
+            if entry is None:
+                return None
+            revision, rendered = entry
+            if revision != self._revisions.get(story_id, 0) or self._expired(rendered):
+                self._entries.pop(story_id, None)
+                return None
+            return rendered
+
+    def put(self, story_id: int, revision: int, body: bytes) -> RenderedStory:
+        """Store ``body`` unless the story changed since ``revision`` was read."""
+        rendered = RenderedStory(body=body, etag=make_etag(body), created=time.monotonic())
+        with self._lock:
+            if self._revisions.get(story_id, 0) == revision:
+                self._entries[story_id] = (revision, rendered)
+        return rendered
+
+    def invalidate(self, story_id: int) -> None:
+        with self._lock:
+            self._revisions[story_id] = self._revisions.get(story_id, 0) + 1
+            self._entries.pop(story_id, None)
+
+    # ----- latest story pointer -----
+    def latest_generation(self) -> int:
+        with self._lock:
+            return self._latest_generation
+
+    @property
+    def latest_story_id(self) -> Optional[int]:
+        """The remembered latest story id; None once it is older than the TTL (re-query the database)."""
+        with self._lock:
+            if self._latest_story_id is not None and self._is_stale(self._latest_at):
+                self._latest_story_id = None
+            return self._latest_story_id
+
+    def remember_latest(self, story_id: int, generation: int) -> None:
+        with self._lock:
+            if self._latest_generation == generation:
+                self._latest_story_id = story_id
+                self._latest_at = time.monotonic()
+
+    def forget_latest(self) -> None:
+        """Call when a story is created or removed, i.e. the latest story may change."""
+        with self._lock:
+            self._latest_generation += 1
+            self._latest_story_id = None
+
+    def clear(self) -> None:
+        with self._lock:
+            for story_id in list(self._revisions):
+                self._revisions[story_id] += 1
+            self._entries.clear()
+            self._latest_generation += 1
+            self._latest_story_id = None
+
+    def _expired(self, rendered: RenderedStory) -> bool:
+        return self._is_stale(rendered.created)
+
+    def _is_stale(self, created: float) -> bool:
+        return self.ttl is not None and time.monotonic() - created > self.ttl
+
+
+DEFAULT_TTL = 5.0
+
+
+def _ttl_from_env() -> Optional[float]:
+    raw = os.getenv("STORY_CACHE_TTL", "").strip().lower()
+    if not raw:
+        return DEFAULT_TTL
+    if raw in ("none", "off"):
+        return None
+    return float(raw)
+
+
+story_cache = StoryCache(ttl=_ttl_from_env())
+
+
+# ----- published versions -----
+@dataclass(frozen=True)
+class EncodedVersion:
+    """A published snapshot held as ready-to-send bytes, one body per content-coding."""
+    etag: str
+    bodies: Dict[str, bytes]
+
+    @property
+    def size(self) -> int:
+        return sum(len(body) for body in self.bodies.values())
+
+
+def encode_version(body: bytes) -> EncodedVersion:
+    bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body, quality=11)
+    return EncodedVersion(etag=make_etag(body), bodies=bodies)
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available) -> str:
+    """Pick the best available content-coding for an Accept-Encoding header."""
+    if not accept_encoding:
+        return "identity"
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    wildcard = weights.get("*", 0.0)
+    # identity stays acceptable unless refused, but any explicitly accepted coding beats it
+    best, best_q = "identity", weights.get("identity", 0.0)
+    for coding in ("br", "gzip"):
+        if coding not in available:
+            continue
+        q = weights.get(coding, wildcard)
+        if q > 0 and q >= best_q:
+            best, best_q = coding, q
+    return best
+
+
+class VersionCache:
+    """Byte-bounded LRU of encoded story versions keyed by (story_id, version_number)."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[int, int], EncodedVersion]" = OrderedDict()
+        self._size = 0
+
+    def get(self, story_id: int, version_number: int) -> Optional[EncodedVersion]:
+        key = (story_id, version_number)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, story_id: int, version_number: int, body: bytes) -> EncodedVersion:
+        encoded = encode_version(body)
+        key = (story_id, version_number)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous.size
+            if encoded.size <= self.max_bytes:
+                self._entries[key] = encoded
+                self._size += encoded.size
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= evicted.size
+        return encoded
+
+    def discard_story(self, story_id: int) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == story_id]:
+                self._size -= self._entries.pop(key).size
+
+
+version_cache = VersionCache(max_bytes=int(os.getenv("STORY_VERSION_CACHE_BYTES", 64 * 1024 * 1024)))
@@ -0,0 +1,105 @@
+"""Turn a story.json document into posts for the bulk import endpoints.
+
+Both ``/import/story`` (one post per section) and ``/import/story_merged``
+(one post for the whole story) go through here and then through
+``crud.bulk_create_posts``, which writes everything in one transaction.
+"""
+from pathlib import Path
+from typing import List, Optional
+
+import schemas
+
+DEFAULT_FRONTEND_ROOT = "F:/work/edit-web/frontend/public"
+
+
+def story_json_path(frontend_root: Optional[str] = None) -> Path:
+    return Path(frontend_root or DEFAULT_FRONTEND_ROOT) / "story.json"
+
+
+def _media(kind: str, item: dict, sort_order: int) -> dict:
+    return {
+        "kind": kind,
+        "url": item.get("src"),
+        "caption": item.get("caption"),
+        "alt_text": item.get("alt", ""),
+        "credit": item.get("credit", ""),
+        "sort_order": sort_order,
+    }
+
+
+def _image_kind(src: str) -> str:
+    return "gif" if src.lower().endswith(".gif") else "image"
+
+
+def section_posts(story: dict) -> List[schemas.PostCreate]:
+    """One post per section with all textual content, collecting media URLs."""
+    posts = []
+    for idx, sec in enumerate(story.get("sections", [])):
+        media_list = []
+        text_blob = []
+
+        t = sec.get("type")
+        if t == "paragraph":
+            text_blob.append(sec.get("content", ""))
+        elif t == "pullquote":
+            text_blob.append(sec.get("text", ""))
+            if sec.get("cite"):
+                text_blob.append(f"— {sec.get('cite')}")
+        elif t == "imagegif":
+            if sec.get("src"):
+                media_list.append(_media(_image_kind(sec["src"]), sec, 0))
+        elif t == "video":
+            if sec.get("src"):
+                media_list.append(_media("video", sec, 0))
+        elif t == "imagegroup":
+            for i, im in enumerate(sec.get("images", [])):
+                media_list.append(_media("image", im, i))
+
+        content_joined = "\n\n".join([s for s in text_blob if s])
+        posts.append(schemas.PostCreate(
+            title=story.get("title", f"Section {idx+1}"),
+            content=content_joined or None,
+            media=[schemas.MediaCreate(**m) for m in media_list],
+        ))
+    return posts
+
+
+def merged_post(story: dict) -> schemas.PostCreate:
+    """The whole story as ONE post: standfirst and text in order, media with a running sort order."""
+    text_parts = []
+    media_list = []
+
+    # include standfirst up front if present
+    if story.get("standfirst"):
+        text_parts.append(story["standfirst"])
+
+    for sec in story.get("sections", []):
+        t = sec.get("type")
+        # text-like
+        if t == "paragraph":
+            if sec.get("content"):
+                text_parts.append(sec["content"])
+        elif t == "pullquote":
+            txt = sec.get("text", "")
+            cite = sec.get("cite") or ""
+            if txt:
+                text_parts.append(f"{txt}\n— {cite}" if cite else txt)
+        # media-like
+        elif t == "imagegif":
+            if sec.get("src"):
+                media_list.append(_media(_image_kind(sec["src"]), sec, len(media_list)))
+        elif t == "video":
+            if sec.get("src"):
+                media_list.append(_media("video", sec, len(media_list)))
+        elif t == "imagegroup":
+            for im in sec.get("images", []):
+                if im.get("src"):
+                    media_list.append(_media("image", im, len(media_list)))
+        # ignore other unknown types gracefully
+
+    merged_text = "\n\n".join([s for s in text_parts if s])
+    return schemas.PostCreate(
+        title=story.get("title") or "Story",
+        content=merged_text or None,
+        media=[schemas.MediaCreate(**m) for m in media_list],
+    )
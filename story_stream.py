@@ -0,0 +1,108 @@
+"""Incremental reading of story.json uploads.
+
+``iter_story_json`` walks the top-level object of a story.json file and
+yields its fields one at a time; the ``sections`` array is yielded element
+by element, so memory stays proportional to the largest single section
+rather than to the file.  It only relies on ``json.JSONDecoder.raw_decode``.
+"""
+import codecs
+import json
+import re
+from typing import BinaryIO, Iterator, Tuple
+
+CHUNK_SIZE = 256 * 1024
+# refuse single values (one section) beyond this, instead of buffering the rest of the file
+MAX_VALUE_CHARS = 64 * 1024 * 1024
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# characters that could still extend a number, e.g. a chunk cut right after "-25000000000."
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*\Z")
+
+
+class _Reader:
+    def __init__(self, fileobj: BinaryIO, chunk_size: int):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, at_least: int = 0) -> bool:
+        """Append more decoded text, dropping what was consumed; False at end of file."""
+        if self.eof:
+            return False
+        data = self.fileobj.read(max(self.chunk_size, at_least))
+        self.buf = self.buf[self.pos:] + self.decoder.decode(data, final=not data)
+        self.pos = 0
+        if not data:
+            self.eof = True
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self.buf, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self):
+        while True:
+            self.peek()
+            try:
+                obj, end = self.json.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # probably cut off mid-value: read more (growing geometrically for huge values)
+                if len(self.buf) - self.pos > MAX_VALUE_CHARS:
+                    raise ValueError("story.json value too large to import")
+                if not self.fill(at_least=len(self.buf) - self.pos):
+                    raise
+                continue
+            if not self.eof and self.buf[self.pos] not in '"{[' and _NUMBER_TAIL.match(self.buf, end):
+                # a number or literal at the buffer edge may continue in the next chunk
+                self.fill(at_least=len(self.buf) - self.pos)
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_story_json(fileobj: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[str, object]]:
+    """Yield ``("field", (key, value))`` for top-level fields and ``("section", dict)`` per section.
+
+    Raises json.JSONDecodeError on malformed input and ValueError when the
+    document is not a story object.
+    """
+    reader = _Reader(fileobj, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+        return
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError("story.json keys must be strings")
+        reader.expect(":")
+        if key == "sections":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    section = reader.value()
+                    if not isinstance(section, dict):
+                        raise ValueError("each section must be a JSON object")
+                    yield "section", section
+                    if reader.expect(",]") == "]":
+                        break
+        else:
+            yield "field", (key, reader.value())
+        if reader.expect(",}") == "}":
+            return
@@ -0,0 +1,183 @@
+"""Write-behind sync of the story table to the static story.json fallback.
+
+Mutations call ``schedule(story_id)`` and return immediately.  A background
+thread waits for a short quiet period, coalescing bursts of edits to the same
+story into one write, then renders the story from a fresh session and
+atomically replaces the file (temp file + ``os.replace``) so readers never see
+a torn document.  ``flush()`` writes everything pending right away; use it on
+shutdown and in scripts that read the file back.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+import crud
+import metrics
+import models
+from story_payload import story_head
+
+logger = logging.getLogger(__name__)
+
+
+# read once at import: os.umask can only be queried by setting it, which is not thread-safe
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _file_mode(path: Path) -> int:
+    """Permission bits of ``path``, or what a plain ``open(path, "w")`` would give a new file."""
+    try:
+        return path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def write_atomic(path: Path, text: Union[str, Iterable[str]]) -> None:
+    """Replace ``path`` with ``text`` (a string or an iterable of chunks) without ever exposing a partially written file."""
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        # mkstemp creates 0600 and os.replace keeps it: keep the file readable by whoever could read it before
+        os.chmod(tmp_name, _file_mode(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            if isinstance(text, str):
+                handle.write(text)
+            else:
+                handle.writelines(text)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def iter_story_file(head: dict, sections: Iterable[Tuple[str, str]]) -> Iterator[str]:
+    """Yield the text of ``json.dumps(payload, ensure_ascii=False, indent=2)`` chunk by chunk.
+
+    ``sections`` are (type, data) rows; only one section is decoded at a time,
+    so arbitrarily large stories are written with flat memory.
+    """
+    text = json.dumps(head, ensure_ascii=False, indent=2)
+    yield text[:-len("\n}")]
+    first = True
+    for section_type, data in sections:
+        try:
+            parsed = json.loads(data or "{}")
+        except json.JSONDecodeError:
+            parsed = {"type": section_type}
+        body = json.dumps(parsed, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+        yield (',\n  "sections": [\n    ' if first else ",\n    ") + body
+        first = False
+    yield ',\n  "sections": []\n}' if first else "\n  ]\n}"
+
+
+class StoryJsonSyncer:
+    def __init__(self, session_factory: Callable, path: Path, delay: float = 0.5, max_delay: Optional[float] = None):
+        self.session_factory = session_factory
+        self.path = path
+        self.delay = delay
+        self.max_delay = max_delay if max_delay is not None else delay * 10
+        self._cond = threading.Condition()
+        # story_id -> (first scheduled, write due at)
+        self._pending: Dict[int, Tuple[float, float]] = {}
+        self._writing = False
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, story_id: int) -> None:
+        now = time.monotonic()
+        with self._cond:
+            first, _ = self._pending.get(story_id, (now, now))
+            # debounce, but never postpone a write past max_delay during continuous editing
+            self._pending[story_id] = (first, min(now + self.delay, first + self.max_delay))
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write all pending stories now and wait for them; False if ``timeout`` expired first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            for story_id, (first, _) in self._pending.items():
+                self._pending[story_id] = (first, 0.0)
+            self._cond.notify_all()
+            while self._pending or self._writing:
+                if self._thread is None or not self._thread.is_alive():
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    @metrics.timed("story_json_sync")
+    def sync_now(self, story_id: int) -> bool:
+        """Render and write one story synchronously (bypasses the queue); False if nothing was written."""
+        if not self.path.exists():
+            logger.warning(
+                "story.json not found at %s; skipping sync to avoid creating new files",
+                self.path,
+            )
+            return False
+
+        db = self.session_factory()
+        try:
+            story = db.get(models.Story, story_id)
+            if not story:
+                return False
+            sections = ((section_type, data) for _, section_type, data in crud.iter_story_sections(db, story_id))
+            write_atomic(self.path, iter_story_file(story_head(story), sections))
+        except OSError as exc:
+            logger.warning("Failed to sync story.json: %s", exc)
+            return False
+        finally:
+            db.close()
+        return True
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="story-json-sync", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    due = [story_id for story_id, (_, at) in self._pending.items() if at <= now]
+                    if due or (self._stopping and not self._pending):
+                        break
+                    timeout = min(at for _, at in self._pending.values()) - now if self._pending else None
+                    self._cond.wait(timeout)
+                if not due:
+                    return
+                for story_id in due:
+                    del self._pending[story_id]
+                self._writing = True
+            try:
+                for story_id in due:
+                    try:
+                        self.sync_now(story_id)
+                    except Exception:
+                        logger.exception("story.json sync failed for story %s", story_id)
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
@@ -0,0 +1,35 @@
+"""Point the app at a throwaway database, media root and story.json before anything imports it."""
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+_scratch = Path(tempfile.mkdtemp(prefix="tests-"))
+shutil.copy(REPO_ROOT / "public" / "story.json", _scratch / "story.json")
+os.environ["DB_URL"] = f"sqlite:///{_scratch / 'test.db'}"
+os.environ["MEDIA_ROOT"] = str(_scratch / "media")
+os.environ["STORY_JSON_PATH"] = str(_scratch / "story.json")
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+if str(REPO_ROOT / "benchmarks") not in sys.path:
+    sys.path.append(str(REPO_ROOT / "benchmarks"))  # harness.ASGIClient, the in-process client
+
+
+@pytest.fixture(scope="session")
+def migrated():
+    import migrations
+    migrations.upgrade(pause=0)
+
+
+@pytest.fixture
+def db(migrated):
+    from database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
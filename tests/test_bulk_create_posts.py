@@ -0,0 +1,12 @@
+import crud
+import schemas
+
+
+def test_bulk_created_posts_come_back_in_input_order(db):
+    posts = [
+        schemas.PostCreate(title=f"bulk {i}", content="x", author="a", media=[{"kind": "image", "url": f"/m/{i}.jpg"}])
+        for i in range(25)
+    ]
+    created = crud.bulk_create_posts(db, posts, batch_size=10)
+    assert [post.title for post in created] == [post.title for post in posts]
+    assert [post.media[0].url for post in created] == [f"/m/{i}.jpg" for i in range(25)]
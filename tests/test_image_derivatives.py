@@ -0,0 +1,49 @@
+import io
+import os
+
+import pytest
+
+import image_derivatives
+import media_store
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _jpeg(width=1400, height=900) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 90)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _variant_mtimes(relative_path):
+    out_dir = media_store.MEDIA_ROOT / image_derivatives.derivatives_dir(relative_path)
+    return {path.name: path.stat().st_mtime_ns for path in out_dir.iterdir()}
+
+
+def _build(relative_path):
+    return image_derivatives.build_derivatives(str(media_store.MEDIA_ROOT), relative_path.as_posix(), (320, 640))
+
+
+def test_identical_reupload_reuses_the_variants():
+    data = _jpeg()
+    first = media_store.save_stream(io.BytesIO(data), ".jpg")
+    manifest = _build(first.relative_path)
+    assert manifest["sourceSha256"] == first.sha256
+    # pretend the variants were built a while ago, so any rewrite is visible
+    out_dir = media_store.MEDIA_ROOT / image_derivatives.derivatives_dir(first.relative_path)
+    for path in out_dir.iterdir():
+        os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    before = _variant_mtimes(first.relative_path)
+
+    second = media_store.save_stream(io.BytesIO(data), ".jpg")  # dedup touches the original
+    assert second.deduplicated and second.relative_path == first.relative_path
+    assert _build(second.relative_path) == manifest
+    assert _variant_mtimes(second.relative_path) == before
+
+
+def test_replaced_original_at_a_target_path_is_rebuilt():
+    relative_path = media_store.target_relative_path("/uploads/replaced.jpg")
+    media_store.save_stream(io.BytesIO(_jpeg(1000, 500)), ".jpg", relative_path)
+    assert _build(relative_path)["width"] == 1000
+    media_store.save_stream(io.BytesIO(_jpeg(800, 400)), ".jpg", relative_path)
+    assert _build(relative_path)["width"] == 800
@@ -0,0 +1,50 @@
+import crud
+import media_refs
+import models
+import schemas
+
+
+def _post_with_media(db, *urls):
+    return crud.create_post(db, schemas.PostCreate(title="Gallery", media=[
+        schemas.MediaCreate(kind="image", url=url, sort_order=index) for index, url in enumerate(urls)
+    ]))
+
+
+def _referenced(db, path):
+    return [(ref.source_type, ref.source_id) for ref in media_refs.references_to(db, path)]
+
+
+def test_put_dropping_media_forgets_its_references(db):
+    post = _post_with_media(db, "/media/uploads/put-keep.jpg", "/media/uploads/put-drop.jpg")
+    keep, drop = post.media
+    assert _referenced(db, "uploads/put-drop.jpg") == [(media_refs.MEDIA, drop.id)]
+
+    # PUT /posts/{id}: media missing from the list is removed via delete-orphan
+    crud.update_post(db, post.id, schemas.PostUpdate(media=[
+        schemas.MediaUpdate(id=keep.id, kind="image", url=keep.url, sort_order=0),
+    ]))
+
+    assert db.get(models.Media, drop.id) is None
+    assert _referenced(db, "uploads/put-drop.jpg") == []
+    assert _referenced(db, "uploads/put-keep.jpg") == [(media_refs.MEDIA, keep.id)]
+
+
+def test_patch_delete_operation_forgets_its_references(db):
+    post = _post_with_media(db, "/media/uploads/patch-keep.jpg", "/media/uploads/patch-drop.jpg")
+    keep, drop = post.media
+
+    # PATCH /posts/{id}/media
+    crud.apply_media_operations(db, post.id, [
+        schemas.MediaOperation(op="delete", id=drop.id),
+        schemas.MediaOperation(op="create", kind="image", url="/media/uploads/patch-new.jpg"),
+    ])
+
+    assert _referenced(db, "uploads/patch-drop.jpg") == []
+    assert _referenced(db, "uploads/patch-keep.jpg") == [(media_refs.MEDIA, keep.id)]
+    assert len(_referenced(db, "uploads/patch-new.jpg")) == 1
+
+
+def test_deleting_a_post_forgets_its_media_references(db):
+    post = _post_with_media(db, "/media/uploads/post-delete.jpg")
+    assert crud.delete_post(db, post.id)
+    assert _referenced(db, "uploads/post-delete.jpg") == []
@@ -0,0 +1,54 @@
+import io
+
+import pytest
+
+import media_store
+import upload_sessions
+
+DIGEST = "4418" + "0" * 60
+
+RESERVED_TARGETS = [
+    f"/sha256/44/18/{DIGEST}.jpg",
+    "sha256/new.jpg",
+    "/.incoming/abc",
+    "/.incoming/sessions/abc/data",
+    "/uploads/.hidden/foo.jpg",
+    "/uploads/photo.jpg.derivatives/w640.webp",
+    "/uploads/photo.jpg.derivatives/manifest.json",
+]
+
+
+@pytest.mark.parametrize("target", RESERVED_TARGETS)
+def test_target_path_rejects_server_managed_locations(target):
+    with pytest.raises(ValueError):
+        media_store.target_relative_path(target)
+
+
+@pytest.mark.parametrize("target", RESERVED_TARGETS)
+def test_upload_session_rejects_server_managed_locations(target):
+    with pytest.raises(ValueError):
+        upload_sessions.create_session("photo.jpg", 4, target)
+
+
+@pytest.mark.parametrize("target", ["/../etc/passwd", "/uploads/../../x", ""])
+def test_target_path_rejects_escapes(target):
+    with pytest.raises(ValueError):
+        media_store.target_relative_path(target)
+
+
+def test_target_path_accepts_plain_paths():
+    assert media_store.target_relative_path("/media/uploads/foo.jpg").as_posix() == "media/uploads/foo.jpg"
+    assert media_store.target_relative_path("uploads/sha256/foo.jpg").as_posix() == "uploads/sha256/foo.jpg"
+
+
+def test_content_addressed_original_cannot_be_replaced():
+    original = b"original bytes"
+    stored = media_store.save_stream(io.BytesIO(original), ".jpg")
+    with pytest.raises(ValueError):
+        media_store.target_relative_path("/" + stored.relative_path.as_posix())
+    assert (media_store.MEDIA_ROOT / stored.relative_path).read_bytes() == original
+
+
+def test_lookups_still_resolve_content_addressed_paths():
+    path = media_store.media_relative_path(f"/sha256/44/18/{DIGEST}.jpg")
+    assert path.parts[0] == media_store.CONTENT_DIR
@@ -0,0 +1,107 @@
+import json
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import Session
+
+import migrations
+import models
+from story_payload import build_story_payload, render_story_bytes, render_story_json
+
+
+def test_existing_posts_table_gets_the_keyset_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        # a posts table from before the keyset index existed
+        connection.exec_driver_sql(
+            "CREATE TABLE posts (id INTEGER PRIMARY KEY, title VARCHAR(255), content TEXT, "
+            "author VARCHAR(255), created_at DATETIME)"
+        )
+    migrations.upgrade(engine, pause=0)
+    indexes = {index["name"]: index["column_names"] for index in inspect(engine).get_indexes("posts")}
+    assert indexes["idx_posts_created_at_id"] == ["created_at", "id"]
+    assert all(row["state"] == "applied" for row in migrations.status(engine))
+    engine.dispose()
+
+
+def test_legacy_section_data_is_normalized(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    migrations.upgrade(engine, pause=0)
+    legacy = {
+        1: '{"type": "paragraph",  "content": "spaced"}',
+        2: '{"type": "paragraph", "content": "cut off"',
+        3: '{broken}',
+        4: '[1, 2]',
+        5: None,
+        6: '{"type":"paragraph","content":"ok"}',
+    }
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO stories (id, title, version, standfirst, created_at, updated_at) "
+            "VALUES (1, 'Legacy', '1.0', '', '2024-01-01', '2024-01-01')"
+        )
+        for section_id, data in legacy.items():
+            connection.exec_driver_sql(
+                "INSERT INTO sections (id, story_id, type, sort_order, data) VALUES (?, 1, 'paragraph', ?, ?)",
+                (section_id, section_id * 1024, data),
+            )
+        connection.exec_driver_sql("DELETE FROM schema_migrations WHERE version = 7")
+
+    assert 7 in migrations.upgrade(engine, pause=0)
+
+    with engine.connect() as connection:
+        stored = dict(connection.exec_driver_sql("SELECT id, data FROM sections").all())
+    assert stored == {
+        1: '{"type":"paragraph","content":"spaced"}',
+        2: '{"type":"paragraph"}',
+        3: '{"type":"paragraph"}',
+        4: '{"type":"paragraph"}',
+        5: None,
+        6: '{"type":"paragraph","content":"ok"}',
+    }
+    engine.dispose()
+
+
+def test_story_with_legacy_rows_renders_valid_json(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'render.db'}")
+    migrations.upgrade(engine, pause=0)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO stories (id, title, version, standfirst, created_at, updated_at) "
+            "VALUES (1, 'Legacy', '1.0', '', '2024-01-01', '2024-01-01')"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO sections (story_id, type, sort_order, data) VALUES (1, 'quote', 0, '{\"text\": \"x\"')"
+        )
+        connection.exec_driver_sql("DELETE FROM schema_migrations WHERE version = 7")
+    migrations.upgrade(engine, pause=0)
+    with Session(engine) as db:
+        story = db.get(models.Story, 1)
+        rendered = render_story_json(story)
+        assert json.loads(rendered)["sections"] == [{"type": "quote"}]
+        assert rendered == render_story_bytes(build_story_payload(story))
+    engine.dispose()
+
+
+def test_search_index_is_rebuilt_with_the_trigram_tokenizer(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'words.db'}")
+    migrations.upgrade(engine, pause=0)
+    with engine.begin() as connection:
+        # the index as the word tokenizer built it, before migration 8
+        connection.exec_driver_sql("DROP TABLE search_fts")
+        connection.exec_driver_sql(
+            "CREATE VIRTUAL TABLE search_fts USING fts5(title, body, content='search_documents', "
+            "content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO search_documents (id, source_type, source_id, title, body) VALUES (1, 'post', 1, '', '全文检索测试')"
+        )
+        connection.exec_driver_sql("DELETE FROM schema_migrations WHERE version = 8")
+
+    assert 8 in migrations.upgrade(engine, pause=0)
+
+    with engine.connect() as connection:
+        ddl = connection.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'search_fts'").scalar()
+        found = connection.exec_driver_sql("SELECT rowid FROM search_fts WHERE search_fts MATCH '\"文检索\"'").all()
+    assert "tokenize='trigram'" in ddl
+    assert found == [(1,)]
+    engine.dispose()
@@ -0,0 +1,84 @@
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+import crud
+import models
+import schemas
+from database import SessionLocal
+from story_payload import build_story_payload
+
+
+def _integrity(message):
+    return IntegrityError("INSERT ...", {}, sqlite3.IntegrityError(message))
+
+
+def _operational(message):
+    return OperationalError("UPDATE ...", {}, sqlite3.OperationalError(message))
+
+
+@pytest.mark.parametrize("exc, retry", [
+    (_integrity("UNIQUE constraint failed: story_versions.story_id, story_versions.version_number"), True),
+    (_integrity("(1062, \"Duplicate entry '3-7' for key 'story_versions.uq_story_versions_story_version'\")"), True),
+    (_operational("database is locked"), True),
+    (_integrity("FOREIGN KEY constraint failed"), False),
+    (_integrity("NOT NULL constraint failed: story_versions.payload"), False),
+    (_integrity("UNIQUE constraint failed: section_blobs.hash"), False),
+    (_operational("no such table: story_versions"), False),
+])
+def test_only_version_races_and_lock_conflicts_are_retried(exc, retry):
+    assert crud._retryable_publish_error(exc) is retry
+
+
+def test_other_integrity_errors_are_raised_without_retrying(db, monkeypatch):
+    calls = []
+
+    def failing_insert(session, story_id, payload):
+        calls.append(story_id)
+        raise _integrity("FOREIGN KEY constraint failed")
+
+    monkeypatch.setattr(crud, "_insert_story_version", failing_insert)
+    with pytest.raises(IntegrityError):
+        crud.record_story_version(db, 1, {"title": "x", "sections": []})
+    assert calls == [1]
+
+
+def test_concurrent_publishes_get_contiguous_unique_version_numbers(db):
+    """A reduced-scale run of benchmarks/stress_publish.py."""
+    threads, per_thread = 4, 10
+    story = crud.create_story(db, schemas.StoryCreate(
+        title="Concurrent publish",
+        sections=[
+            schemas.SectionCreate(type="paragraph", data=f'{{"type":"paragraph","content":"{i}"}}', sort_order=i)
+            for i in range(5)
+        ],
+    ))
+    story_id = story.id
+    payload = build_story_payload(story)
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            for _ in range(per_thread):
+                crud.record_story_version(session, story_id, payload)
+        except Exception as exc:
+            errors.append(repr(exc))
+        finally:
+            session.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    assert errors == []
+    numbers = sorted(
+        n for (n,) in db.query(models.StoryVersion.version_number).filter(models.StoryVersion.story_id == story_id)
+    )
+    assert numbers == list(range(1, threads * per_thread + 1))
@@ -0,0 +1,70 @@
+"""Fixed maximum number of SQL statements per endpoint, which is how N+1 lazy loads show up."""
+import asyncio
+
+import pytest
+
+import crud
+import schemas
+from database import SessionLocal, async_engine, count_queries
+from harness import ASGIClient
+from story_cache import story_cache, version_cache
+
+POSTS, SECTIONS = 40, 300
+
+# (name, method, path, params, max statements, warm caches?)
+BUDGETS = [
+    ("list posts", "GET", "/posts", {"limit": 100}, 2, False),
+    ("read post", "GET", "/posts/{post_id}", {}, 2, False),
+    ("list sections", "GET", "/sections", {"story_id": "{story_id}", "limit": 100}, 1, False),
+    ("story (cold)", "GET", "/story", {}, 4, False),
+    ("story (warm)", "GET", "/story", {}, 0, True),
+    ("story version (cold)", "GET", "/story", {"version": 1}, 2, False),
+    ("story version (warm)", "GET", "/story", {"version": 1}, 0, True),
+]
+
+
+@pytest.fixture(scope="module")
+def seeded(migrated):
+    db = SessionLocal()
+    try:
+        post_ids = [
+            crud.create_post(db, schemas.PostCreate(
+                title=f"Post {i}",
+                content="Body " * 20,
+                media=[schemas.MediaCreate(kind="image", url=f"/media/p{i}-{j}.jpg", sort_order=j) for j in range(3)],
+            )).id
+            for i in range(POSTS)
+        ]
+        sections = [
+            schemas.SectionCreate(type="paragraph", data=f'{{"type":"paragraph","content":"Section {i}"}}', sort_order=i)
+            for i in range(SECTIONS)
+        ]
+        story = crud.create_story(db, schemas.StoryCreate(title="Budget story", sections=sections))
+        crud.record_story_version(db, story.id, {"id": story.id, "sections": []})
+        ids = {"post_id": post_ids[0], "story_id": story.id}
+    finally:
+        db.close()
+    story_cache.clear()
+    yield ids
+    # pooled aiosqlite connections run on their own threads; close them so the process can exit
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture(scope="module")
+def client(seeded):
+    import main
+    return ASGIClient(main.app)
+
+
+@pytest.mark.parametrize("name, method, path, params, budget, warm", BUDGETS, ids=[budget[0] for budget in BUDGETS])
+def test_statement_budget(seeded, client, name, method, path, params, budget, warm):
+    path = path.format(**seeded)
+    params = {key: str(value).format(**seeded) for key, value in params.items()}
+    story_cache.clear()
+    version_cache.discard_story(seeded["story_id"])
+    if warm:
+        assert client.call(method, path, params=params).status == 200
+    with count_queries() as statements:
+        response = client.call(method, path, params=params)
+    assert response.status == 200
+    assert len(statements) <= budget, "\n".join(" ".join(statement.split())[:160] for statement in statements)
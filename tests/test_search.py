@@ -0,0 +1,36 @@
+import pytest
+
+import crud
+import schemas
+import search
+from database import SessionLocal
+
+
+@pytest.fixture(scope="module")
+def posts(migrated):
+    with SessionLocal() as db:
+        created = crud.bulk_create_posts(db, [
+            schemas.PostCreate(title="城市更新", content="<p>老城区的全文检索测试：改造计划今年启动。</p>", author="a"),
+            schemas.PostCreate(title="River crossing", content="The new bridge opens in spring.", author="a"),
+        ])
+        return {post.title: post.id for post in created}
+
+
+def _post_ids(db, query):
+    return [hit.source_id for hit in search.search(db, query, search.POST)]
+
+
+def test_chinese_substring_matches_inside_a_run_without_spaces(db, posts):
+    assert _post_ids(db, "检索测试") == [posts["城市更新"]]
+    assert _post_ids(db, "改造计划") == [posts["城市更新"]]
+
+
+def test_terms_shorter_than_a_trigram_still_match(db, posts):
+    assert _post_ids(db, "改造") == [posts["城市更新"]]
+    assert _post_ids(db, "老城区 今年") == [posts["城市更新"]]
+    assert _post_ids(db, "bridge 城区") == []
+
+
+def test_latin_words_match_case_insensitively_and_as_substrings(db, posts):
+    assert _post_ids(db, "BRIDGE") == [posts["River crossing"]]
+    assert _post_ids(db, "cross") == [posts["River crossing"]]
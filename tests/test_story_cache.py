@@ -0,0 +1,31 @@
+import time
+
+from story_cache import StoryCache
+
+
+def test_latest_story_pointer_expires_with_the_ttl(monkeypatch):
+    cache = StoryCache(ttl=5)
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache.remember_latest(1, cache.latest_generation())
+    assert cache.latest_story_id == 1
+    now[0] += 6  # another worker may have imported a newer story meanwhile
+    assert cache.latest_story_id is None
+    cache.remember_latest(2, cache.latest_generation())
+    assert cache.latest_story_id == 2
+
+
+def test_rendered_entry_expires_with_the_ttl(monkeypatch):
+    cache = StoryCache(ttl=5)
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache.put(1, cache.revision(1), b"{}")
+    assert cache.get(1) is not None
+    now[0] += 6
+    assert cache.get(1) is None
+
+
+def test_without_ttl_the_pointer_is_kept():
+    cache = StoryCache(ttl=None)
+    cache.remember_latest(1, cache.latest_generation())
+    assert cache.latest_story_id == 1
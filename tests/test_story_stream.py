@@ -0,0 +1,44 @@
+import io
+import json
+
+import pytest
+
+from story_stream import iter_story_json
+
+# numbers cut mid-way ("-", ".", "e", "E+") and multi-byte characters land on
+# chunk boundaries for some chunk size
+DOC = """\ufeff{"t": -25000000000.0, "title": "Café ünïcode — story", "version": "1.0",
+  "ratio": 1.5e-07, "big": -0.5E+10, "count": 12345678901234567890,
+  "flags": [true, false, null], "theme": {"font": "Montserrat", "primaryColor": "#fff", "scale": -3},
+  "sections": [
+    {"type": "paragraph", "content": "He said \\"hi\\" \\\\ then left", "n": 0},
+    {"type": "stat", "value": -1.25e+3, "delta": 0.0, "ok": true},
+    {"type": "imagegroup", "images": [{"src": "/media/uploads/a.jpg", "w": 640}]}
+  ],
+  "trailing": 7}"""
+
+
+def _parse(doc: str, chunk_size: int) -> dict:
+    result = {"sections": []}
+    for kind, value in iter_story_json(io.BytesIO(doc.encode("utf-8")), chunk_size=chunk_size):
+        if kind == "section":
+            result["sections"].append(value)
+        else:
+            key, field_value = value
+            result[key] = field_value
+    return result
+
+
+def test_every_chunk_size_parses_the_same():
+    expected = json.loads(DOC.lstrip("\ufeff"))
+    for chunk_size in range(1, len(DOC.encode("utf-8")) + 1):
+        assert _parse(DOC, chunk_size) == expected, f"chunk_size={chunk_size}"
+
+
+def test_number_cut_after_decimal_point():
+    assert _parse('{"t": -25000000000.0}', 19) == {"sections": [], "t": -25000000000.0}
+
+
+def test_malformed_document_still_raises():
+    with pytest.raises(json.JSONDecodeError):
+        _parse('{"t": 1,, "x": 2}', 4)
@@ -0,0 +1,21 @@
+import os
+import stat
+
+from story_sync import write_atomic
+
+
+def test_replacing_keeps_the_file_mode(tmp_path):
+    path = tmp_path / "story.json"
+    path.write_text("{}", encoding="utf-8")
+    os.chmod(path, 0o664)
+    write_atomic(path, '{"title": "New"}')
+    assert path.read_text(encoding="utf-8") == '{"title": "New"}'
+    assert stat.S_IMODE(path.stat().st_mode) == 0o664
+
+
+def test_new_file_gets_the_default_mode(tmp_path):
+    path = tmp_path / "story.json"
+    write_atomic(path, iter(["{", "}"]))
+    plain = tmp_path / "plain.json"
+    plain.write_text("{}", encoding="utf-8")
+    assert stat.S_IMODE(path.stat().st_mode) == stat.S_IMODE(plain.stat().st_mode)
@@ -0,0 +1,46 @@
+import asyncio
+import json
+import threading
+
+from sqlalchemy import event
+
+import main
+from database import engine
+from harness import ASGIClient
+
+BOUNDARY = "story-upload-test"
+
+
+def _multipart(filename: str, content: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: application/json\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def test_upload_import_runs_no_sql_on_the_event_loop(migrated):
+    story = {"title": "Uploaded", "sections": [{"type": "paragraph", "content": f"p{i}"} for i in range(3)]}
+    loop_thread = threading.get_ident()  # ASGIClient drives the app on this thread's loop
+    on_loop = []
+
+    def record(conn, cursor, statement, *args):
+        if threading.get_ident() == loop_thread:
+            on_loop.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = asyncio.run(ASGIClient(main.app).request(
+            "POST", "/import/story_upload",
+            headers={"content-type": f"multipart/form-data; boundary={BOUNDARY}"},
+            body=_multipart("story.json", json.dumps(story).encode()),
+        ))
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        asyncio.run(main.async_engine.dispose())
+
+    assert response.status == 200
+    body = json.loads(response.body)
+    assert body["title"] == "Uploaded"
+    assert [s["sort_order"] for s in body["sections"]] == [0, 1, 2]
+    assert on_loop == []
@@ -0,0 +1,219 @@
+"""Resumable upload sessions for large media files.
+
+A session is a directory under ``MEDIA_ROOT/.incoming/sessions/<id>`` holding
+
+- ``session.json``: file name, extension, declared size, optional target path;
+- ``data``: a sparse file of the declared size that ranges are written into
+  at their offsets, so parts may arrive in any order and are never copied
+  again;
+- ``ranges/<start>-<end>``: one empty marker per fully received range.
+
+Markers are created only after their bytes are on disk, and each marker is a
+separate file, so concurrent PUTs (even from several worker processes) need
+no locking.  Finalizing hashes ``data`` once and ``os.replace``s it into
+MEDIA_ROOT through ``media_store.store_file``.  Sessions untouched for
+UPLOAD_SESSION_TTL seconds are removed by ``remove_expired``.
+
+Everything here is blocking file I/O: call it from a worker thread.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import media_store
+
+SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", 24 * 3600))
+MAX_UPLOAD_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", 16 * 1024 ** 3))
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+_CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+class UploadSessionError(ValueError):
+    """The request does not fit the session (bad range, incomplete upload, ...)."""
+
+
+@dataclass
+class UploadSession:
+    id: str
+    filename: str
+    extension: str
+    size: int
+    target_path: Optional[str]
+    created_at: float
+    updated_at: float
+    received: List[Tuple[int, int]]
+
+    @property
+    def received_bytes(self) -> int:
+        return sum(end - start for start, end in self.received)
+
+    @property
+    def complete(self) -> bool:
+        return self.received == [(0, self.size)] or self.size == 0
+
+    @property
+    def expires_at(self) -> float:
+        return self.updated_at + SESSION_TTL
+
+
+def sessions_root() -> Path:
+    return media_store.MEDIA_ROOT / media_store.INCOMING_DIR / "sessions"
+
+
+def _session_dir(session_id: str) -> Optional[Path]:
+    if not _SESSION_ID.match(session_id or ""):
+        return None
+    directory = sessions_root() / session_id
+    return directory if (directory / "session.json").exists() else None
+
+
+def parse_content_range(header: Optional[str]) -> Tuple[int, int, Optional[int]]:
+    """``bytes start-end/total`` -> (start, end exclusive, total or None); raises UploadSessionError."""
+    match = _CONTENT_RANGE.match((header or "").strip())
+    if not match:
+        raise UploadSessionError("Content-Range must look like 'bytes <start>-<end>/<total>'")
+    start, last = int(match.group(1)), int(match.group(2))
+    if last < start:
+        raise UploadSessionError("Content-Range end is before its start")
+    total = None if match.group(3) == "*" else int(match.group(3))
+    return start, last + 1, total
+
+
+def merge_ranges(ranges) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def create_session(filename: Optional[str], size: int, target_path: Optional[str] = None) -> UploadSession:
+    """Start a session for a file of ``size`` bytes; raises ValueError for a bad size or target."""
+    if size < 0 or size > MAX_UPLOAD_SIZE:
+        raise UploadSessionError(f"size must be between 0 and {MAX_UPLOAD_SIZE} bytes")
+    if target_path:
+        media_store.target_relative_path(target_path)
+    session_id = uuid.uuid4().hex
+    directory = sessions_root() / session_id
+    (directory / "ranges").mkdir(parents=True)
+    with open(directory / "data", "wb") as data:
+        data.truncate(size)  # sparse: no disk is used until ranges arrive
+    now = time.time()
+    meta = {
+        "filename": filename or "upload",
+        "extension": media_store.clean_extension(filename),
+        "size": size,
+        "target_path": target_path,
+        "created_at": now,
+    }
+    tmp_meta = directory / "session.json.tmp"
+    tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp_meta, directory / "session.json")  # the session exists once this file does
+    return get_session(session_id)
+
+
+def get_session(session_id: str) -> Optional[UploadSession]:
+    directory = _session_dir(session_id)
+    if directory is None:
+        return None
+    meta_path = directory / "session.json"
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        updated_at = max(meta_path.stat().st_mtime, (directory / "ranges").stat().st_mtime)
+        names = os.listdir(directory / "ranges")
+    except (OSError, ValueError):
+        return None
+    ranges = []
+    for name in names:
+        start, _, end = name.partition("-")
+        if start.isdigit() and end.isdigit():
+            ranges.append((int(start), int(end)))
+    return UploadSession(
+        id=session_id,
+        filename=meta["filename"],
+        extension=meta["extension"],
+        size=meta["size"],
+        target_path=meta.get("target_path"),
+        created_at=meta["created_at"],
+        updated_at=updated_at,
+        received=merge_ranges(ranges),
+    )
+
+
+def open_range(session: UploadSession, start: int, end: int, total: Optional[int]):
+    """Validate a range for ``session`` and return the data file positioned at ``start``."""
+    if total is not None and total != session.size:
+        raise UploadSessionError(f"Content-Range total {total} does not match the session size {session.size}")
+    if end > session.size:
+        raise UploadSessionError(f"range ends past the declared size {session.size}")
+    handle = open(sessions_root() / session.id / "data", "r+b")
+    handle.seek(start)
+    return handle
+
+
+def commit_range(session: UploadSession, handle, start: int, end: int) -> None:
+    """Flush the bytes written through ``handle`` and record the range as received."""
+    try:
+        handle.flush()
+        os.fsync(handle.fileno())
+    finally:
+        handle.close()
+    (sessions_root() / session.id / "ranges" / f"{start}-{end}").touch()
+
+
+def finalize_session(session: UploadSession) -> media_store.StoredFile:
+    """Move a complete upload into MEDIA_ROOT (no copy) and drop the session."""
+    if not session.complete:
+        raise UploadSessionError(
+            f"upload incomplete: {session.received_bytes} of {session.size} bytes received"
+        )
+    directory = sessions_root() / session.id
+    data_path = directory / "data"
+    sha256 = hashlib.sha256()
+    with open(data_path, "rb") as data:
+        for chunk in iter(lambda: data.read(media_store.CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    relative_path = media_store.target_relative_path(session.target_path) if session.target_path else None
+    stored = media_store.store_file(data_path, sha256.hexdigest(), session.size, session.extension, relative_path)
+    shutil.rmtree(directory, ignore_errors=True)
+    return stored
+
+
+def delete_session(session_id: str) -> bool:
+    directory = _session_dir(session_id)
+    if directory is None:
+        return False
+    shutil.rmtree(directory, ignore_errors=True)
+    return True
+
+
+def remove_expired(now: Optional[float] = None) -> int:
+    """Delete sessions idle for longer than SESSION_TTL; returns how many were removed."""
+    now = time.time() if now is None else now
+    root = sessions_root()
+    if not root.is_dir():
+        return 0
+    removed = 0
+    for entry in os.scandir(root):
+        session = get_session(entry.name)
+        if session is None:
+            # half-created or unreadable: judge it by the directory's own age
+            try:
+                expired = entry.stat().st_mtime + SESSION_TTL < now
+            except OSError:
+                continue
+        else:
+            expired = session.expires_at < now
+        if expired:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
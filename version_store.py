@@ -0,0 +1,61 @@
+"""Content-deduplicated storage format for StoryVersion snapshots.
+
+A snapshot is stored as a small manifest instead of the full document:
+
+    {"$manifest":1,"prefix":"...","sections":"<hash><hash>...","suffix":"..."}
+
+``prefix`` and ``suffix`` are the serialized payload text around the sections
+array and ``sections`` concatenates fixed-width 128-bit content hashes, each
+naming a row in ``section_blobs`` that holds one section's compact JSON.  Sections that did not change between publishes share a blob,
+so a publish costs the manifest plus the sections that actually changed, and
+``prefix + "[" + ",".join(blobs) + "]" + suffix`` rebuilds the exact original
+text without parsing any section.  Rows written before this format (plain
+payload JSON) are returned unchanged.
+"""
+import hashlib
+import json
+import uuid
+from typing import Dict, List, Tuple
+
+from story_payload import dumps_compact
+
+MANIFEST_MARKER = '{"$manifest":'
+
+
+HASH_HEX_LENGTH = 32
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=HASH_HEX_LENGTH // 2).hexdigest()
+
+
+def is_manifest(stored: str) -> bool:
+    return stored.startswith(MANIFEST_MARKER)
+
+
+def pack_snapshot(payload: dict) -> Tuple[str, str, Dict[str, str]]:
+    """Split a payload into (full text, manifest text, {hash: section fragment})."""
+    sections = payload.get("sections")
+    if not isinstance(sections, list):
+        text = dumps_compact(payload)
+        return text, text, {}
+    fragments = [dumps_compact(section) for section in sections]
+    # serialize once with a unique placeholder to find where the sections array sits
+    sentinel = uuid.uuid4().hex
+    head = dumps_compact({**payload, "sections": sentinel})
+    prefix, suffix = head.split(f'"{sentinel}"', 1)
+    full_text = prefix + "[" + ",".join(fragments) + "]" + suffix
+    hashes = [content_hash(fragment) for fragment in fragments]
+    manifest = dumps_compact({"$manifest": 1, "prefix": prefix, "sections": "".join(hashes), "suffix": suffix})
+    return full_text, manifest, dict(zip(hashes, fragments))
+
+
+def unpack_manifest(manifest: str) -> Tuple[str, List[str], str]:
+    parsed = json.loads(manifest)
+    packed = parsed["sections"]
+    hashes = [packed[i:i + HASH_HEX_LENGTH] for i in range(0, len(packed), HASH_HEX_LENGTH)]
+    return parsed["prefix"], hashes, parsed["suffix"]
+
+
+def assemble(prefix: str, hashes: List[str], blobs: Dict[str, str], suffix: str) -> str:
+    return prefix + "[" + ",".join(blobs[h] for h in hashes) + "]" + suffix